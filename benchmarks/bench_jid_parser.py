@@ -0,0 +1,108 @@
+"""Throughput do jid_parser contra a tradução direta dos CASE do SQL.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_jid_parser [mensagens.csv|mensagens.ndjson] [--variant batch]
+
+Aceita CSV com colunas sender/sender2 (ex.: export do raw_batch) ou NDJSON
+de envelopes do listener (payload._data.Info.SenderAlt / Chat). Sem arquivo,
+gera pares sintéticos com remetentes repetidos (distribuição de Zipf), chats
+de grupo/canal e SenderAlt ausente. Falha se algum resultado divergir da
+referência.
+"""
+import argparse
+import csv
+import json
+import random
+import time
+
+import pyarrow as pa
+
+from jid_parser import VARIANTS, JidParser, parse_arrays, parse_reference
+
+
+def load_pairs(path):
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            return [(row.get("sender"), row.get("sender2")) for row in csv.DictReader(f)]
+
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            payload = json.loads(line)
+            payload = payload.get("payload", payload)
+            info = (payload.get("_data") or {}).get("Info") or {}
+            pairs.append((info.get("SenderAlt"), info.get("Chat") or payload.get("from")))
+    return pairs
+
+
+def synthetic_pairs(count, senders=5000, chats=600, seed=42):
+    rng = random.Random(seed)
+    sender_pool = []
+    for _ in range(senders):
+        phone = f"55{rng.randint(11, 99)}9{rng.randint(10_000_000, 99_999_999)}"
+        device = f":{rng.randint(1, 40)}" if rng.random() < 0.3 else ""
+        sender_pool.append(f"{phone}{device}@s.whatsapp.net")
+    chat_pool = [f"1203631{rng.randint(10**11, 10**12 - 1)}@g.us" for _ in range(chats)]
+    chat_pool += [f"1203630{rng.randint(10**11, 10**12 - 1)}@newsletter" for _ in range(chats // 5)]
+    chat_pool += [f"55{rng.randint(11, 99)}9{rng.randint(10**7, 10**8 - 1)}-16{rng.randint(10**7, 10**8 - 1)}"
+                  for _ in range(chats // 10)]
+
+    weights = [1 / (rank + 1) for rank in range(senders)]
+    picked = rng.choices(sender_pool, weights=weights, k=count)
+    pairs = []
+    for sender in picked:
+        roll = rng.random()
+        if roll < 0.05:
+            sender = None
+        elif roll < 0.07:
+            sender = ""
+        pairs.append((sender, rng.choice(chat_pool) if rng.random() > 0.01 else None))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--count", type=int, default=500000, help="pares sintéticos (sem arquivo)")
+    parser.add_argument("--variant", choices=VARIANTS, default="silver")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.path) if args.path else synthetic_pairs(args.count)
+    print(f"{len(pairs):,} linhas | {len({s for s, _ in pairs}):,} senders distintos | variante: {args.variant}")
+
+    started = time.perf_counter()
+    expected = [parse_reference(sender, chat, args.variant) for sender, chat in pairs]
+    reference_secs = time.perf_counter() - started
+    print(f"  referência (CASE)   : {len(pairs) / reference_secs:12,.0f} linhas/s")
+
+    results = []
+
+    jid_parser = JidParser(args.variant)
+    started = time.perf_counter()
+    got = jid_parser.parse_many(pairs)
+    results.append(("memo LRU", time.perf_counter() - started, got))
+
+    # colunas já em Arrow, como chegam do bronze
+    senders = pa.array([s for s, _ in pairs], type=pa.string())
+    chats = pa.array([c for _, c in pairs], type=pa.string())
+    started = time.perf_counter()
+    columns = parse_arrays(senders, chats, args.variant)
+    secs = time.perf_counter() - started
+    results.append(("arrow", secs, list(zip(*(column.to_pylist() for column in columns)))))
+
+    failed = False
+    for name, secs, got in results:
+        mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+        print(f"  {name:<20}: {len(pairs) / secs:12,.0f} linhas/s ({reference_secs / secs:.1f}x) | divergências: {mismatches}")
+        failed |= bool(mismatches)
+
+    hits = jid_parser.cache_info()["sender"]
+    print(f"  cache por sender    : {hits.hits / max(1, hits.hits + hits.misses):.1%} de acertos")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Throughput do origin_classifier contra a tradução direta do CASE do SQL.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_origin_classifier [mensagens.csv|mensagens.ndjson]
+
+Aceita CSV com colunas body/caption (ex.: export do silver_messages) ou NDJSON
+de envelopes do listener (payload.body / payload._data.Message.imageMessage.caption).
+Sem arquivo, gera mensagens sintéticas a partir das próprias regras. Falha se
+algum resultado divergir da referência.
+"""
+import argparse
+import csv
+import json
+import random
+import time
+
+from origin_classifier import AHOCORASICK_AVAILABLE, OriginClassifier, classify_reference, load_rules
+
+FILLER = [
+    "🔥 OFERTA imperdível", "Air Fryer 4L por R$ 199", "frete grátis", "só hoje!!",
+    "corre que acaba", "confira:", "link na bio", "Preço caiu 📉", "\n\n", "https://",
+]
+
+
+def load_messages(path):
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            return [(row.get("body"), row.get("caption")) for row in csv.DictReader(f)]
+
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            payload = json.loads(line)
+            payload = payload.get("payload", payload)
+            image = ((payload.get("_data") or {}).get("Message") or {}).get("imageMessage") or {}
+            messages.append((payload.get("body"), image.get("caption")))
+    return messages
+
+
+def synthetic_messages(rules, count, seed=42):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.randint(5, 30))
+        if rng.random() < 0.7:
+            pattern, _ = rng.choice(rules)
+            words.insert(rng.randint(0, len(words)), pattern.replace("%", "/x/").upper())
+        body = " ".join(words)
+        caption = " ".join(rng.choices(FILLER, k=5)) if rng.random() < 0.3 else None
+        messages.append((body, caption))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--count", type=int, default=20000, help="mensagens sintéticas (sem arquivo)")
+    args = parser.parse_args()
+
+    rules = load_rules()
+    messages = load_messages(args.path) if args.path else synthetic_messages(rules, args.count)
+    print(f"{len(messages):,} mensagens | {len(rules)} regras | pyahocorasick: {AHOCORASICK_AVAILABLE}")
+
+    started = time.perf_counter()
+    expected = [classify_reference(rules, body, caption) for body, caption in messages]
+    reference_secs = time.perf_counter() - started
+    print(f"  referência (CASE)   : {len(messages) / reference_secs:12,.0f} msgs/s")
+
+    variants = [("ordem de prioridade", False)]
+    if AHOCORASICK_AVAILABLE:
+        variants.append(("aho-corasick", True))
+
+    for name, use_automaton in variants:
+        clf = OriginClassifier(rules, use_automaton=use_automaton)
+        started = time.perf_counter()
+        got = clf.classify_many(messages)
+        secs = time.perf_counter() - started
+        mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+        print(f"  {name:<20}: {len(messages) / secs:12,.0f} msgs/s ({reference_secs / secs:.1f}x) | divergências: {mismatches}")
+        if mismatches:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
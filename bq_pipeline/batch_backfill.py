@@ -0,0 +1,103 @@
+"""Backfill idempotente da silver a partir do raw_batch / raw_batch_v2.
+
+Substitui os blocos "INSERT DO BATCH" do queries.sql, que filtram com
+`id not in (select distinct split(id, '_')[1] ... from silver_messages ...)`
+(recalculando o split a cada execução) e, no v2, geram ids com RAND(), o que
+faz uma reexecução inserir tudo de novo.
+
+Cada linha recebe a chave determinística de message_keys.py e o anti-join é
+um LEFT JOIN por hash contra o índice MESSAGE_KEYS_TABLE (particionado por
+data e clusterizado por message_key). As linhas novas entram na silver e no
+índice na mesma transação, então rodar o mesmo backfill duas vezes não
+insere nada na segunda.
+
+O índice é mantido também pelo incremental_build e pelo partition_overwrite;
+para datas carregadas antes dele, rode com --init-index.
+
+Uso (a partir da raiz do repositório):
+    python -m bq_pipeline.batch_backfill --source raw_batch_v2 --version v2 --start 2026-03-18
+    python -m bq_pipeline.batch_backfill --init-index --start 2026-01-01 --end 2026-03-18
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from google.cloud import bigquery
+
+from bq_pipeline.jobs import StageStats, date_params, run_stage
+from bq_pipeline.partition_overwrite import date_range
+from bq_pipeline.transforms import (
+    KEY_COLUMNS, SILVER_COLUMNS, batch_source_select, keys_ddl, merge_new_rows, message_keys_select,
+)
+
+# Variáveis de ambiente
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gauge-prod")
+DATASET = os.getenv("BQ_DATASET", "projeto_meli")
+SILVER_TABLE = os.getenv("SILVER_TABLE", f"{PROJECT_ID}.{DATASET}.silver_messages")
+MESSAGE_KEYS_TABLE = os.getenv("MESSAGE_KEYS_TABLE", f"{PROJECT_ID}.{DATASET}.silver_message_keys")
+
+
+def init_index(client, stats, dates):
+    """Registra no índice as chaves das linhas que já estão na silver"""
+    run_stage(client, stats, "índice (init)",
+              merge_new_rows(MESSAGE_KEYS_TABLE, message_keys_select(SILVER_TABLE), KEY_COLUMNS,
+                             key=("message_key", "date")),
+              date_params(dates))
+
+
+def backfill(client, stats, source_table, version, dates):
+    """Insere na silver só as linhas do batch cuja chave não está no índice"""
+    columns = ", ".join(f"`{c}`" for c in SILVER_COLUMNS)
+    rows = run_stage(client, stats, f"backfill {version}", f"""
+        CREATE TEMP TABLE novos AS
+        SELECT s.*
+        FROM ({batch_source_select(source_table, version)}) s
+        LEFT JOIN (
+          SELECT message_key, date FROM `{MESSAGE_KEYS_TABLE}` WHERE date IN UNNEST(@dates)
+        ) k
+        ON k.date = s.date AND k.message_key = s.message_key
+        WHERE k.message_key IS NULL
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY s.message_key, s.date) = 1;
+
+        BEGIN TRANSACTION;
+        INSERT INTO `{SILVER_TABLE}` ({columns})
+        SELECT {columns} FROM novos;
+        INSERT INTO `{MESSAGE_KEYS_TABLE}` (message_key, date, id)
+        SELECT message_key, date, id FROM novos;
+        COMMIT TRANSACTION;
+
+        SELECT COUNT(*) AS inserted FROM novos;
+    """, date_params(dates))
+    return rows[0].inserted if rows else 0
+
+
+def main():
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Backfill idempotente da silver a partir do raw_batch")
+    parser.add_argument("--source", default="raw_batch_v2", help="tabela de origem (no dataset BQ_DATASET ou projeto.dataset.tabela)")
+    parser.add_argument("--version", choices=("v1", "v2"), default="v2", help="layout da origem (raw_batch = v1, raw_batch_v2 = v2)")
+    parser.add_argument("--start", type=date.fromisoformat, default=yesterday)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="inclusivo (padrão: --start)")
+    parser.add_argument("--init-index", action="store_true", help="só registra no índice as chaves já presentes na silver")
+    args = parser.parse_args()
+
+    dates = date_range(args.start, args.end or args.start)
+    if not dates:
+        parser.error("--end anterior a --start")
+
+    client = bigquery.Client(project=PROJECT_ID)
+    stats = StageStats()
+    run_stage(client, stats, "ddl", keys_ddl(MESSAGE_KEYS_TABLE))
+
+    if args.init_index:
+        init_index(client, stats, dates)
+    else:
+        source = args.source if args.source.count(".") == 2 else f"{PROJECT_ID}.{DATASET}.{args.source}"
+        inserted = backfill(client, stats, source, args.version, dates)
+        print(f"✓ {inserted:,} linhas novas inseridas na silver ({dates[0]} a {dates[-1]})")
+
+    stats.report()
+
+
+if __name__ == "__main__":
+    main()
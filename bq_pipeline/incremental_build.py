@@ -0,0 +1,179 @@
+"""Build incremental de raw -> silver -> gold no BigQuery.
+
+Substitui o `CREATE OR REPLACE TABLE waha_events_raw` do queries.sql, que
+re-parseia todo o histórico a cada execução (e, como a raw não é
+particionada, o filtro de D-1 não reduz os bytes lidos):
+
+1. lista os NDJSON em RAW_SOURCE_URI e compara com a marca d'água
+   (tabela INGESTED_FILES_TABLE: arquivos já ingeridos e seu `updated`);
+2. parseia só os arquivos novos, via tabela externa temporária apontando
+   apenas para eles, para a raw particionada por data e clusterizada por
+   chat (RAW_TABLE), registrando os arquivos na mesma transação;
+3. faz MERGE em silver, no índice de chaves (silver_message_keys, usado
+   pelo batch_backfill) e em gold apenas nas partições (datas) que
+   receberam eventos novos.
+
+Ao final imprime bytes processados/faturados e slot-ms de cada etapa.
+
+Uso (a partir da raiz do repositório):
+    python -m bq_pipeline.incremental_build
+    python -m bq_pipeline.incremental_build --dates 2026-03-17,2026-03-18   # refaz silver/gold dessas datas
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+from google.cloud import bigquery, storage
+
+from bq_pipeline.jobs import StageStats, date_params, run_stage
+from bq_pipeline.transforms import (
+    GOLD_COLUMNS, KEY_COLUMNS, SILVER_COLUMNS, gold_select, keys_ddl, merge_new_rows, message_keys_select,
+    raw_ddl, silver_select,
+)
+
+# Variáveis de ambiente
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gauge-prod")
+DATASET = os.getenv("BQ_DATASET", "projeto_meli")
+RAW_SOURCE_URI = os.getenv("RAW_SOURCE_URI", "gs://teste-waha/raw/waha_events/")
+RAW_FILE_SUFFIX = os.getenv("RAW_FILE_SUFFIX", ".ndjson")
+RAW_TABLE = os.getenv("RAW_TABLE", f"{PROJECT_ID}.{DATASET}.waha_events_raw_part")
+INGESTED_FILES_TABLE = os.getenv("INGESTED_FILES_TABLE", f"{PROJECT_ID}.{DATASET}.waha_ingested_files")
+SILVER_TABLE = os.getenv("SILVER_TABLE", f"{PROJECT_ID}.{DATASET}.silver_messages")
+GOLD_TABLE = os.getenv("GOLD_TABLE", f"{PROJECT_ID}.{DATASET}.gold_messages")
+GROUPS_TABLE = os.getenv("GROUPS_TABLE", f"{PROJECT_ID}.{DATASET}.base_grupos")
+MESSAGE_KEYS_TABLE = os.getenv("MESSAGE_KEYS_TABLE", f"{PROJECT_ID}.{DATASET}.silver_message_keys")
+# arquivos por job de ingestão (limite de URIs de uma tabela externa)
+INGEST_MAX_FILES = int(os.getenv("INGEST_MAX_FILES", "2000"))
+# arquivos com `updated` até N minutos antes da marca d'água ainda são conferidos
+# (uploads que terminam fora de ordem)
+WATERMARK_SAFETY_MINUTES = int(os.getenv("WATERMARK_SAFETY_MINUTES", "60"))
+
+# \x01 nunca aparece em JSON válido (controle é escapado), então cada linha vira uma coluna
+RAW_FIELD_DELIMITER = "\x01"
+
+
+def ensure_tables(client, stats):
+    ddl = raw_ddl(RAW_TABLE) + ";" + keys_ddl(MESSAGE_KEYS_TABLE) + f""";
+CREATE TABLE IF NOT EXISTS `{INGESTED_FILES_TABLE}` (
+  file_name STRING,
+  updated TIMESTAMP,
+  ingested_at TIMESTAMP
+)
+"""
+    run_stage(client, stats, "ddl", ddl)
+
+
+def load_watermark(client, stats):
+    """Arquivos recentes já ingeridos: {file_name} dentro da janela de segurança"""
+    rows = run_stage(client, stats, "watermark", f"""
+        SELECT file_name, updated
+        FROM `{INGESTED_FILES_TABLE}`
+        WHERE updated >= TIMESTAMP_SUB(
+            (SELECT MAX(updated) FROM `{INGESTED_FILES_TABLE}`), INTERVAL {WATERMARK_SAFETY_MINUTES} MINUTE)
+    """)
+    watermark = max((row.updated for row in rows), default=None)
+    return watermark, {row.file_name for row in rows}
+
+
+def list_new_files(watermark, recent):
+    """Blobs de RAW_SOURCE_URI mais novos que a marca d'água e ainda não ingeridos"""
+    bucket, _, prefix = RAW_SOURCE_URI[len("gs://"):].partition("/")
+    safety = timedelta(minutes=WATERMARK_SAFETY_MINUTES)
+    new_files = []
+    for blob in storage.Client(project=PROJECT_ID).list_blobs(bucket, prefix=prefix):
+        if not blob.name.endswith(RAW_FILE_SUFFIX):
+            continue
+        uri = f"gs://{bucket}/{blob.name}"
+        if watermark is not None and (blob.updated < watermark - safety or uri in recent):
+            continue
+        new_files.append((uri, blob.updated))
+    return sorted(new_files, key=lambda f: f[1])
+
+
+def ingest(client, stats, files):
+    """Parseia os arquivos na raw particionada; retorna as datas que receberam eventos"""
+    external = bigquery.ExternalConfig("CSV")
+    external.source_uris = [uri for uri, _ in files]
+    external.schema = [bigquery.SchemaField("line", "STRING")]
+    external.options.field_delimiter = RAW_FIELD_DELIMITER
+    external.options.quote_character = ""
+    external.options.allow_jagged_rows = True
+    job_config = bigquery.QueryJobConfig(table_definitions={"new_raw": external})
+
+    files_param = bigquery.ArrayQueryParameter("files", "STRUCT", [
+        bigquery.StructQueryParameter(
+            None,
+            bigquery.ScalarQueryParameter("file_name", "STRING", uri),
+            bigquery.ScalarQueryParameter("updated", "TIMESTAMP", updated),
+        )
+        for uri, updated in files
+    ])
+
+    rows = run_stage(client, stats, f"raw ({len(files)} arquivos)", f"""
+        CREATE TEMP TABLE batch AS
+        SELECT
+          raw,
+          DATE(DATETIME(TIMESTAMP(JSON_VALUE(raw, '$.payload._data.Info.Timestamp')), "America/Sao_Paulo")) AS event_date,
+          JSON_VALUE(raw, '$.payload._data.Info.Chat') AS chat,
+          source_file
+        FROM (SELECT SAFE.PARSE_JSON(line) AS raw, _FILE_NAME AS source_file FROM new_raw WHERE line IS NOT NULL);
+
+        BEGIN TRANSACTION;
+        INSERT INTO `{RAW_TABLE}` (raw, event_date, chat, source_file, ingested_at)
+        SELECT raw, event_date, chat, source_file, CURRENT_TIMESTAMP() FROM batch WHERE raw IS NOT NULL;
+        INSERT INTO `{INGESTED_FILES_TABLE}` (file_name, updated, ingested_at)
+        SELECT file_name, updated, CURRENT_TIMESTAMP() FROM UNNEST(@files);
+        COMMIT TRANSACTION;
+
+        SELECT DISTINCT event_date FROM batch WHERE event_date IS NOT NULL;
+    """, [files_param], job_config)
+    return {row.event_date for row in rows}
+
+
+def build(client, stats, dates):
+    params = date_params(dates)
+    run_stage(client, stats, "silver (merge)",
+              merge_new_rows(SILVER_TABLE, silver_select(RAW_TABLE), SILVER_COLUMNS), params)
+    # índice de chaves usado pelo batch_backfill
+    run_stage(client, stats, "índice (merge)",
+              merge_new_rows(MESSAGE_KEYS_TABLE, message_keys_select(SILVER_TABLE), KEY_COLUMNS,
+                             key=("message_key", "date")), params)
+    run_stage(client, stats, "gold (merge)",
+              merge_new_rows(GOLD_TABLE, gold_select(SILVER_TABLE, GROUPS_TABLE), GOLD_COLUMNS), params)
+
+
+def parse_dates(value):
+    return {date.fromisoformat(d.strip()) for d in value.split(",") if d.strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build incremental raw -> silver -> gold")
+    parser.add_argument("--dates", type=parse_dates, default=None,
+                        help="datas (YYYY-MM-DD, separadas por vírgula) para refazer silver/gold sem ingerir")
+    args = parser.parse_args()
+
+    client = bigquery.Client(project=PROJECT_ID)
+    stats = StageStats()
+    ensure_tables(client, stats)
+
+    if args.dates:
+        dates = args.dates
+    else:
+        watermark, recent = load_watermark(client, stats)
+        files = list_new_files(watermark, recent)
+        print(f"Marca d'água: {watermark} | arquivos novos: {len(files)}")
+        dates = set()
+        for start in range(0, len(files), INGEST_MAX_FILES):
+            dates |= ingest(client, stats, files[start:start + INGEST_MAX_FILES])
+
+    if dates:
+        print(f"Partições afetadas: {', '.join(str(d) for d in sorted(dates))}")
+        build(client, stats, dates)
+    else:
+        print("Nenhum evento novo; silver e gold não foram tocadas")
+
+    stats.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+
+from google.cloud import bigquery
+
+# Execução de jobs do BigQuery com registro de custo por etapa
+# (bytes processados/faturados e slot-ms, como aparecem no histórico de jobs).
+
+
+class StageStats:
+    def __init__(self):
+        self.stages = []
+
+    def add(self, name, job, seconds):
+        self.stages.append({
+            "stage": name,
+            "bytes_processed": job.total_bytes_processed or 0,
+            "bytes_billed": job.total_bytes_billed or 0,
+            "slot_ms": job.slot_millis or 0,
+            "seconds": seconds,
+            "job_id": job.job_id,
+        })
+
+    def report(self):
+        print(f"\n{'etapa':<24} {'processado':>12} {'faturado':>12} {'slot-ms':>12} {'tempo':>8}")
+        total = {"bytes_processed": 0, "bytes_billed": 0, "slot_ms": 0, "seconds": 0.0}
+        for s in self.stages:
+            print(f"{s['stage']:<24} {human_bytes(s['bytes_processed']):>12} {human_bytes(s['bytes_billed']):>12} "
+                  f"{s['slot_ms']:>12,} {s['seconds']:>7.1f}s")
+            for k in total:
+                total[k] += s[k]
+        print(f"{'TOTAL':<24} {human_bytes(total['bytes_processed']):>12} {human_bytes(total['bytes_billed']):>12} "
+              f"{total['slot_ms']:>12,} {total['seconds']:>7.1f}s")
+
+
+def human_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.2f} {unit}"
+        n /= 1024
+
+
+def date_params(dates):
+    return [bigquery.ArrayQueryParameter("dates", "DATE", sorted(dates))]
+
+
+def run_stage(client, stats, name, sql, params=None, job_config=None):
+    """Executa uma query/script, espera terminar e registra o custo em `stats`"""
+    job_config = job_config or bigquery.QueryJobConfig()
+    if params:
+        job_config.query_parameters = params
+    started = time.perf_counter()
+    job = client.query(sql, job_config=job_config)
+    rows = list(job.result())
+    seconds = time.perf_counter() - started
+    stats.add(name, job, seconds)
+    print(f"✓ {name}: {human_bytes(job.total_bytes_processed or 0)} processados, "
+          f"{job.slot_millis or 0:,} slot-ms, {seconds:.1f}s")
+    return rows
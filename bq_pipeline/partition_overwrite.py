@@ -0,0 +1,108 @@
+"""Recarga diária de silver/gold por sobrescrita atômica de partição.
+
+Em vez do `DELETE ... WHERE date = current_date()-1` seguido de `INSERT`
+do queries.sql (dois jobs DML por tabela e uma janela em que a partição fica
+vazia ou pela metade para o check_data.py e o export diário), cada dia é
+escrito com um único job de query cujo destino é o decorator de partição
+(`tabela$YYYYMMDD`) com WRITE_TRUNCATE: a partição antiga continua visível
+até o job terminar e é trocada de uma vez.
+
+A silver de cada dia é refeita a partir da raw particionada
+(waha_events_raw_part, do incremental_build) e a gold a partir da silver, na
+mesma tarefa. Linhas inseridas na silver por fora da raw (ex.: INSERT DO
+BATCH do raw_batch) são substituídas; para não perdê-las, refaça só a gold
+com `--stages gold`.
+
+Uso (a partir da raiz do repositório):
+    python -m bq_pipeline.partition_overwrite                               # D-1
+    python -m bq_pipeline.partition_overwrite --start 2026-03-01 --end 2026-03-18 --concurrency 8
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+from google.cloud import bigquery
+
+from bq_pipeline.jobs import StageStats, date_params, run_stage
+from bq_pipeline.transforms import gold_select, keys_ddl, message_keys_select, silver_select
+
+# Variáveis de ambiente
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gauge-prod")
+DATASET = os.getenv("BQ_DATASET", "projeto_meli")
+RAW_TABLE = os.getenv("RAW_TABLE", f"{PROJECT_ID}.{DATASET}.waha_events_raw_part")
+SILVER_TABLE = os.getenv("SILVER_TABLE", f"{PROJECT_ID}.{DATASET}.silver_messages")
+GOLD_TABLE = os.getenv("GOLD_TABLE", f"{PROJECT_ID}.{DATASET}.gold_messages")
+GROUPS_TABLE = os.getenv("GROUPS_TABLE", f"{PROJECT_ID}.{DATASET}.base_grupos")
+MESSAGE_KEYS_TABLE = os.getenv("MESSAGE_KEYS_TABLE", f"{PROJECT_ID}.{DATASET}.silver_message_keys")
+# datas processadas em paralelo num backfill
+OVERWRITE_CONCURRENCY = int(os.getenv("OVERWRITE_CONCURRENCY", "4"))
+
+STAGES = ("silver", "gold")
+
+
+def overwrite_partition(client, stats, stage, table, sql, day):
+    """Um job de query com destino `table$YYYYMMDD` e WRITE_TRUNCATE"""
+    job_config = bigquery.QueryJobConfig(
+        destination=f"{table}${day:%Y%m%d}",
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    run_stage(client, stats, f"{stage} {day}", sql, date_params([day]), job_config)
+
+
+def rebuild_day(client, stats, day, stages):
+    if "silver" in stages:
+        overwrite_partition(client, stats, "silver", SILVER_TABLE, silver_select(RAW_TABLE), day)
+        # o índice de chaves acompanha a partição reescrita
+        overwrite_partition(client, stats, "índice", MESSAGE_KEYS_TABLE, message_keys_select(SILVER_TABLE), day)
+    if "gold" in stages:
+        overwrite_partition(client, stats, "gold", GOLD_TABLE, gold_select(SILVER_TABLE, GROUPS_TABLE), day)
+
+
+def date_range(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def main():
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Sobrescreve partições diárias de silver/gold")
+    parser.add_argument("--start", type=date.fromisoformat, default=yesterday)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="inclusivo (padrão: --start)")
+    parser.add_argument("--concurrency", type=int, default=OVERWRITE_CONCURRENCY)
+    parser.add_argument("--stages", default=",".join(STAGES), help="silver,gold (ordem fixa)")
+    args = parser.parse_args()
+
+    stages = {s.strip() for s in args.stages.split(",") if s.strip()}
+    invalid = stages - set(STAGES)
+    if invalid:
+        parser.error(f"etapas inválidas: {', '.join(sorted(invalid))}")
+    days = date_range(args.start, args.end or args.start)
+    if not days:
+        parser.error("--end anterior a --start")
+
+    print(f"Sobrescrevendo {len(days)} partição(ões) de {days[0]} a {days[-1]} "
+          f"({', '.join(s for s in STAGES if s in stages)}; concorrência {args.concurrency})")
+
+    client = bigquery.Client(project=PROJECT_ID)
+    stats = StageStats()
+    if "silver" in stages:
+        run_stage(client, stats, "ddl", keys_ddl(MESSAGE_KEYS_TABLE))
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(rebuild_day, client, stats, day, stages): day for day in days}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"✗ ERRO em {futures[future]}: {e}")
+
+    stats.report()
+    if failed:
+        print(f"\n✗ {len(failed)} partição(ões) com falha: {', '.join(str(d) for d in sorted(failed))}")
+        exit(1)
+    print(f"\n✓ {len(days)} partição(ões) sobrescritas")
+
+
+if __name__ == "__main__":
+    main()
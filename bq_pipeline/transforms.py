@@ -0,0 +1,223 @@
+"""SELECTs de silver e gold do queries.sql, restritos às partições de @dates.
+
+Mesma lógica das etapas SILVER/GOLD do queries.sql, mas lendo a raw
+particionada (waha_events_raw_part, PARTITION BY event_date) com
+`event_date IN UNNEST(@dates)`, para que o BigQuery só leia as partições
+afetadas. O CASE de `origin` é gerado a partir de csv/origin_rules.csv (a
+mesma tabela de regras do origin_classifier).
+"""
+from message_keys import message_key_sql
+from origin_classifier import COUPON_PATTERN, DEFAULT_ORIGIN, load_rules
+
+SILVER_COLUMNS = ("id", "date", "time", "contry_code", "state_code", "tel_number", "caption", "body", "category")
+GOLD_COLUMNS = (
+    "id", "date", "time", "country_code", "state_code", "tel_number", "origin", "coupon",
+    "aff_id", "class", "group_name", "category",
+)
+KEY_COLUMNS = ("message_key", "date", "id")
+
+# chave determinística sobre as colunas da silver (ver message_keys.py)
+SILVER_KEY_SQL = message_key_sql("SPLIT(id, '_')[SAFE_OFFSET(1)]", "date", "time", "body", "caption")
+
+# Trechos do telefone (contry_code/state_code/tel_number) do INSERT DO BATCH
+BATCH_PHONE_COLUMNS = """
+case when sender2 like '%@%' and length(sender)<2 then null when (sender = 'N/A' and sender2 = 'N/A') then null when sender2 like '%@newsletter%' then null when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 0, 2) when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 0, 2) else null end as contry_code,
+case when sender2 like '%@%' and length(sender)<2 then null when (sender = 'N/A' and sender2 = 'N/A') then null when sender2 like '%@newsletter%' then null when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 3, 2) when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 3, 2) else null end as state_code,
+case when (sender = 'N/A' and sender2 = 'N/A') then null
+when sender2 like '%@newsletter%' then null
+when sender2 like '%@%' and length(sender)<2 then null
+when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 5, (length(split(split(sender, '@')[0],':')[0]))-4)
+when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 5, (length(split(split(sender2, '-')[0],':')[0]))-4)
+else null end as tel_number"""
+
+
+def sql_string(value):
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def origin_case(rules=None):
+    """CASE de `origin` do gold, na ordem de prioridade da tabela de regras"""
+    rules = load_rules() if rules is None else rules
+    lines = ["case"]
+    for pattern, origin in rules:
+        like = sql_string(f"%{pattern}%")
+        lines.append(f"when lower(body) like {like} or lower(caption) like {like} then {sql_string(origin)}")
+    lines.append(f"else {sql_string(DEFAULT_ORIGIN)} end")
+    return "\n".join(lines)
+
+
+def raw_ddl(raw_table):
+    return f"""
+CREATE TABLE IF NOT EXISTS `{raw_table}` (
+  raw JSON,
+  event_date DATE,
+  chat STRING,
+  source_file STRING,
+  ingested_at TIMESTAMP
+)
+PARTITION BY event_date
+CLUSTER BY chat
+"""
+
+
+def silver_select(raw_table):
+    """Linhas de silver para as datas em @dates (ARRAY<DATE>)"""
+    return f"""
+with dados as (
+select
+JSON_VALUE(raw, '$.event') as type,
+JSON_VALUE(raw, '$.message_id') as id,
+COALESCE(JSON_VALUE(raw, '$.payload._data.Info.SenderAlt'), 'N/A') as sender,
+COALESCE(chat, 'N/A') as sender2,
+event_date as date,
+TIME(DATETIME(TIMESTAMP(JSON_VALUE(raw, '$.payload._data.Info.Timestamp')), "America/Sao_Paulo")) as time,
+JSON_VALUE(raw, '$.payload._data.Message.imageMessage.caption') as caption,
+JSON_VALUE(raw, '$.payload.body') as body,
+from `{raw_table}`
+where event_date IN UNNEST(@dates)
+), final as (
+select id,
+date,
+time,
+case when sender2 like '%@newsletter%' then null when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 0, 2) when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 0, 2) else null end as contry_code,
+case when sender2 like '%@newsletter%' then null when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 3, 2) when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 3, 2) else null end as state_code,
+case when sender2 like '%@newsletter%' then null when length(sender)>2 then SUBSTRING(split(sender, '@')[0], 5, (length(split(split(sender, '@')[0],':')[0]))-4)
+when length(sender)<2 and length(sender2)>2 then SUBSTRING(split(sender2, '-')[0], 5, (length(split(split(sender2, '-')[0],':')[0]))-4) else null end as tel_number,
+COALESCE(caption, 'N/A') as caption,
+COALESCE(body, 'N/A') as body,
+'to_process' as category
+from dados
+where id is not null
+)
+select * from final where not (caption = 'N/A' and body = 'N/A')
+-- o mesmo evento pode chegar em mais de um arquivo (reentrega do Pub/Sub)
+qualify row_number() over (partition by id) = 1
+"""
+
+
+def gold_select(silver_table, groups_table, rules=None):
+    """Linhas de gold para as datas em @dates, a partir da silver"""
+    return f"""
+with base as (
+select distinct
+id,
+date,
+time,
+contry_code as country_code,
+state_code,
+tel_number,
+{origin_case(rules)} as origin,
+case
+when lower(body) like {sql_string(f"%{COUPON_PATTERN}%")} or lower(caption) like {sql_string(f"%{COUPON_PATTERN}%")} then True
+else False end as coupon,
+category
+from `{silver_table}`
+where date IN UNNEST(@dates)
+)
+select base.* EXCEPT(category),
+grupos.aff_id as aff_id,
+grupos.class_atual as class,
+grupos.grupo as group_name,
+base.category
+from base as base
+left join `{groups_table}` as grupos
+ON split(base.id, '_')[1] = grupos.id_api
+where origin <> {sql_string(DEFAULT_ORIGIN)}
+"""
+
+
+def message_keys_select(silver_table):
+    """Chaves das linhas da silver nas datas em @dates (para o índice de dedup)"""
+    return f"""
+select {SILVER_KEY_SQL} as message_key, date, id
+from `{silver_table}`
+where date IN UNNEST(@dates)
+qualify row_number() over (partition by message_key) = 1
+"""
+
+
+def keys_ddl(keys_table):
+    return f"""
+CREATE TABLE IF NOT EXISTS `{keys_table}` (
+  message_key STRING,
+  date DATE,
+  id STRING
+)
+PARTITION BY date
+CLUSTER BY message_key
+"""
+
+
+def batch_source_select(source_table, version):
+    """Linhas de silver (mais message_key) do raw_batch (v1) ou raw_batch_v2 para @dates.
+
+    Mesma lógica do INSERT DO BATCH do queries.sql, sem o `id not in (...)`
+    (o anti-join é feito contra o índice de chaves) e, no v2, com o prefixo do
+    id derivado da chave em vez de RAND(), para que reexecuções gerem os
+    mesmos ids.
+    """
+    if version == "v1":
+        p1 = f"""
+SELECT DISTINCT
+id,
+DATE(DATETIME(TIMESTAMP_SECONDS(timestamp), "America/Sao_Paulo")) AS date,
+TIME(DATETIME(TIMESTAMP_SECONDS(timestamp), "America/Sao_Paulo")) AS time,
+COALESCE(_data.Info.SenderAlt, 'N/A') as sender,
+COALESCE(_data.Info.Chat, 'N/A') as sender2,
+COALESCE(body, 'N/A') as body,
+COALESCE(_data.Message.imageMessage.caption, 'N/A') as caption,
+'to_process' as category
+FROM `{source_table}`
+WHERE DATE(DATETIME(TIMESTAMP_SECONDS(timestamp), "America/Sao_Paulo")) IN UNNEST(@dates)"""
+    elif version == "v2":
+        raw_key = message_key_sql("id", "cast(date as date)", "cast(time as time)", "body", "caption")
+        p1 = f"""
+SELECT DISTINCT
+concat({raw_key}, '_', id) as id,
+cast(date as date) as date,
+cast(time as time) as time,
+sender,
+sender2,
+COALESCE(body, 'N/A') as body,
+COALESCE(caption, 'N/A') as caption,
+category
+FROM `{source_table}`
+WHERE cast(date as date) IN UNNEST(@dates)"""
+    else:
+        raise ValueError(f"versão de batch inválida: {version} (use v1 ou v2)")
+
+    return f"""
+with p1 as ({p1}
+), batch_fill as (
+select
+id,
+date,
+time,{BATCH_PHONE_COLUMNS},
+caption,
+body,
+category
+from p1
+)
+select {SILVER_KEY_SQL} as message_key, batch_fill.*
+from batch_fill
+where (body != 'N/A' or caption != 'N/A')
+"""
+
+
+def merge_new_rows(target_table, source_sql, columns, key=("id", "date")):
+    """MERGE que só insere as linhas de `source_sql` que ainda não estão no destino.
+
+    O filtro `t.date IN UNNEST(@dates)` no ON limita o destino às partições
+    afetadas; linhas já existentes são mantidas (category pode ter sido
+    atualizada depois).
+    """
+    on = " AND ".join(f"t.{k} = s.{k}" for k in key)
+    names = ", ".join(f"`{c}`" for c in columns)
+    values = ", ".join(f"s.`{c}`" for c in columns)
+    return f"""
+MERGE `{target_table}` t
+USING ({source_sql}) s
+ON t.date IN UNNEST(@dates) AND {on}
+WHEN NOT MATCHED BY TARGET THEN
+  INSERT ({names}) VALUES ({values})
+"""
@@ -0,0 +1,345 @@
+"""Carga bronze em streaming: NDJSON do landing (GCS) -> Parquet particionado por data.
+
+Substitui o proc_gcs.ipynb, que lê todas as linhas de todos os .ndjson numa
+lista e aplica pd.json_normalize no histórico inteiro a cada execução:
+
+- os objetos são lidos linha a linha e convertidos em lotes Arrow tipados de
+  no máximo --chunk-rows linhas (memória limitada pelo lote e pelo row group
+  em formação, não pelo histórico), com orjson quando disponível;
+- só os campos usados na silver são projetados (BRONZE_SCHEMA);
+- a saída é Parquet em <dest>/date=YYYY-MM-DD/, um arquivo por data e
+  execução, com estatísticas por row group (filtros por data/ts/chat pulam
+  row groups);
+- um manifesto (<dest>/_manifest.json) guarda nome e geração de cada objeto
+  processado; execuções seguintes só leem objetos novos ou regravados.
+- linhas que não são JSON ou têm campo com tipo diferente do BRONZE_SCHEMA
+  são contadas como inválidas e gravadas em <dest>/_rejected/, sem abortar a
+  carga.
+
+A origem pode ser gs://bucket/prefixo (gcsfs) ou um diretório local, que
+faz o papel do bucket em testes.
+
+Uso:
+    python bronze_loader.py gs://teste-waha/raw/waha_events/ bronze/
+    python bronze_loader.py ./landing_local bronze/ --chunk-rows 20000
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+LOCAL_TZ = ZoneInfo("America/Sao_Paulo")
+MANIFEST_NAME = "_manifest.json"
+REJECTED_DIR = "_rejected"
+# limites de datetime (0001-01-01 .. 9999-12-31) para o ts em segundos
+MIN_TS, MAX_TS = -62135596800, 253402300799
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+BRONZE_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("event", pa.string()),
+    ("session", pa.string()),
+    ("ts", pa.timestamp("s", tz="UTC")),
+    ("chat", pa.string()),
+    ("sender", pa.string()),
+    ("sender_alt", pa.string()),
+    ("from_me", pa.bool_()),
+    ("body", pa.string()),
+    ("caption", pa.string()),
+    ("has_media", pa.bool_()),
+    ("source_object", pa.string()),
+    # enriquecimento do listener (envelope.instance / envelope.group)
+    ("instance", pa.string()),
+    ("aff_id", pa.int64()),
+    ("class", pa.string()),
+    ("group_name", pa.string()),
+])
+
+
+class LocalSource:
+    """Diretório local no lugar do bucket; a geração é o mtime em ns"""
+
+    def __init__(self, root, suffix=".ndjson"):
+        self.root = root
+        self.suffix = suffix
+
+    def list(self):
+        for path in sorted(glob.glob(os.path.join(self.root, "**", f"*{self.suffix}"), recursive=True)):
+            yield os.path.relpath(path, self.root), str(os.stat(path).st_mtime_ns)
+
+    def open(self, name):
+        return open(os.path.join(self.root, name), "rb")
+
+
+class GcsSource:
+    def __init__(self, uri, suffix=".ndjson"):
+        import gcsfs
+
+        self.fs = gcsfs.GCSFileSystem()
+        self.root = uri[len("gs://"):].rstrip("/")
+        self.suffix = suffix
+
+    def list(self):
+        for path, info in sorted(self.fs.find(self.root, detail=True).items()):
+            if path.endswith(self.suffix):
+                yield path[len(self.root) + 1:], str(info.get("generation") or info.get("mtime") or "")
+
+    def open(self, name):
+        return self.fs.open(f"{self.root}/{name}", "rb")
+
+
+def open_source(uri, suffix):
+    return GcsSource(uri, suffix) if uri.startswith("gs://") else LocalSource(uri, suffix)
+
+
+def _string(value):
+    if value is None or isinstance(value, str):
+        return value
+    raise TypeError(f"esperava texto, veio {type(value).__name__}")
+
+
+def _bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    raise TypeError(f"esperava booleano, veio {type(value).__name__}")
+
+
+def _int(value, low=INT64_MIN, high=INT64_MAX):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"esperava inteiro, veio {type(value).__name__}")
+    value = int(value)
+    if not low <= value <= high:
+        raise ValueError(f"inteiro fora do intervalo: {value}")
+    return value
+
+
+def project(envelope, source_object):
+    """Linha bronze a partir do envelope do listener ({event, message_id, payload}).
+
+    Campos com tipo diferente do BRONZE_SCHEMA levantam TypeError/ValueError:
+    a linha é contada como inválida e vai para o _rejected, sem derrubar a carga.
+    """
+    payload = envelope.get("payload") or {}
+    data = payload.get("_data") or {}
+    info = data.get("Info") or {}
+    image = (data.get("Message") or {}).get("imageMessage") or {}
+    group = envelope.get("group") or {}
+
+    ts = payload.get("timestamp")
+    if ts is None and info.get("Timestamp"):
+        try:
+            ts = int(datetime.fromisoformat(info["Timestamp"].replace("Z", "+00:00")).timestamp())
+        except ValueError:
+            ts = None
+
+    return (
+        _string(envelope.get("message_id") or payload.get("id")),
+        _string(envelope.get("event")),
+        _string(envelope.get("session")),
+        _int(ts, MIN_TS, MAX_TS),
+        _string(info.get("Chat") or payload.get("from")),
+        _string(info.get("Sender") or payload.get("participant")),
+        _string(info.get("SenderAlt")),
+        _bool(payload.get("fromMe")),
+        _string(payload.get("body")),
+        _string(image.get("caption")),
+        _bool(payload.get("hasMedia")),
+        source_object,
+        _string(envelope.get("instance")),
+        _int(group.get("aff_id")),
+        _string(group.get("class")),
+        _string(group.get("group_name")),
+    )
+
+
+def partition_date(ts):
+    if ts is None:
+        return "unknown"
+    return datetime.fromtimestamp(ts, LOCAL_TZ).strftime("%Y-%m-%d")
+
+
+class PartitionedWriter:
+    """Um ParquetWriter por data; arquivos .tmp até commit().
+
+    Os lotes de cada data são acumulados até `row_group_rows` linhas antes de
+    virar um row group, para não gerar row groups pequenos quando um lote
+    se espalha por várias datas.
+    """
+
+    def __init__(self, dest, run_id, row_group_rows):
+        self.dest = dest
+        self.run_id = run_id
+        self.row_group_rows = row_group_rows
+        self._writers = {}
+        self._buffers = defaultdict(list)
+        self.rows = 0
+
+    def _writer(self, day):
+        if day not in self._writers:
+            directory = os.path.join(self.dest, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.run_id}.parquet")
+            writer = pq.ParquetWriter(f"{path}.tmp", BRONZE_SCHEMA, compression="zstd", write_statistics=True)
+            self._writers[day] = (path, writer)
+        return self._writers[day][1]
+
+    def write(self, rows):
+        by_day = defaultdict(list)
+        for row in rows:
+            by_day[partition_date(row[3])].append(row)
+        for day, day_rows in by_day.items():
+            columns = list(zip(*day_rows))
+            table = pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, BRONZE_SCHEMA)],
+                schema=BRONZE_SCHEMA,
+            )
+            self._buffers[day].append(table)
+            if sum(t.num_rows for t in self._buffers[day]) >= self.row_group_rows:
+                self._flush(day)
+        self.rows += len(rows)
+
+    def _flush(self, day):
+        if self._buffers[day]:
+            table = pa.concat_tables(self._buffers.pop(day))
+            self._writer(day).write_table(table, row_group_size=self.row_group_rows)
+
+    def commit(self):
+        for day in list(self._buffers):
+            self._flush(day)
+        for path, writer in self._writers.values():
+            writer.close()
+            os.replace(f"{path}.tmp", path)
+        return sorted(self._writers)
+
+    def abort(self):
+        for path, writer in self._writers.values():
+            writer.close()
+            os.remove(f"{path}.tmp")
+
+
+class RejectWriter:
+    """Linhas inválidas em <dest>/_rejected/part-<run_id>.ndjson ({source_object, error, line})"""
+
+    def __init__(self, dest, run_id):
+        self.path = os.path.join(dest, REJECTED_DIR, f"part-{run_id}.ndjson")
+        self._file = None
+        self.rows = 0
+
+    def write(self, source_object, line, error):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(f"{self.path}.tmp", "w", encoding="utf-8")
+        record = {
+            "source_object": source_object,
+            "error": repr(error),
+            "line": line.decode("utf-8", "replace") if isinstance(line, bytes) else line,
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.rows += 1
+
+    def commit(self):
+        if self._file is not None:
+            self._file.close()
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            os.remove(f"{self.path}.tmp")
+
+
+def load_manifest(dest):
+    try:
+        with open(os.path.join(dest, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(dest, manifest):
+    path = os.path.join(dest, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_bronze(source, dest, chunk_rows=50000, row_group_rows=100000):
+    """Ingere os objetos novos de `source`; retorna (objetos, linhas, linhas inválidas, datas)"""
+    os.makedirs(dest, exist_ok=True)
+    manifest = load_manifest(dest)
+    pending = [(name, gen) for name, gen in source.list() if manifest.get(name) != gen]
+    if not pending:
+        return 0, 0, 0, []
+
+    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    writer = PartitionedWriter(dest, run_id, row_group_rows)
+    rejects = RejectWriter(dest, run_id)
+    chunk = []
+    try:
+        for name, _ in pending:
+            with source.open(name) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        chunk.append(project(loads(line), name))
+                    except (ValueError, AttributeError, TypeError) as e:
+                        rejects.write(name, line.rstrip(), e)
+                        continue
+                    if len(chunk) >= chunk_rows:
+                        writer.write(chunk)
+                        chunk = []
+        if chunk:
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        rejects.abort()
+        raise
+
+    days = writer.commit()
+    rejects.commit()
+    manifest.update(dict(pending))
+    save_manifest(dest, manifest)
+    return len(pending), writer.rows, rejects.rows, days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NDJSON do landing -> Parquet bronze particionado por data")
+    parser.add_argument("source", help="gs://bucket/prefixo ou diretório local")
+    parser.add_argument("dest")
+    parser.add_argument("--suffix", default=".ndjson")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--row-group-rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    objects, rows, invalid, days = load_bronze(
+        open_source(args.source, args.suffix), args.dest, args.chunk_rows, args.row_group_rows)
+    secs = time.perf_counter() - started
+    if not objects:
+        print("Nenhum objeto novo")
+        return
+    print(f"✓ {objects} objetos, {rows:,} linhas ({invalid} inválidas) em {secs:.1f}s "
+          f"| partições: {', '.join(days)}")
+    if invalid:
+        print(f"[WARN] Linhas inválidas gravadas em {os.path.join(args.dest, REJECTED_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
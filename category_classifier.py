@@ -0,0 +1,320 @@
+"""Classificação de categoria das mensagens de oferta via LLM, em lote e com cache.
+
+O openai_query.consultar_chatgpt cria um cliente OpenAI a cada chamada, manda
+uma mensagem por chat completion com o prompt inteiro das 20 categorias e
+devolve o erro como string. Aqui:
+
+- um único AsyncOpenAI é reaproveitado em todas as chamadas;
+- várias mensagens vão numa mesma requisição (--batch-size), numeradas, e a
+  resposta é JSON estruturado (json_schema com as categorias como enum);
+- as requisições rodam em paralelo limitadas por um asyncio.Semaphore
+  (--concurrency), com backoff exponencial em RateLimitError;
+- itens que o modelo omite ou responde com categoria inválida voltam para
+  novos lotes, até --item-retries vezes;
+- um cache SQLite por hash do conteúdo (texto normalizado + modelo) garante
+  que o mesmo texto de promoção não é classificado duas vezes, entre
+  execuções;
+- erros que não são de rate limit sobem como exceção.
+
+Configuração (variáveis de ambiente ou .env):
+    OPENAI_API_KEY   chave da API
+    OPENAI_BASE_URL  endpoint alternativo (ex.: servidor mock local em testes)
+    OPENAI_MODEL     modelo (padrão: gpt-4o-mini)
+
+Uso:
+    python category_classifier.py silver.parquet silver_categorias.parquet
+    python category_classifier.py in.parquet out.parquet --base-url http://localhost:8080/v1 --concurrency 8
+
+    from category_classifier import classify_texts
+    classify_texts(["Air fryer 4L por R$ 199", ...])  # -> ['Eletrodomésticos', ...]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+
+from openai import AsyncOpenAI, RateLimitError
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_cache.db")
+
+# Mesmas categorias do prompt de openai_query.py
+CATEGORIES = (
+    "Eletrodomésticos",
+    "Móveis e Decoração",
+    "Utilidades Domésticas",
+    "Construção e Ferramentas",
+    "Celulares e Smartphones",
+    "Informática",
+    "TV, Áudio e Vídeo",
+    "Games e Consoles",
+    "Moda e Vestuário",
+    "Beleza e Perfumaria",
+    "Relógios e Joias",
+    "Bebês e Maternidade",
+    "Saúde e Cuidados Pessoais",
+    "Pet Shop",
+    "Esporte e Fitness",
+    "Brinquedos e Hobbies",
+    "Viagem e Camping",
+    "Alimentos e Bebidas",
+    "Limpeza e Higiene",
+    "Automotivo",
+)
+
+# Colunas da silver concatenadas como no CASE comentado do pipeline.ipynb
+TEXT_COLUMNS = ("body", "text", "title", "description", "caption")
+
+SYSTEM_PROMPT = (
+    "Os dados a seguir são registros de uma base com informações de grupos de ofertas. "
+    "Classifique cada conteúdo em uma das seguintes categorias:\n"
+    + "\n".join(CATEGORIES)
+    + "\n\nCada item vem como <número>: <texto>. Responda com uma classificação por item, "
+    "usando o mesmo número."
+)
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "classificacoes",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "i": {"type": "integer"},
+                            "category": {"type": "string", "enum": list(CATEGORIES)},
+                        },
+                        "required": ["i", "category"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    return _SPACES.sub(" ", text or "").strip()
+
+
+def content_hash(text, model):
+    return hashlib.sha256(f"{model}\x1f{normalize(text).lower()}".encode("utf-8")).hexdigest()
+
+
+class CategoryCache:
+    """Cache persistente hash do conteúdo -> categoria (SQLite)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS categories ("
+            "hash TEXT PRIMARY KEY, category TEXT NOT NULL, model TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        # limite de variáveis por statement do SQLite
+        for start in range(0, len(hashes), 900):
+            part = hashes[start:start + 900]
+            found.update(self.conn.execute(
+                f"SELECT hash, category FROM categories WHERE hash IN ({','.join('?' for _ in part)})", part))
+        return found
+
+    def put_many(self, items, model):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO categories (hash, category, model, created_at) VALUES (?, ?, ?, ?)",
+            [(h, category, model, now) for h, category in items],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CategoryClassifier:
+    def __init__(self, model=DEFAULT_MODEL, batch_size=25, concurrency=4, max_retries=6,
+                 cache_path=DEFAULT_CACHE_PATH, client=None, base_url=None, max_chars=1000, item_retries=2):
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.item_retries = item_retries
+        self.max_chars = max_chars
+        # as retentativas de rate limit ficam por conta do backoff abaixo
+        self.client = client or AsyncOpenAI(base_url=base_url, max_retries=0)
+        self.cache = CategoryCache(cache_path) if cache_path else None
+        self.requests = 0
+        self.rate_limited = 0
+
+    async def _create(self, messages):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.requests += 1
+                return await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.2,
+                    response_format=RESPONSE_FORMAT,
+                )
+            except RateLimitError as e:
+                self.rate_limited += 1
+                if attempt == self.max_retries:
+                    raise
+                retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = min(60.0, 2 ** attempt) + random.uniform(0, 1)
+                print(f"[WARN] Rate limit; nova tentativa em {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+
+    async def _classify_batch(self, semaphore, batch):
+        """batch: [(hash, texto)]; retorna {hash: categoria} dos itens respondidos"""
+        items = "\n".join(f"{i}: {normalize(text)[:self.max_chars]}" for i, (_, text) in enumerate(batch))
+        async with semaphore:
+            response = await self._create([
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": items},
+            ])
+        answer = json.loads(response.choices[0].message.content)
+        result = {}
+        for item in answer.get("items", []):
+            i, category = item.get("i"), item.get("category")
+            if isinstance(i, int) and 0 <= i < len(batch) and category in CATEGORIES:
+                result[batch[i][0]] = category
+        return result
+
+    async def _run_batches(self, pending, known):
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._classify_batch(semaphore, batch)) for batch in batches]
+        try:
+            for done in asyncio.as_completed(tasks):
+                result = await done
+                # grava a cada lote: uma falha no meio não perde o que já foi pago
+                if self.cache and result:
+                    self.cache.put_many(result.items(), self.model)
+                known.update(result)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def classify(self, texts):
+        """Lista de categorias na ordem de `texts` (None para texto vazio ou sem resposta)"""
+        hashes = [content_hash(text, self.model) if normalize(text) else None for text in texts]
+        unique = {h: text for h, text in zip(hashes, texts) if h is not None}
+        known = self.cache.get_many(unique) if self.cache else {}
+
+        pending = [(h, text) for h, text in unique.items() if h not in known]
+        for attempt in range(self.item_retries + 1):
+            if attempt:
+                print(f"[WARN] {len(pending)} itens sem classificação válida; reenviando "
+                      f"({attempt}/{self.item_retries})")
+            await self._run_batches(pending, known)
+            pending = [(h, text) for h, text in pending if h not in known]
+            if not pending:
+                break
+        return [known.get(h) if h else None for h in hashes]
+
+    async def aclose(self):
+        await self.client.close()
+        if self.cache:
+            self.cache.close()
+
+
+def classify_texts(texts, **kwargs):
+    """Versão síncrona de CategoryClassifier.classify"""
+    async def run():
+        classifier = CategoryClassifier(**kwargs)
+        try:
+            return await classifier.classify(texts)
+        finally:
+            await classifier.aclose()
+
+    return asyncio.run(run())
+
+
+def message_text(row, columns=TEXT_COLUMNS):
+    """Concatena as colunas como no pipeline.ipynb; vazio se nenhuma tiver texto"""
+    if not any(row.get(col) for col in columns):
+        return ""
+    return " - ".join(row.get(col) or "N/A" for col in columns)
+
+
+def main():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parser = argparse.ArgumentParser(description="Classificação de categoria das mensagens via LLM, em lote e com cache")
+    parser.add_argument("input", help="Parquet com as colunas de texto da silver")
+    parser.add_argument("output", help="Parquet de saída com a coluna `category`")
+    parser.add_argument("--columns", default=",".join(TEXT_COLUMNS), help="colunas concatenadas no texto")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=25, help="mensagens por requisição")
+    parser.add_argument("--concurrency", type=int, default=4, help="requisições simultâneas")
+    parser.add_argument("--max-retries", type=int, default=6, help="tentativas em RateLimitError")
+    parser.add_argument("--item-retries", type=int, default=2,
+                        help="reenvios de itens omitidos ou com categoria inválida")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="arquivo SQLite do cache")
+    parser.add_argument("--base-url", default=None, help="endpoint compatível com a API da OpenAI")
+    args = parser.parse_args()
+
+    table = pq.read_table(args.input)
+    columns = [c for c in args.columns.split(",") if c in table.column_names]
+    if not columns:
+        print(f"✗ Nenhuma das colunas {args.columns} em {args.input}")
+        exit(1)
+    texts = [message_text(row, columns) for row in table.select(columns).to_pylist()]
+
+    async def run():
+        classifier = CategoryClassifier(args.model, args.batch_size, args.concurrency, args.max_retries,
+                                        args.cache, base_url=args.base_url, item_retries=args.item_retries)
+        try:
+            return await classifier.classify(texts), classifier.requests, classifier.rate_limited
+        finally:
+            await classifier.aclose()
+
+    started = time.perf_counter()
+    categories, requests, rate_limited = asyncio.run(run())
+    secs = time.perf_counter() - started
+
+    # a silver já traz category='to_process': substitui em vez de duplicar a coluna
+    category = pa.array(categories, pa.string())
+    if "category" in table.column_names:
+        table = table.set_column(table.column_names.index("category"), "category", category)
+    else:
+        table = table.append_column("category", category)
+    pq.write_table(table, args.output)
+    missing = sum(c is None for c in categories)
+    print(f"✓ {len(texts):,} mensagens em {secs:.1f}s | {requests} requisições "
+          f"({rate_limited} com rate limit) | {missing} sem categoria")
+
+
+if __name__ == "__main__":
+    main()
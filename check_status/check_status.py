@@ -4,11 +4,15 @@ import requests
 import smtplib
 import subprocess
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from google.auth.transport.requests import Request
 from google.oauth2 import id_token
+from requests.adapters import HTTPAdapter
 from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
 
 # Variáveis de ambiente
@@ -22,6 +26,8 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "tloohwsxfgvdzfib")  # sua-senha-ou-a
 pushgateway_url = os.getenv("PUSHGATEWAY_URL")
 PAGERDUTY_API_KEY = os.getenv("PAGERDUTY_API_KEY")
 API_KEY = os.getenv("WAHA_API_KEY")  # Chave de API para autenticação nos endpoints monitorados
+CHECK_CONCURRENCY = int(os.getenv("CHECK_CONCURRENCY", "8"))  # Endpoints verificados em paralelo
+CHECK_TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "10"))  # Timeout por requisição (segundos)
 
 if not URLS_STR:
     print("ERRO: Defina a variável de ambiente WAHA_URLS (URLs separadas por vírgula)")
@@ -45,6 +51,39 @@ print(f"Verificando status de {len(urls)} endpoint(s)...\n")
 registry = CollectorRegistry()
 waha_session_status = Gauge('waha_session_status', 'Status da sessão WAHA (1=WORKING, 0=outros status)', ['url', 'status'], registry=registry)
 waha_endpoint_available = Gauge('waha_endpoint_available', 'Disponibilidade do endpoint WAHA (1=disponível, 0=erro)', ['url'], registry=registry)
+waha_check_duration = Gauge('waha_check_duration_seconds', 'Duração da verificação de status do endpoint WAHA', ['url'], registry=registry)
+
+# Sessão HTTP compartilhada (keep-alive) entre as threads de verificação
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=len(urls), pool_maxsize=CHECK_CONCURRENCY))
+session.mount("http://", HTTPAdapter(pool_connections=len(urls), pool_maxsize=CHECK_CONCURRENCY))
+
+# Cache de ID tokens por audience (tokens do Google valem 1h; renovamos antes)
+ID_TOKEN_TTL = 50 * 60
+_id_tokens = {}
+_id_tokens_lock = threading.Lock()
+
+def get_id_token(audience):
+    """Obtém (ou reaproveita do cache) o ID token do Cloud Run para a audience"""
+    with _id_tokens_lock:
+        cached = _id_tokens.get(audience)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+    token = id_token.fetch_id_token(Request(), audience)
+    with _id_tokens_lock:
+        _id_tokens[audience] = (token, time.monotonic() + ID_TOKEN_TTL)
+    return token
+
+def auth_headers(base_url):
+    """Headers de autenticação: X-Api-Key se disponível, senão Bearer token do Cloud Run"""
+    headers = {
+        "Content-Type": "application/json"
+    }
+    if API_KEY:
+        headers["X-Api-Key"] = API_KEY
+    else:
+        headers["Authorization"] = f"Bearer {get_id_token(base_url)}"
+    return headers
 
 def extract_cloud_run_info(base_url):
     """Extrai o nome do serviço, região e project do URL do Cloud Run"""
@@ -273,20 +312,9 @@ def start_waha_session(base_url):
     url = f"{base_url}/api/sessions/default/start"
     
     try:
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        # Priorizar X-Api-Key se disponível, caso contrário usar Bearer token
-        if API_KEY:
-            headers["X-Api-Key"] = API_KEY
-        else:
-            # Obter ID token para autenticação Cloud Run
-            auth_req = Request()
-            id_token_credential = id_token.fetch_id_token(auth_req, base_url)
-            headers["Authorization"] = f"Bearer {id_token_credential}"
+        headers = auth_headers(base_url)
         
-        response = requests.post(url, headers=headers, timeout=10)
+        response = session.post(url, headers=headers, timeout=CHECK_TIMEOUT)
         
         if response.status_code in [200, 201]:
             print(f"  ✓ Serviço reiniciado com sucesso")
@@ -304,20 +332,9 @@ def check_waha_status(base_url):
     url = f"{base_url}/api/sessions/default"
     
     try:
-        headers = {
-            "Content-Type": "application/json"
-        }
+        headers = auth_headers(base_url)
         
-        # Priorizar X-Api-Key se disponível, caso contrário usar Bearer token
-        if API_KEY:
-            headers["X-Api-Key"] = API_KEY
-        else:
-            # Obter ID token para autenticação Cloud Run
-            auth_req = Request()
-            id_token_credential = id_token.fetch_id_token(auth_req, base_url)
-            headers["Authorization"] = f"Bearer {id_token_credential}"
-        
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, headers=headers, timeout=CHECK_TIMEOUT)
         
         if response.status_code != 200:
             return {
@@ -359,15 +376,27 @@ def check_waha_status(base_url):
             "available": False
         }
 
-# Verificar todos os endpoints
+def timed_check(base_url):
+    """Executa check_waha_status medindo a duração"""
+    started = time.perf_counter()
+    result = check_waha_status(base_url)
+    return result, time.perf_counter() - started
+
+# Verificar todos os endpoints em paralelo (limitado por CHECK_CONCURRENCY)
+started = time.perf_counter()
+with ThreadPoolExecutor(max_workers=max(1, min(CHECK_CONCURRENCY, len(urls)))) as pool:
+    check_results = list(pool.map(timed_check, urls))
+print(f"Verificação concluída em {time.perf_counter() - started:.1f}s\n")
+
 failed_endpoints = []
 restarted_endpoints = []
 redeployed_endpoints = []
 
-for i, url in enumerate(urls, 1):
-    print(f"[{i}/{len(urls)}] Verificando: {url}")
-    
-    result = check_waha_status(url)
+# Tratar os resultados (reinício/redeploy) em sequência
+for i, (url, (result, duration)) in enumerate(zip(urls, check_results), 1):
+    print(f"[{i}/{len(urls)}] {url} ({duration:.2f}s)")
+    if pushgateway_url:
+        waha_check_duration.labels(url=url).set(duration)
     
     if result:
         # Enviar métricas para Prometheus
@@ -401,7 +430,6 @@ for i, url in enumerate(urls, 1):
                 
                 if redeploy_cloud_run(url):
                     print(f"  ⏳ Aguardando 2 minutos após redeploy...")
-                    import time
                     time.sleep(120)
                     
                     print(f"  🔄 Tentando iniciar a sessão WAHA...")
@@ -1,15 +1,23 @@
 import os
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from google.cloud import bigquery
-from google.auth.transport.requests import Request
-from google.oauth2 import id_token
+from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+from state_store import open_state_store
+from waha_client import WahaClient, WahaError
 
 # --- Variáveis de ambiente ---
 WAHA_URLS = os.getenv("WAHA_URLS", "")
 PAGERDUTY_ROUTING_KEY = os.getenv("PAGERDUTY_ROUTING_KEY", "")
 WAHA_API_KEY = os.getenv("WAHA_API_KEY", "")
 BQ_TABLE = os.getenv("BQ_TABLE", "projeto_meli.status_waha_services")
+PUSHGATEWAY_URL = os.getenv("PUSHGATEWAY_URL", "")
+STATE_BACKEND = os.getenv("STATE_BACKEND", "bigquery")  # bigquery, sqlite ou json
+STATE_PATH = os.getenv("STATE_PATH", "")  # arquivo local para os backends sqlite/json
+CHECK_CONCURRENCY = int(os.getenv("CHECK_CONCURRENCY", "8"))
+CHECK_TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "10"))
+CHECK_ATTEMPTS = int(os.getenv("CHECK_ATTEMPTS", "2"))  # tentativas por chamada (429/5xx, falha de conexão)
 
 urls = [u.strip() for u in WAHA_URLS.split(",") if u.strip()]
 
@@ -21,92 +29,38 @@ if not PAGERDUTY_ROUTING_KEY:
     print("ERRO: Defina a variável de ambiente PAGERDUTY_ROUTING_KEY")
     exit(1)
 
-bq = bigquery.Client()
-
-
-def get_endpoint_state(endpoint):
-    """Lê o estado atual de um endpoint na tabela do BigQuery."""
-    query = f"""
-        SELECT last_status, starting_counter, incident_open, incident_key
-        FROM `{BQ_TABLE}`
-        WHERE endpoint = @endpoint
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[bigquery.ScalarQueryParameter("endpoint", "STRING", endpoint)]
-    )
-    rows = list(bq.query(query, job_config=job_config).result())
-    if rows:
-        row = rows[0]
-        return {
-            "last_status": row.last_status or "",
-            "starting_counter": row.starting_counter or 0,
-            "incident_open": row.incident_open or False,
-            "incident_key": row.incident_key or "",
-        }
-    return {"last_status": "", "starting_counter": 0, "incident_open": False, "incident_key": ""}
-
-
-def save_endpoint_state(endpoint, last_status, starting_counter, incident_open, incident_key):
-    """Persiste o estado do endpoint no BigQuery via MERGE (upsert)."""
-    query = f"""
-        MERGE `{BQ_TABLE}` t
-        USING (SELECT @endpoint AS endpoint) s
-        ON t.endpoint = s.endpoint
-        WHEN MATCHED THEN
-            UPDATE SET
-                last_status = @last_status,
-                starting_counter = @starting_counter,
-                incident_open = @incident_open,
-                incident_key = @incident_key
-        WHEN NOT MATCHED THEN
-            INSERT (endpoint, last_status, starting_counter, incident_open, incident_key)
-            VALUES (@endpoint, @last_status, @starting_counter, @incident_open, @incident_key)
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("endpoint", "STRING", endpoint),
-            bigquery.ScalarQueryParameter("last_status", "STRING", last_status),
-            bigquery.ScalarQueryParameter("starting_counter", "INT64", starting_counter),
-            bigquery.ScalarQueryParameter("incident_open", "BOOL", incident_open),
-            bigquery.ScalarQueryParameter("incident_key", "STRING", incident_key or ""),
-        ]
-    )
-    bq.query(query, job_config=job_config).result()
+state_store = open_state_store(STATE_BACKEND, BQ_TABLE, STATE_PATH)
+
+# Cliente WAHA compartilhado entre as threads de verificação: pool keep-alive por
+# instância, X-Api-Key se disponível, senão ID token do Cloud Run (em cache até expirar)
+waha = WahaClient(urls, api_key=WAHA_API_KEY, timeout=CHECK_TIMEOUT, max_attempts=CHECK_ATTEMPTS,
+                  pool_size=CHECK_CONCURRENCY)
 
+registry = CollectorRegistry()
+waha_check_duration = Gauge(
+    "waha_check_duration_seconds", "Duração da verificação de status do endpoint WAHA", ["url"], registry=registry
+)
+waha_session_working = Gauge(
+    "waha_session_working", "Sessão WAHA com status WORKING (1) ou não (0)", ["url"], registry=registry
+)
 
 def check_waha_status(base_url):
     """Consulta o status da sessão WAHA no endpoint."""
-    url = f"{base_url}/api/sessions/default"
-    headers = {"Content-Type": "application/json"}
-
-    if WAHA_API_KEY:
-        headers["X-Api-Key"] = WAHA_API_KEY
-    else:
-        auth_req = Request()
-        token = id_token.fetch_id_token(auth_req, base_url)
-        headers["Authorization"] = f"Bearer {token}"
-
-    resp = requests.get(url, headers=headers, timeout=10)
-    if resp.status_code != 200:
+    try:
+        data = waha.status(base_url)
+    except WahaError:
         return "FAILED"
 
-    return resp.json().get("status", "UNKNOWN").upper()
+    return (data or {}).get("status", "UNKNOWN").upper()
 
 
 def start_waha_session(base_url):
     """Tenta iniciar uma sessão WAHA que está parada."""
-    url = f"{base_url}/api/sessions/default/start"
-    headers = {"Content-Type": "application/json"}
-
-    if WAHA_API_KEY:
-        headers["X-Api-Key"] = WAHA_API_KEY
-    else:
-        auth_req = Request()
-        token = id_token.fetch_id_token(auth_req, base_url)
-        headers["Authorization"] = f"Bearer {token}"
-
-    resp = requests.post(url, headers=headers, timeout=10)
-    return resp.status_code in [200, 201]
+    try:
+        waha.start(base_url)
+    except WahaError:
+        return False
+    return True
 
 
 def trigger_pagerduty(endpoint, status):
@@ -153,21 +107,39 @@ def resolve_pagerduty(dedup_key):
         return False
 
 
+def timed_check(base_url):
+    """Consulta o status medindo a duração; erros viram FAILED."""
+    started = time.perf_counter()
+    try:
+        status, error = check_waha_status(base_url), None
+    except Exception as e:
+        status, error = "FAILED", e
+    return status, error, time.perf_counter() - started
+
+
 # --- Execução principal ---
 print(f"Verificando {len(urls)} endpoint(s)...\n")
 
-for endpoint_url in urls:
-    print(f"Endpoint: {endpoint_url}")
+# Todas as verificações em paralelo (limitadas por CHECK_CONCURRENCY)
+started = time.perf_counter()
+with ThreadPoolExecutor(max_workers=max(1, min(CHECK_CONCURRENCY, len(urls)))) as pool:
+    check_results = list(pool.map(timed_check, urls))
+print(f"Verificação concluída em {time.perf_counter() - started:.1f}s\n")
 
-    try:
-        status = check_waha_status(endpoint_url)
-    except Exception as e:
-        print(f"  Erro na verificação: {e}")
-        status = "FAILED"
+# Estado de todos os endpoints em uma leitura; as atualizações são gravadas juntas no fim
+states = state_store.load(urls)
+new_states = {}
+
+for endpoint_url, (status, error, duration) in zip(urls, check_results):
+    print(f"Endpoint: {endpoint_url} ({duration:.2f}s)")
+    if error:
+        print(f"  Erro na verificação: {error}")
 
     print(f"  Status: {status}")
+    waha_check_duration.labels(url=endpoint_url).set(duration)
+    waha_session_working.labels(url=endpoint_url).set(1 if status == "WORKING" else 0)
 
-    state = get_endpoint_state(endpoint_url)
+    state = states[endpoint_url]
     counter = state["starting_counter"]
     incident_open = state["incident_open"]
     incident_key = state["incident_key"]
@@ -240,8 +212,27 @@ for endpoint_url in urls:
         else:
             print("  Incidente já aberto, sem novos alertas.")
 
-    save_endpoint_state(endpoint_url, status, counter, incident_open, incident_key)
-    print(f"  Estado salvo no BigQuery.\n")
+    new_states[endpoint_url] = {
+        "last_status": status,
+        "starting_counter": counter,
+        "incident_open": incident_open,
+        "incident_key": incident_key,
+    }
+    print()
+
+state_store.save(new_states)
+print(f"Estado de {len(new_states)} endpoint(s) salvo ({STATE_BACKEND}).\n")
+
+if PUSHGATEWAY_URL:
+    try:
+        push_to_gateway(PUSHGATEWAY_URL, job="check_status_v2", registry=registry)
+        print("Métricas enviadas para Pushgateway.")
+    except Exception as e:
+        print(f"Erro ao enviar métricas para Pushgateway: {e}")
+
+print("Latência das chamadas ao WAHA:")
+waha.stats.report()
+waha.close()
 
 print("=" * 60)
 print("Verificação concluída.")
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+
+# Backends de estado dos endpoints do check_status_v2.
+# Todos expõem load(endpoints) -> {endpoint: estado} e save({endpoint: estado}),
+# com uma leitura e uma escrita por execução, independente do nº de endpoints.
+
+STATE_FIELDS = ("last_status", "starting_counter", "incident_open", "incident_key")
+
+
+def default_state():
+    return {"last_status": "", "starting_counter": 0, "incident_open": False, "incident_key": ""}
+
+
+def normalize_state(row):
+    """Converte uma linha (dict) do backend no formato usado pelo script."""
+    return {
+        "last_status": row.get("last_status") or "",
+        "starting_counter": row.get("starting_counter") or 0,
+        "incident_open": bool(row.get("incident_open")),
+        "incident_key": row.get("incident_key") or "",
+    }
+
+
+class BigQueryStateStore:
+    """Estado na tabela do BigQuery: um SELECT e um MERGE multi-linha por execução."""
+
+    def __init__(self, table):
+        from google.cloud import bigquery
+
+        self.bigquery = bigquery
+        self.table = table
+        self.client = bigquery.Client()
+
+    def load(self, endpoints):
+        query = f"""
+            SELECT endpoint, last_status, starting_counter, incident_open, incident_key
+            FROM `{self.table}`
+            WHERE endpoint IN UNNEST(@endpoints)
+        """
+        job_config = self.bigquery.QueryJobConfig(
+            query_parameters=[self.bigquery.ArrayQueryParameter("endpoints", "STRING", list(endpoints))]
+        )
+        states = {endpoint: default_state() for endpoint in endpoints}
+        for row in self.client.query(query, job_config=job_config).result():
+            states[row.endpoint] = normalize_state(dict(row.items()))
+        return states
+
+    def save(self, states):
+        if not states:
+            return
+        bq = self.bigquery
+        rows = [
+            bq.StructQueryParameter(
+                None,
+                bq.ScalarQueryParameter("endpoint", "STRING", endpoint),
+                bq.ScalarQueryParameter("last_status", "STRING", state["last_status"]),
+                bq.ScalarQueryParameter("starting_counter", "INT64", state["starting_counter"]),
+                bq.ScalarQueryParameter("incident_open", "BOOL", state["incident_open"]),
+                bq.ScalarQueryParameter("incident_key", "STRING", state["incident_key"] or ""),
+            )
+            for endpoint, state in states.items()
+        ]
+        query = f"""
+            MERGE `{self.table}` t
+            USING (SELECT * FROM UNNEST(@rows)) s
+            ON t.endpoint = s.endpoint
+            WHEN MATCHED THEN
+                UPDATE SET
+                    last_status = s.last_status,
+                    starting_counter = s.starting_counter,
+                    incident_open = s.incident_open,
+                    incident_key = s.incident_key
+            WHEN NOT MATCHED THEN
+                INSERT (endpoint, last_status, starting_counter, incident_open, incident_key)
+                VALUES (s.endpoint, s.last_status, s.starting_counter, s.incident_open, s.incident_key)
+        """
+        job_config = bq.QueryJobConfig(query_parameters=[bq.ArrayQueryParameter("rows", "STRUCT", rows)])
+        self.client.query(query, job_config=job_config).result()
+
+
+class SQLiteStateStore:
+    """Estado em um arquivo SQLite local (execuções locais e testes)."""
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS status_waha_services (
+                    endpoint TEXT PRIMARY KEY,
+                    last_status TEXT,
+                    starting_counter INTEGER,
+                    incident_open INTEGER,
+                    incident_key TEXT
+                )
+                """
+            )
+
+    def load(self, endpoints):
+        states = {endpoint: default_state() for endpoint in endpoints}
+        endpoints = list(endpoints)
+        if not endpoints:
+            return states
+        placeholders = ",".join("?" for _ in endpoints)
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT * FROM status_waha_services WHERE endpoint IN ({placeholders})", endpoints
+            ).fetchall()
+        for row in rows:
+            states[row["endpoint"]] = normalize_state(dict(row))
+        return states
+
+    def save(self, states):
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                """
+                INSERT INTO status_waha_services (endpoint, last_status, starting_counter, incident_open, incident_key)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(endpoint) DO UPDATE SET
+                    last_status = excluded.last_status,
+                    starting_counter = excluded.starting_counter,
+                    incident_open = excluded.incident_open,
+                    incident_key = excluded.incident_key
+                """,
+                [
+                    (endpoint, s["last_status"], s["starting_counter"], int(s["incident_open"]), s["incident_key"] or "")
+                    for endpoint, s in states.items()
+                ],
+            )
+
+
+class JsonStateStore:
+    """Estado em um arquivo JSON local ({endpoint: estado})."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self, endpoints):
+        data = self._read()
+        return {endpoint: normalize_state(data.get(endpoint, {})) for endpoint in endpoints}
+
+    def save(self, states):
+        data = self._read()
+        data.update({endpoint: {k: state[k] for k in STATE_FIELDS} for endpoint, state in states.items()})
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def open_state_store(backend, bq_table, path):
+    """Cria o backend configurado em STATE_BACKEND (bigquery, sqlite ou json)."""
+    if backend == "bigquery":
+        return BigQueryStateStore(bq_table)
+    if backend == "sqlite":
+        return SQLiteStateStore(path or "status_waha_services.db")
+    if backend == "json":
+        return JsonStateStore(path or "status_waha_services.json")
+    raise ValueError(f"STATE_BACKEND inválido: {backend} (use bigquery, sqlite ou json)")
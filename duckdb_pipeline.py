@@ -0,0 +1,224 @@
+"""Bronze/silver locais em DuckDB, sem pandas no caminho.
+
+Versão em linha de comando das camadas BRONZE/SILVER do pipeline.ipynb, que
+lia D:\\landing\\*.json com read_json_auto (inferindo o schema em todos os
+arquivos a cada dia), materializava tudo com .df() e gravava com
+df.to_parquet:
+
+- schema explícito da mensagem WAHA (WAHA_MESSAGE_TYPE), sem inferência;
+- os arquivos do landing vão como lista para um único read_json e o DuckDB
+  distribui a leitura entre --threads núcleos, respeitando --memory-limit;
+- a escrita é `COPY ... TO` direto do motor, em Parquet particionado por
+  data (date=YYYY-MM-DD/);
+- cada etapa informa linhas e linhas/s.
+
+Layouts de landing aceitos (--layout):
+    array     um JSON array de mensagens por arquivo (get_data.ipynb)
+    envelope  NDJSON do harvester.py ({device, chat_id, payload})
+
+Uso:
+    python duckdb_pipeline.py bronze "D:/landing/*.json" D:/bronze --threads 8 --memory-limit 4GB
+    python duckdb_pipeline.py silver D:/bronze D:/silver --date 2026-03-18
+    python duckdb_pipeline.py all "landing/*/*.ndjson" bronze silver --layout envelope
+"""
+import argparse
+import glob
+import os
+import time
+import uuid
+
+import duckdb
+
+TIMEZONE = "America/Sao_Paulo"
+
+# Campos usados das mensagens WAHA (engine GOWS); o resto do JSON é ignorado
+WAHA_MESSAGE_TYPE = """STRUCT(
+    id VARCHAR,
+    "timestamp" BIGINT,
+    "from" VARCHAR,
+    fromMe BOOLEAN,
+    participant VARCHAR,
+    body VARCHAR,
+    hasMedia BOOLEAN,
+    _data STRUCT(
+        Info STRUCT(Chat VARCHAR, Sender VARCHAR, SenderAlt VARCHAR, PushName VARCHAR),
+        Message STRUCT(
+            extendedTextMessage STRUCT(text VARCHAR, title VARCHAR, description VARCHAR),
+            imageMessage STRUCT(caption VARCHAR)
+        )
+    )
+)"""
+
+LAYOUTS = ("array", "envelope")
+
+
+def connect(threads, memory_limit, temp_directory=None):
+    con = duckdb.connect()
+    con.execute(f"SET threads = {int(threads)}")
+    con.execute(f"SET memory_limit = '{memory_limit}'")
+    # sem exigência de ordem o COPY pode escrever em paralelo
+    con.execute("SET preserve_insertion_order = false")
+    if temp_directory:
+        con.execute(f"SET temp_directory = '{temp_directory}'")
+    return con
+
+
+def sql_list(paths):
+    return "[" + ", ".join("'" + p.replace("'", "''") + "'" for p in paths) + "]"
+
+
+def landing_source(files, layout):
+    """SELECT de uma linha por mensagem (coluna `m`) com o schema explícito"""
+    if layout == "array":
+        return (f"SELECT json AS m FROM read_json({sql_list(files)}, format = 'array', "
+                f"columns = {{'json': '{WAHA_MESSAGE_TYPE}'}}, records = false)")
+    return (f"SELECT payload AS m FROM read_json({sql_list(files)}, format = 'newline_delimited', "
+            f"columns = {{'device': 'VARCHAR', 'chat_id': 'VARCHAR', 'payload': '{WAHA_MESSAGE_TYPE}'}}, "
+            f"ignore_errors = true)")
+
+
+def copy_partitioned(con, select_sql, dest):
+    """COPY particionado por `date`; retorna o nº de linhas gravadas.
+
+    Se o COPY falhar, os arquivos parciais desta execução são removidos.
+    """
+    os.makedirs(dest, exist_ok=True)
+    run_tag = uuid.uuid4().hex[:8]
+    try:
+        return con.execute(f"""
+            COPY ({select_sql}) TO '{dest}'
+            (FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (date), OVERWRITE_OR_IGNORE,
+             FILENAME_PATTERN 'part-{run_tag}-{{i}}')
+        """).fetchone()[0]
+    except duckdb.Error:
+        for partial in glob.glob(os.path.join(dest, "**", f"part-{run_tag}-*"), recursive=True):
+            os.remove(partial)
+        raise
+
+
+def invalid_files(con, files, layout):
+    """Arquivos que o read_json não consegue ler sozinhos"""
+    invalid = []
+    for path in files:
+        try:
+            con.execute(f"SELECT count(*) FROM ({landing_source([path], layout)})").fetchone()
+        except duckdb.Error as e:
+            print(f"✗ Arquivo inválido ignorado: {path} ({str(e).splitlines()[0][:120]})")
+            invalid.append(path)
+    return invalid
+
+
+def bronze(con, files, dest, layout):
+    """Landing -> bronze; arquivos malformados são isolados e o resto é carregado"""
+    try:
+        return _bronze(con, files, dest, layout)
+    except duckdb.InvalidInputException:
+        # ignore_errors só vale para NDJSON; um JSON array quebrado derruba o lote inteiro
+        bad = set(invalid_files(con, files, layout))
+        if not bad:
+            raise
+        return _bronze(con, [f for f in files if f not in bad], dest, layout)
+
+
+def _bronze(con, files, dest, layout):
+    select_sql = f"""
+        SELECT
+            m.id AS id,
+            m."timestamp" AS "timestamp",
+            m."from" AS chat,
+            m.fromMe AS from_me,
+            m.participant AS participant,
+            m.body AS body,
+            m.hasMedia AS has_media,
+            m._data.Info.Chat AS info_chat,
+            m._data.Info.Sender AS sender,
+            m._data.Info.SenderAlt AS sender_alt,
+            m._data.Message.extendedTextMessage.text AS text,
+            m._data.Message.extendedTextMessage.title AS title,
+            m._data.Message.extendedTextMessage.description AS description,
+            m._data.Message.imageMessage.caption AS caption,
+            strftime(to_timestamp(m."timestamp") AT TIME ZONE '{TIMEZONE}', '%Y-%m-%d') AS date
+        FROM ({landing_source(files, layout)})
+        WHERE m.id IS NOT NULL
+    """
+    return copy_partitioned(con, select_sql, dest)
+
+
+def silver(con, bronze_dir, dest, dates=None, links_only=True):
+    """Mesma lógica da SILVER comentada no pipeline.ipynb"""
+    where = ["TRUE"]
+    if dates:
+        where.append("date IN (" + ", ".join(f"'{d}'" for d in dates) + ")")
+    if links_only:
+        where.append("(body like '%http%' OR body like '%www.%') AND (body not like '%whatsapp%')")
+    select_sql = f"""
+        SELECT DISTINCT
+            id,
+            date,
+            strftime(to_timestamp("timestamp") AT TIME ZONE '{TIMEZONE}', '%H:%M:%S') as time,
+            substring((split(sender_alt, ':'))[1], 0, 3) as country_code,
+            substring((split(sender_alt, ':'))[1], 3, 2) as state_code,
+            replace(substring((split(sender_alt, ':'))[1], 5, 9), '@', '') as tel_number,
+            replace(replace(body, chr(10), ' '), chr(13), ' ') as body,
+            replace(replace(text, chr(10), ' '), chr(13), ' ') as text,
+            replace(replace(title, chr(10), ' '), chr(13), ' ') as title,
+            replace(replace(description, chr(10), ' '), chr(13), ' ') as description,
+            replace(replace(caption, chr(10), ' '), chr(13), ' ') as caption
+        FROM read_parquet('{os.path.join(bronze_dir, "**", "*.parquet")}', hive_partitioning = true)
+        WHERE {" AND ".join(where)}
+    """
+    return copy_partitioned(con, select_sql, dest)
+
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    rows = func(*args, **kwargs)
+    secs = time.perf_counter() - started
+    print(f"✓ {label}: {rows:,} linhas em {secs:.1f}s ({rows / secs if secs else 0:,.0f} linhas/s)")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bronze/silver locais com DuckDB")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--memory-limit", default="4GB")
+    parser.add_argument("--temp-directory", default=None, help="spill em disco quando passar do limite de memória")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_bronze = sub.add_parser("bronze", help="landing (JSON) -> bronze (Parquet por data)")
+    p_bronze.add_argument("landing", help="glob dos arquivos do landing")
+    p_bronze.add_argument("bronze_dir")
+    p_bronze.add_argument("--layout", choices=LAYOUTS, default="array")
+
+    p_silver = sub.add_parser("silver", help="bronze -> silver")
+    p_silver.add_argument("bronze_dir")
+    p_silver.add_argument("silver_dir")
+    p_silver.add_argument("--date", action="append", help="restringe a uma data (pode repetir)")
+    p_silver.add_argument("--all-messages", action="store_true", help="não filtra só mensagens com link")
+
+    p_all = sub.add_parser("all", help="landing -> bronze -> silver")
+    p_all.add_argument("landing")
+    p_all.add_argument("bronze_dir")
+    p_all.add_argument("silver_dir")
+    p_all.add_argument("--layout", choices=LAYOUTS, default="array")
+    p_all.add_argument("--all-messages", action="store_true")
+
+    args = parser.parse_args()
+    con = connect(args.threads, args.memory_limit, args.temp_directory)
+    print(f"DuckDB {duckdb.__version__} | threads={args.threads} | memory_limit={args.memory_limit}")
+
+    if args.command in ("bronze", "all"):
+        files = sorted(glob.glob(args.landing, recursive=True))
+        if not files:
+            print(f"✗ Nenhum arquivo em {args.landing}")
+            exit(1)
+        print(f"{len(files)} arquivos no landing")
+        timed("bronze", bronze, con, files, args.bronze_dir, args.layout)
+
+    if args.command in ("silver", "all"):
+        timed("silver", silver, con, args.bronze_dir, args.silver_dir,
+              dates=getattr(args, "date", None), links_only=not args.all_messages)
+
+
+if __name__ == "__main__":
+    main()
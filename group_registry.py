@@ -0,0 +1,374 @@
+"""Registro compilado de grupos/canais e afiliados.
+
+Os metadados dos grupos estão espalhados em vários CSVs (csv/Pasta1_ATUALIZADO.csv,
+grupos_novos.csv, grupos_platinum.csv, os "... - Grupos - VALIDADO.csv" com `;`
+e BOM, e dados_afiliados.csv), relidos com pandas pelos notebooks e filtrados
+com df.query; o gold ainda faz `split(base.id, '_')[1] = grupos.id_api`
+contra a base_grupos. Aqui:
+
+- `compile` normaliza todas as fontes numa linha por convite (código do link),
+  com precedência Pasta1_ATUALIZADO > grupos_platinum > grupos_novos >
+  VALIDADO: JIDs "QUEBRADO"/vazios viram NULL, aff_id vira inteiro e os
+  atributos do afiliado (dados_afiliados) vêm junto;
+- o artefato é um SQLite (tabela `groups` com índices em group_jid, device,
+  cust_id e class, mais `meta`) e um Parquet com as colunas da base_grupos
+  (aff_id, class_atual, tipo_link, link, id_api, grupo) e os atributos
+  novos; groups_by_jid.parquet tem uma linha por id_api (com link
+  duplicado do mesmo grupo vale o monitorado), que é o que vai para a
+  base_grupos com `bq load` / --bq-table, sem duplicar mensagens no join;
+- `id_api` é a chave de junção já calculada: o JID do chat, que é o
+  `split(id, '_')[1]` do id da mensagem (ver join_key);
+- GroupRegistry carrega o SQLite inteiro em dicionários (poucos ms) e
+  responde por JID, código, device, cust_id e classe em O(1).
+
+Uso:
+    python group_registry.py compile --out registry/
+    python group_registry.py compile --out registry/ --bq-table projeto_meli.base_grupos
+    python group_registry.py lookup registry/registry.db 120363424523362434@g.us
+
+    from group_registry import GroupRegistry
+    reg = GroupRegistry.load("registry/registry.db")
+    reg.by_jid("120363424523362434@g.us")  # -> {'aff_id': 1156678, 'class_atual': 'Bronze', ...}
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv")
+DB_NAME = "registry.db"
+PARQUET_NAME = "registry.parquet"
+# uma linha por JID (chave do join do gold), para a base_grupos
+JID_PARQUET_NAME = "groups_by_jid.parquet"
+
+# (arquivo, delimitador, mapeamento coluna do registro -> coluna da fonte), em ordem de precedência
+SOURCES = [
+    ("Pasta1_ATUALIZADO.csv", ",", {
+        "cust_id": "cust_id", "class_atual": "Classificação Atual", "tipo_link": "tipo_link",
+        "link": "link Whatsapp", "group_jid": "group_id", "group_name": "group_name",
+        "monitorado": "monitorado", "device": "device",
+    }),
+    ("grupos_platinum.csv", ",", {
+        "cust_id": "aff_if", "class_atual": "class_atual", "tipo_link": "tipo_link",
+        "link": "link", "group_jid": "id", "group_name": "name",
+    }),
+    ("grupos_novos.csv", ",", {
+        "cust_id": "aff_if", "class_atual": "class_atual", "tipo_link": "tipo_link",
+        "link": "link", "group_jid": "id", "group_name": "name",
+    }),
+    ("Platinum - Grupos - VALIDADO.csv", ";", {
+        "cust_id": "cust_id", "class_atual": "Classificação Atual", "tipo_link": "STATUS", "link": "LINK_OK",
+    }),
+    ("Novos - Grupos - VALIDADO.csv", ";", {
+        "cust_id": "cust_id", "class_atual": "Classificação Atual", "tipo_link": "STATUS", "link": "LINK_OK",
+    }),
+]
+AFFILIATES_SOURCE = "dados_afiliados.csv"
+AFFILIATE_COLUMNS = {
+    "affiliate_segment": "Affiliate_segment", "affiliate_username": "Afiiliate_Username",
+    "tier": "Tier", "kam_lead": "KAM Lead", "kam": "KAM",
+}
+
+# (coluna, tipo SQLite, tipo Arrow); as seis primeiras são as da base_grupos
+COLUMNS = [
+    ("aff_id", "INTEGER", "int64"),
+    ("class_atual", "TEXT", "string"),
+    ("tipo_link", "TEXT", "string"),
+    ("link", "TEXT", "string"),
+    ("id_api", "TEXT", "string"),
+    ("grupo", "TEXT", "string"),
+    ("invite_code", "TEXT", "string"),
+    ("device", "TEXT", "string"),
+    ("monitorado", "TEXT", "string"),
+    ("source", "TEXT", "string"),
+    ("affiliate_segment", "TEXT", "string"),
+    ("affiliate_username", "TEXT", "string"),
+    ("tier", "TEXT", "string"),
+    ("kam_lead", "TEXT", "string"),
+    ("kam", "TEXT", "string"),
+]
+COLUMN_NAMES = [name for name, _, _ in COLUMNS]
+INDEXED_COLUMNS = {"id_api": "group_jid", "device": "device", "aff_id": "cust_id", "class_atual": "class"}
+
+
+def invite_code(link):
+    return str(link or "").strip().split("?")[0].rstrip("/").split("/")[-1]
+
+
+def join_key(message_id):
+    """JID do chat a partir do id da mensagem WAHA (`split(id, '_')[1]` do gold)"""
+    parts = (message_id or "").split("_")
+    return parts[1] if len(parts) > 1 else None
+
+
+def clean_jid(value):
+    value = (value or "").strip()
+    return value if "@" in value else None
+
+
+def clean_int(value):
+    value = (value or "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def clean_kind(value):
+    value = (value or "").strip().lower()
+    if value.startswith("grupo"):
+        return "Grupo"
+    if value.startswith("canal"):
+        return "Canal"
+    return None
+
+
+def read_source(path, delimiter):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f, delimiter=delimiter))
+
+
+def load_affiliates(csv_dir):
+    path = os.path.join(csv_dir, AFFILIATES_SOURCE)
+    if not os.path.exists(path):
+        return {}
+    affiliates = {}
+    for row in read_source(path, ","):
+        aff_id = clean_int(row.get("ID"))
+        if aff_id is not None:
+            affiliates[aff_id] = {col: (row.get(src) or "").strip() or None for col, src in AFFILIATE_COLUMNS.items()}
+    return affiliates
+
+
+def build_rows(csv_dir=CSV_DIR):
+    """Uma linha por código de convite; cada campo vem da fonte de maior precedência que o tiver"""
+    merged = {}
+    used = []
+    for name, delimiter, mapping in SOURCES:
+        path = os.path.join(csv_dir, name)
+        if not os.path.exists(path):
+            print(f"[WARN] Fonte ausente: {path}")
+            continue
+        used.append(path)
+        for raw in read_source(path, delimiter):
+            code = invite_code(raw.get(mapping["link"]))
+            if not code:
+                continue
+            values = {
+                "aff_id": clean_int(raw.get(mapping["cust_id"])),
+                "class_atual": (raw.get(mapping["class_atual"]) or "").strip() or None,
+                "tipo_link": clean_kind(raw.get(mapping["tipo_link"])),
+                "link": (raw.get(mapping["link"]) or "").strip() or None,
+                "id_api": clean_jid(raw.get(mapping.get("group_jid", ""))),
+                "grupo": None,
+                "device": (raw.get(mapping.get("device", "")) or "").strip() or None,
+                "monitorado": (raw.get(mapping.get("monitorado", "")) or "").strip() or None,
+            }
+            if values["id_api"]:
+                values["grupo"] = (raw.get(mapping["group_name"]) or "").strip() or None
+            row = merged.setdefault(code, {"invite_code": code, "source": name})
+            for column, value in values.items():
+                if row.get(column) is None and value is not None:
+                    row[column] = value
+
+    affiliates = load_affiliates(csv_dir)
+    if affiliates:
+        used.append(os.path.join(csv_dir, AFFILIATES_SOURCE))
+    rows = []
+    for row in merged.values():
+        row.update(affiliates.get(row.get("aff_id"), {}))
+        rows.append(tuple(row.get(column) for column in COLUMN_NAMES))
+    rows.sort(key=lambda r: (r[COLUMN_NAMES.index("id_api")] is None, r[COLUMN_NAMES.index("invite_code")]))
+    return rows, used
+
+
+def sources_digest(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            digest.update(os.path.basename(path).encode() + b"\0" + f.read())
+    return digest.hexdigest()[:16]
+
+
+def write_sqlite(path, rows, meta):
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    columns_ddl = ", ".join(f"{name} {sql_type}" for name, sql_type, _ in COLUMNS)
+    conn.execute(f"CREATE TABLE groups ({columns_ddl}, PRIMARY KEY (invite_code)) WITHOUT ROWID")
+    conn.executemany(f"INSERT INTO groups VALUES ({', '.join('?' for _ in COLUMNS)})", rows)
+    for column, label in INDEXED_COLUMNS.items():
+        conn.execute(f"CREATE INDEX idx_groups_{label} ON groups ({column})")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    # troca atômica: leitores (ex.: o listener) nunca veem um arquivo pela metade
+    os.replace(tmp, path)
+
+
+def replaces(current_monitorado, candidate_monitorado):
+    """Link duplicado do mesmo grupo: o monitorado substitui o que não é"""
+    return current_monitorado != "Sim" and candidate_monitorado == "Sim"
+
+
+def one_per_jid(rows):
+    """Uma linha por id_api, na ordem de invite_code (a mesma do SQLite que o GroupRegistry lê)"""
+    jid_index = COLUMN_NAMES.index("id_api")
+    monitorado_index = COLUMN_NAMES.index("monitorado")
+    code_index = COLUMN_NAMES.index("invite_code")
+    by_jid = {}
+    for row in sorted(rows, key=lambda r: r[code_index]):
+        jid = row[jid_index]
+        if not jid:
+            continue
+        current = by_jid.get(jid)
+        if current is None or replaces(current[monitorado_index], row[monitorado_index]):
+            by_jid[jid] = row
+    return list(by_jid.values())
+
+
+def write_parquet(path, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, getattr(pa, arrow_type)()) for name, _, arrow_type in COLUMNS])
+    columns = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+    table = pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                 schema=schema)
+    pq.write_table(table, f"{path}.tmp", compression="zstd")
+    os.replace(f"{path}.tmp", path)
+
+
+def load_bigquery(parquet_path, table_id):
+    """Substitui a tabela (ex.: projeto_meli.base_grupos) pelo Parquet de uma linha por JID"""
+    from google.cloud import bigquery
+
+    client = bigquery.Client()
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    with open(parquet_path, "rb") as f:
+        client.load_table_from_file(f, table_id, job_config=job_config).result()
+
+
+def compile_registry(out, csv_dir=CSV_DIR, parquet=True):
+    """Gera <out>/registry.db (e os Parquets); retorna (linhas, caminho do SQLite)"""
+    os.makedirs(out, exist_ok=True)
+    rows, used = build_rows(csv_dir)
+    meta = {
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sources": [os.path.basename(p) for p in used],
+        "sources_digest": sources_digest(used),
+        "rows": len(rows),
+    }
+    db_path = os.path.join(out, DB_NAME)
+    write_sqlite(db_path, rows, meta)
+    if parquet:
+        write_parquet(os.path.join(out, PARQUET_NAME), rows)
+        write_parquet(os.path.join(out, JID_PARQUET_NAME), one_per_jid(rows))
+    return rows, db_path
+
+
+class GroupRegistry:
+    """Registro em memória: dicionários por JID, código de convite, device, cust_id e classe"""
+
+    def __init__(self, rows, meta=None):
+        self.rows = rows
+        self.meta = meta or {}
+        self._by_code = {}
+        self._by_jid = {}
+        self._by_device = defaultdict(list)
+        self._by_cust_id = defaultdict(list)
+        self._by_class = defaultdict(list)
+        for row in rows:
+            self._by_code[row["invite_code"]] = row
+            jid = row["id_api"]
+            if jid:
+                current = self._by_jid.get(jid)
+                if current is None or replaces(current["monitorado"], row["monitorado"]):
+                    self._by_jid[jid] = row
+            if row["device"]:
+                self._by_device[row["device"]].append(row)
+            if row["aff_id"] is not None:
+                self._by_cust_id[row["aff_id"]].append(row)
+            if row["class_atual"]:
+                self._by_class[row["class_atual"]].append(row)
+
+    @classmethod
+    def load(cls, db_path):
+        # immutable: o artefato só é trocado por inteiro (os.replace), nunca editado
+        uri = f"file:{os.path.abspath(db_path)}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute(f"SELECT {', '.join(COLUMN_NAMES)} FROM groups")]
+            meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+        finally:
+            conn.close()
+        return cls(rows, meta)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def by_jid(self, jid):
+        return self._by_jid.get(jid)
+
+    def by_message_id(self, message_id):
+        return self._by_jid.get(join_key(message_id))
+
+    def by_code(self, code):
+        return self._by_code.get(code)
+
+    def by_device(self, device):
+        return self._by_device.get(device, [])
+
+    def by_cust_id(self, cust_id):
+        return self._by_cust_id.get(clean_int(str(cust_id)), [])
+
+    def by_class(self, class_atual):
+        return self._by_class.get(class_atual, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro compilado de grupos e afiliados")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_compile = sub.add_parser("compile", help="CSVs -> registry.db + registry.parquet")
+    p_compile.add_argument("--csv-dir", default=CSV_DIR)
+    p_compile.add_argument("--out", default="registry")
+    p_compile.add_argument("--no-parquet", action="store_true")
+    p_compile.add_argument("--bq-table", default=None,
+                           help="carrega o Parquet de uma linha por JID nessa tabela (WRITE_TRUNCATE)")
+
+    p_lookup = sub.add_parser("lookup", help="consulta por JID, id de mensagem ou código de convite")
+    p_lookup.add_argument("db")
+    p_lookup.add_argument("key")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+
+    if args.command == "compile":
+        rows, db_path = compile_registry(args.out, args.csv_dir, parquet=not args.no_parquet)
+        with_jid = sum(1 for r in rows if r[COLUMN_NAMES.index("id_api")])
+        print(f"✓ {len(rows)} convites ({with_jid} com JID) em {time.perf_counter() - started:.2f}s -> {db_path}")
+        if args.bq_table:
+            if args.no_parquet:
+                parser.error("--bq-table requer os Parquets (sem --no-parquet)")
+            load_bigquery(os.path.join(args.out, JID_PARQUET_NAME), args.bq_table)
+            print(f"✓ Carregado em {args.bq_table}")
+        return
+
+    registry = GroupRegistry.load(args.db)
+    loaded = time.perf_counter() - started
+    row = registry.by_jid(args.key) or registry.by_message_id(args.key) or registry.by_code(args.key)
+    print(f"Registro com {len(registry)} convites carregado em {loaded * 1000:.1f} ms")
+    print(json.dumps(row, ensure_ascii=False, indent=2) if row else "✗ Não encontrado")
+
+
+if __name__ == "__main__":
+    main()
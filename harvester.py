@@ -0,0 +1,326 @@
+"""Coleta concorrente de mensagens dos grupos nas instâncias WAHA.
+
+Substitui o laço do get_data.ipynb (um `requests.get` por grupo, em série,
+com limit=1000 e sem filtro de data, gravando JSON indentado por grupo):
+
+- um pool assíncrono de workers por instância WAHA (coluna `device` do CSV
+  de grupos), cada instância com seu próprio token bucket, para não
+  disparar requisições demais no mesmo número de WhatsApp;
+- retomada por chat: o estado guarda o maior timestamp já coletado (e os ids
+  nesse mesmo segundo), e só as mensagens novas são paginadas com
+  `filter.timestamp.gte`;
+- saída em streaming, compacta, em NDJSON (uma mensagem por linha) ou
+  Parquet, um arquivo por instância e execução em <out>/<YYYYMMDD>/.
+
+O estado só avança depois que as páginas do chat estão em disco: no NDJSON,
+cada chat termina com fsync e o estado é salvo na hora; no Parquet (que só
+fica legível depois do rodapé), as marcas d'água dos chats são aplicadas
+quando o arquivo é fechado. Se a coleta cair no meio, a próxima execução
+repete só os chats ainda não confirmados (as duplicatas são removidas pela
+chave de mensagem na carga).
+
+As requisições usam o AsyncWahaClient do waha_client (pool keep-alive,
+retentativas com backoff e Retry-After); o token bucket é o do waha_client.
+
+Requer aiohttp (e pyarrow para --format parquet).
+
+Uso:
+    python harvester.py --groups "csv/Pasta1_ATUALIZADO.csv" --out landing --rate 2 --workers 4
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from waha_client import AsyncWahaClient, TokenBucket, parse_instances
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+# Variáveis de ambiente
+# - WAHA_INSTANCES: device=url separados por vírgula (padrão: instâncias do get_data.ipynb)
+# - WAHA_API_KEY: enviado em X-Api-Key
+# - WAHA_BEARER_TOKEN (opcional): enviado como Authorization: Bearer (Cloud Run com IAM)
+# - WAHA_SESSION (opcional; padrão "default")
+# - WAHA_MAX_ATTEMPTS (opcional; tentativas por página, padrão 5)
+WAHA_API_KEY = os.getenv("WAHA_API_KEY", "")
+WAHA_BEARER_TOKEN = os.getenv("WAHA_BEARER_TOKEN", "")
+WAHA_SESSION = os.getenv("WAHA_SESSION", "default")
+MAX_ATTEMPTS = int(os.getenv("WAHA_MAX_ATTEMPTS", "5"))
+REQUEST_TIMEOUT = 60
+
+
+class HarvestState:
+    """Marca d'água por chat: {chat_id: {"ts": int, "ids": [ids com timestamp == ts]}}"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.chats = json.load(f)
+        except FileNotFoundError:
+            self.chats = {}
+
+    def get(self, chat_id):
+        return self.chats.get(chat_id) or {"ts": None, "ids": []}
+
+    def update(self, chat_id, ts, ids):
+        self.chats[chat_id] = {"ts": ts, "ids": sorted(ids)}
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.chats, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+class NdjsonSink:
+    # cada chat termina com fsync: a marca d'água pode ser salva logo em seguida
+    durable_per_chat = True
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        self.count = 0
+
+    def write(self, device, chat_id, messages):
+        for message in messages:
+            self._file.write(dumps({"device": device, "chat_id": chat_id, "payload": message}))
+            self._file.write(b"\n")
+        self.count += len(messages)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class ParquetSink:
+    """Colunas de identificação extraídas + o payload compacto em `raw`.
+
+    Grava um row group a cada `batch_rows` linhas, nunca por chat; o arquivo
+    só é legível depois de close().
+    """
+
+    durable_per_chat = False
+
+    def __init__(self, path, batch_rows=5000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.path = path
+        self.batch_rows = batch_rows
+        self.schema = pa.schema([
+            ("device", pa.string()), ("chat_id", pa.string()), ("id", pa.string()),
+            ("timestamp", pa.int64()), ("from", pa.string()), ("body", pa.string()), ("raw", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self._rows = defaultdict(list)
+        self.count = 0
+
+    def write(self, device, chat_id, messages):
+        for message in messages:
+            self._rows["device"].append(device)
+            self._rows["chat_id"].append(chat_id)
+            self._rows["id"].append(message.get("id"))
+            self._rows["timestamp"].append(message.get("timestamp"))
+            self._rows["from"].append(message.get("from"))
+            self._rows["body"].append(message.get("body"))
+            self._rows["raw"].append(dumps(message).decode("utf-8"))
+        self.count += len(messages)
+        if len(self._rows["id"]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self._rows["id"]:
+            self._writer.write_table(self.pa.Table.from_pydict(dict(self._rows), schema=self.schema))
+            self._rows.clear()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class InstanceHarvester:
+    """Workers de uma instância WAHA, compartilhando o cliente HTTP e o token bucket"""
+
+    def __init__(self, device, base_url, client, sink, state, args):
+        self.device = device
+        self.base_url = base_url
+        self.client = client
+        self.sink = sink
+        self.state = state
+        self.page_size = args.page_size
+        self.max_pages = args.max_pages
+        self.workers = args.workers
+        self.default_since = args.default_since
+        self.bucket = TokenBucket(args.rate, args.burst)
+        self.requests = 0
+        self.errors = 0
+        self.chats_done = 0
+        # marcas d'água de chats cujas mensagens ainda não estão em disco (Parquet)
+        self.pending_state = []
+
+    async def _get_page(self, chat_id, since, offset):
+        await self.bucket.acquire()
+        self.requests += 1
+        return await self.client.get_messages(self.base_url, chat_id, limit=self.page_size,
+                                              offset=offset, since=since)
+
+    async def harvest_chat(self, chat_id):
+        state = self.state.get(chat_id)
+        since = state["ts"] if state["ts"] is not None else self.default_since
+        seen_at_since = set(state["ids"])
+        high_ts, high_ids = state["ts"], set(state["ids"])
+
+        offset = 0
+        for _ in range(self.max_pages):
+            page = await self._get_page(chat_id, since, offset)
+            if not page:
+                break
+            offset += len(page)
+            # mensagens no mesmo segundo da marca d'água já coletadas na execução anterior
+            new = [m for m in page if not (m.get("timestamp") == since and m.get("id") in seen_at_since)]
+            self.sink.write(self.device, chat_id, new)
+            for message in new:
+                ts = message.get("timestamp")
+                if ts is None:
+                    continue
+                if high_ts is None or ts > high_ts:
+                    high_ts, high_ids = ts, {message.get("id")}
+                elif ts == high_ts:
+                    high_ids.add(message.get("id"))
+            if len(page) < self.page_size:
+                break
+
+        if high_ts is None:
+            return
+        if self.sink.durable_per_chat:
+            self.sink.flush()
+            self.state.update(chat_id, high_ts, high_ids)
+            self.state.save()
+        else:
+            self.pending_state.append((chat_id, high_ts, high_ids))
+
+    def commit_pending_state(self):
+        """Aplica as marcas d'água retidas, depois que o sink foi fechado"""
+        for chat_id, ts, ids in self.pending_state:
+            self.state.update(chat_id, ts, ids)
+        self.pending_state = []
+
+    async def _worker(self, queue):
+        while True:
+            try:
+                chat_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self.harvest_chat(chat_id)
+                self.chats_done += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"✗ [{self.device}] {chat_id}: {e}")
+
+    async def run(self, chat_ids):
+        queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+        await asyncio.gather(*(self._worker(queue) for _ in range(self.workers)))
+
+
+def load_groups(path, monitored_only=True):
+    """{device: [group_id]} a partir do CSV de grupos (group_id, device, monitorado)"""
+    groups = defaultdict(list)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            if monitored_only and (row.get("monitorado") or "").strip().lower() not in ("sim", ""):
+                continue
+            group_id, device = (row.get("group_id") or "").strip(), (row.get("device") or "").strip()
+            if group_id and device and group_id not in groups[device]:
+                groups[device].append(group_id)
+    return groups
+
+
+async def harvest(args):
+    instances = parse_instances(os.getenv("WAHA_INSTANCES"))
+    groups = load_groups(args.groups, monitored_only=not args.all_groups)
+    if args.device:
+        groups = {d: g for d, g in groups.items() if d in args.device}
+
+    day_dir = os.path.join(args.out, datetime.now(timezone.utc).strftime("%Y%m%d"))
+    os.makedirs(day_dir, exist_ok=True)
+    run_id = datetime.now(timezone.utc).strftime("%H%M%S")
+    state = HarvestState(args.state)
+
+    # use_id_token=False: a autenticação é só X-Api-Key/Bearer, como antes
+    client = AsyncWahaClient(list(instances.values()), api_key=WAHA_API_KEY, bearer_token=WAHA_BEARER_TOKEN,
+                             use_id_token=False, session=WAHA_SESSION, timeout=REQUEST_TIMEOUT,
+                             max_attempts=MAX_ATTEMPTS, pool_size=args.workers)
+    harvesters = []
+    for device, chat_ids in sorted(groups.items()):
+        if device not in instances:
+            print(f"✗ Instância sem URL configurada: {device} ({len(chat_ids)} grupos ignorados)")
+            continue
+        extension = "parquet" if args.format == "parquet" else "ndjson"
+        path = os.path.join(day_dir, f"landing_{device}_{run_id}.{extension}")
+        sink = ParquetSink(path) if args.format == "parquet" else NdjsonSink(path)
+        harvesters.append((InstanceHarvester(device, instances[device], client, sink, state, args), chat_ids))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(h.run(chat_ids) for h, chat_ids in harvesters))
+    finally:
+        await client.close()
+        for h, _ in harvesters:
+            h.sink.close()
+            h.commit_pending_state()
+        state.save()
+
+    secs = time.perf_counter() - started
+    total = 0
+    for h, chat_ids in harvesters:
+        total += h.sink.count
+        print(f"{'✓' if not h.errors else '✗'} {h.device}: {h.chats_done}/{len(chat_ids)} grupos, "
+              f"{h.sink.count:,} mensagens, {h.requests} requisições, {h.errors} erros -> {h.sink.path}")
+    print(f"Total: {total:,} mensagens em {secs:.1f}s")
+    return 1 if any(h.errors for h, _ in harvesters) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleta incremental de mensagens dos grupos nas instâncias WAHA")
+    parser.add_argument("--groups", default=os.path.join("csv", "Pasta1_ATUALIZADO.csv"))
+    parser.add_argument("--device", action="append", help="restringe a uma instância (pode repetir)")
+    parser.add_argument("--all-groups", action="store_true", help="inclui grupos com monitorado != Sim")
+    parser.add_argument("--out", default="landing")
+    parser.add_argument("--state", default=None, help="arquivo de marca d'água (padrão: <out>/harvest_state.json)")
+    parser.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    parser.add_argument("--workers", type=int, default=4, help="workers por instância")
+    parser.add_argument("--rate", type=float, default=2.0, help="requisições por segundo por instância")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-pages", type=int, default=100, help="páginas por chat por execução")
+    parser.add_argument("--since-hours", type=float, default=48, help="janela inicial para chats sem marca d'água")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    args.state = args.state or os.path.join(args.out, "harvest_state.json")
+    args.default_since = int((datetime.now(timezone.utc) - timedelta(hours=args.since_hours)).timestamp())
+    exit(asyncio.run(harvest(args)))
+
+
+if __name__ == "__main__":
+    main()
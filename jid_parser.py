@@ -0,0 +1,178 @@
+"""contry_code / state_code / tel_number a partir do par (sender, chat).
+
+Reproduz os três CASE do queries.sql numa passada só. O SQL refaz os mesmos
+split/SUBSTRING em cada coluna. Há duas variantes:
+
+    silver  SILVER diária e bq_pipeline/transforms.silver_select
+    batch   INSERT DO BATCH (BATCH_PHONE_COLUMNS): além do @newsletter, zera
+            o par 'N/A'/'N/A' e o chat com '@' quando não há sender
+
+`sender` é o _data.Info.SenderAlt e `chat` o _data.Info.Chat (sender2 no SQL).
+Nulos viram 'N/A' como no COALESCE. Para o trecho do telefone, o SQL usa
+SUBSTRING(x, 5, length(split(x, ':')[0]) - 4), que é o mesmo que
+split(x, ':')[0] a partir do 5º caractere. Quando esse trecho tem menos de 4
+caracteres, o comprimento fica negativo: o BigQuery falha a query inteira, e
+aqui o resultado vira NULL.
+Não há ramo próprio para @lid: um SenderAlt @lid segue o caminho normal do
+sender, como no SQL.
+
+Os mesmos remetentes se repetem o tempo todo, então o JidParser memoriza
+(LRU) o resultado por sender/chat. parse_arrays faz o mesmo de forma
+vetorizada com pyarrow.compute, para colunas inteiras: os split/SUBSTRING
+rodam só nos valores distintos (dictionary_encode) e são expandidos por take.
+
+Uso:
+    from jid_parser import JidParser, parse_table
+    JidParser().parse("5511987654321:12@s.whatsapp.net", "1203...@g.us")  # ('55', '11', '987654321')
+    parse_table(bronze)  # + contry_code, state_code, tel_number
+"""
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+VARIANTS = ("silver", "batch")
+MISSING = "N/A"
+NEWSLETTER = "@newsletter"
+NULLS = (None, None, None)
+DEFAULT_CACHE_SIZE = 1 << 16
+OUTPUT_COLUMNS = ("contry_code", "state_code", "tel_number")
+
+
+def _check_variant(variant):
+    if variant not in VARIANTS:
+        raise ValueError(f"variante desconhecida: {variant!r} (use {', '.join(VARIANTS)})")
+
+
+def _substring(value, position, length):
+    """SUBSTRING do BigQuery (posição 1-based; 0 conta como 1)"""
+    if length < 0:
+        return None
+    start = position - 1 if position > 0 else 0
+    return value[start:start + length]
+
+
+def parse_reference(sender, chat, variant="silver"):
+    """Tradução literal dos três CASE, coluna a coluna (referência para testes e benchmark)"""
+    _check_variant(variant)
+    sender = MISSING if sender is None else sender
+    sender2 = MISSING if chat is None else chat
+
+    def null_guard():
+        if variant == "batch":
+            if "@" in sender2 and len(sender) < 2:
+                return True
+            if sender == MISSING and sender2 == MISSING:
+                return True
+        return NEWSLETTER in sender2
+
+    def case(pick):
+        if null_guard():
+            return None
+        if len(sender) > 2:
+            return pick(sender.split("@")[0])
+        if len(sender) < 2 and len(sender2) > 2:
+            return pick(sender2.split("-")[0])
+        return None
+
+    return (
+        case(lambda x: _substring(x, 0, 2)),
+        case(lambda x: _substring(x, 3, 2)),
+        case(lambda x: _substring(x, 5, len(x.split(":")[0]) - 4)),
+    )
+
+
+def split_fields(base):
+    """(contry_code, state_code, tel_number) do trecho já recortado do JID"""
+    head = base.split(":", 1)[0]
+    return base[:2], base[2:4], head[4:] if len(head) >= 4 else None
+
+
+class JidParser:
+    """Parser escalar com memo LRU por sender (e por chat, no caso sem sender)"""
+
+    def __init__(self, variant="silver", cache_size=DEFAULT_CACHE_SIZE):
+        _check_variant(variant)
+        self.variant = variant
+        self._from_sender = lru_cache(maxsize=cache_size)(lambda s: split_fields(s.split("@", 1)[0]))
+        self._from_chat = lru_cache(maxsize=cache_size)(lambda s: split_fields(s.split("-", 1)[0]))
+
+    def parse(self, sender, chat):
+        sender = MISSING if sender is None else sender
+        chat = MISSING if chat is None else chat
+        if NEWSLETTER in chat:
+            return NULLS
+        batch = self.variant == "batch"
+        if len(sender) > 2:
+            if batch and sender == MISSING and chat == MISSING:
+                return NULLS
+            return self._from_sender(sender)
+        if len(sender) < 2 and len(chat) > 2 and not (batch and "@" in chat):
+            return self._from_chat(chat)
+        return NULLS
+
+    def parse_many(self, pairs):
+        parse = self.parse
+        return [parse(sender, chat) for sender, chat in pairs]
+
+    def cache_info(self):
+        return {"sender": self._from_sender.cache_info(), "chat": self._from_chat.cache_info()}
+
+
+def _strings(values):
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if not isinstance(values, pa.Array):
+        values = pa.array(values, type=pa.string())
+    elif values.type != pa.string():
+        values = values.cast(pa.string())
+    return pc.fill_null(values, MISSING)
+
+
+def _before(values, delimiter):
+    return pc.list_element(pc.split_pattern(values, delimiter, max_splits=1), 0)
+
+
+def _distinct_fields(values, delimiter):
+    """split_fields de cada valor distinto, expandido de volta para as linhas"""
+    encoded = pc.dictionary_encode(values)
+    base = _before(encoded.dictionary, delimiter)
+    head = _before(base, ":")
+    fields = (
+        pc.utf8_slice_codeunits(base, 0, 2),
+        pc.utf8_slice_codeunits(base, 2, 4),
+        pc.if_else(pc.greater_equal(pc.utf8_length(head), 4), pc.utf8_slice_codeunits(head, 4),
+                   pa.scalar(None, pa.string())),
+    )
+    return [pc.take(field, encoded.indices) for field in fields]
+
+
+def parse_arrays(sender, chat, variant="silver"):
+    """Versão vetorizada: (contry_code, state_code, tel_number) como pyarrow arrays"""
+    _check_variant(variant)
+    sender, chat = _strings(sender), _strings(chat)
+    null = pa.scalar(None, pa.string())
+    sender_len, chat_len = pc.utf8_length(sender), pc.utf8_length(chat)
+
+    valid = pc.invert(pc.match_substring(chat, NEWSLETTER))
+    use_sender = pc.and_(valid, pc.greater(sender_len, 2))
+    use_chat = pc.and_(valid, pc.and_(pc.less(sender_len, 2), pc.greater(chat_len, 2)))
+    if variant == "batch":
+        both_missing = pc.and_(pc.equal(sender, MISSING), pc.equal(chat, MISSING))
+        use_sender = pc.and_(use_sender, pc.invert(both_missing))
+        use_chat = pc.and_(use_chat, pc.invert(pc.match_substring(chat, "@")))
+
+    from_sender = _distinct_fields(sender, "@")
+    from_chat = _distinct_fields(chat, "-")
+    return tuple(
+        pc.if_else(use_sender, by_sender, pc.if_else(use_chat, by_chat, null))
+        for by_sender, by_chat in zip(from_sender, from_chat)
+    )
+
+
+def parse_table(table, sender="sender_alt", chat="chat", variant="silver"):
+    """Tabela/lote Arrow com contry_code, state_code e tel_number adicionadas (colunas do bronze por padrão)"""
+    columns = parse_arrays(table.column(sender), table.column(chat), variant)
+    for name, column in zip(OUTPUT_COLUMNS, columns):
+        table = table.append_column(name, column)
+    return table
@@ -0,0 +1,220 @@
+"""Extração incremental das mensagens do gows.db (store SQLite do WAHA GOWS).
+
+O teste_lite.ipynb filtra com `date(timestamp) = '...'` e
+`substr(jid, instr(jid, '@') + 1) in (...)` sobre a tabela inteira (nenhum
+índice serve) e carrega tudo via pd.read_sql_query. Aqui:
+
+- o banco é aberto só para leitura (mode=ro, ou immutable=1 para cópias
+  paradas), sem disputar lock com o WAHA;
+- a leitura é paginada por keyset em rowid (`rowid > ? ORDER BY rowid
+  LIMIT ?`, busca direta na b-tree) a partir da marca d'água salva, então o
+  custo é proporcional às mensagens novas;
+- cada página vai direto para ParquetWriters (um por data), sem pandas;
+- para extrair datas antigas, `prepare` copia o banco (backup API) e cria na
+  cópia um índice sobre as mesmas expressões de data e sufixo do JID usadas
+  no filtro, que o SQLite passa a usar no lugar do full scan.
+
+Uso:
+    python limpeza_sql_lite/gows_extract.py extract D:/TESTE/gows.db D:/TESTE/gows_parquet
+    python limpeza_sql_lite/gows_extract.py prepare D:/TESTE/gows.db D:/TESTE/gows_idx.db
+    python limpeza_sql_lite/gows_extract.py extract D:/TESTE/gows_idx.db D:/TESTE/out --date 2026-04-27 --no-watermark
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TABLE = "gows_messages"
+JID_SUFFIXES = ("g.us", "newsletter", "lid")
+WATERMARK_NAME = "_gows_watermark.json"
+
+# expressões do filtro do notebook; o índice do `prepare` usa exatamente estas
+JID_SUFFIX_EXPR = "substr(jid, instr(jid, '@') + 1)"
+DATE_EXPR = "date(timestamp)"
+INDEX_NAME = "idx_gows_messages_suffix_date"
+
+SCHEMA = pa.schema([
+    ("rowid", pa.int64()),
+    ("id", pa.string()),
+    ("date", pa.string()),
+    ("time", pa.string()),
+    ("sender", pa.string()),
+    ("sender2", pa.string()),
+    ("body", pa.string()),
+    ("caption", pa.string()),
+    ("category", pa.string()),
+])
+
+SELECT_COLUMNS = f"""
+    rowid,
+    jid as id,
+    {DATE_EXPR} as date,
+    time(timestamp) as time,
+    coalesce(json_extract(data, '$.Info.SenderAlt'), 'N/A') as sender,
+    coalesce(json_extract(data, '$.Info.Chat'), 'N/A') as sender2,
+    coalesce(json_extract(data, '$.RawMessage.extendedTextMessage.text'), 'N/A') as body,
+    coalesce(json_extract(data, '$.Message.imageMessage.caption'), 'N/A') as caption,
+    'to_process' as category
+"""
+
+
+def open_readonly(path, immutable=False):
+    uri = f"file:{os.path.abspath(path)}?mode=ro" + ("&immutable=1" if immutable else "")
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def build_query(suffixes, dates):
+    where = ["rowid > ?"]
+    params = []
+    if suffixes:
+        where.append(f"{JID_SUFFIX_EXPR} IN ({', '.join('?' for _ in suffixes)})")
+        params.extend(suffixes)
+    if dates:
+        where.append(f"{DATE_EXPR} IN ({', '.join('?' for _ in dates)})")
+        params.extend(dates)
+    sql = f"SELECT {SELECT_COLUMNS} FROM {TABLE} WHERE {' AND '.join(where)} ORDER BY rowid LIMIT ?"
+    return sql, params
+
+
+def query_plan(conn, sql, params):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [0, *params, 1]).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+class DateWriters:
+    """Um ParquetWriter por data em <out>/date=YYYY-MM-DD/, .tmp até close()"""
+
+    def __init__(self, out, run_id):
+        self.out = out
+        self.run_id = run_id
+        self._writers = {}
+
+    def write(self, rows):
+        by_date = defaultdict(list)
+        for row in rows:
+            by_date[row[2] or "unknown"].append(row)
+        for day, day_rows in by_date.items():
+            if day not in self._writers:
+                directory = os.path.join(self.out, f"date={day}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"gows-{self.run_id}.parquet")
+                self._writers[day] = (path, pq.ParquetWriter(f"{path}.tmp", SCHEMA, compression="zstd"))
+            columns = list(zip(*day_rows))
+            self._writers[day][1].write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, SCHEMA)], schema=SCHEMA))
+
+    def close(self):
+        for path, writer in self._writers.values():
+            writer.close()
+            os.replace(f"{path}.tmp", path)
+        return sorted(self._writers)
+
+    def abort(self):
+        for path, writer in self._writers.values():
+            writer.close()
+            os.remove(f"{path}.tmp")
+
+
+def read_watermark(out):
+    try:
+        with open(os.path.join(out, WATERMARK_NAME), encoding="utf-8") as f:
+            return json.load(f).get("last_rowid", 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(out, last_rowid):
+    path = os.path.join(out, WATERMARK_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"last_rowid": last_rowid}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def extract(db_path, out, batch_size=20000, suffixes=JID_SUFFIXES, dates=None,
+            use_watermark=True, immutable=False):
+    """Extrai as mensagens com rowid acima da marca d'água; retorna (linhas, último rowid, datas)"""
+    os.makedirs(out, exist_ok=True)
+    last_rowid = read_watermark(out) if use_watermark else 0
+    conn = open_readonly(db_path, immutable)
+    sql, params = build_query(suffixes, dates)
+    print(f"Plano: {query_plan(conn, sql, params)}")
+
+    writers = DateWriters(out, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}")
+    total = 0
+    try:
+        while True:
+            rows = conn.execute(sql, [last_rowid, *params, batch_size]).fetchall()
+            if not rows:
+                break
+            writers.write(rows)
+            total += len(rows)
+            last_rowid = rows[-1][0]
+            if len(rows) < batch_size:
+                break
+    except BaseException:
+        writers.abort()
+        raise
+    finally:
+        conn.close()
+
+    days = writers.close()
+    if use_watermark:
+        write_watermark(out, last_rowid)
+    return total, last_rowid, days
+
+
+def prepare(db_path, dest):
+    """Copia o banco (backup API, consistente mesmo com o WAHA escrevendo) e indexa as expressões do filtro"""
+    source = open_readonly(db_path)
+    target = sqlite3.connect(dest)
+    source.backup(target)
+    source.close()
+    target.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {TABLE} ({JID_SUFFIX_EXPR}, {DATE_EXPR})")
+    target.execute("ANALYZE")
+    target.commit()
+    target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extração incremental do gows.db para Parquet")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_extract = sub.add_parser("extract", help="gows.db -> Parquet por data")
+    p_extract.add_argument("db")
+    p_extract.add_argument("out")
+    p_extract.add_argument("--batch-size", type=int, default=20000)
+    p_extract.add_argument("--date", action="append", help="só essas datas (YYYY-MM-DD; pode repetir)")
+    p_extract.add_argument("--suffix", action="append", help=f"sufixos de JID (padrão: {', '.join(JID_SUFFIXES)})")
+    p_extract.add_argument("--no-watermark", action="store_true", help="lê do início e não grava a marca d'água")
+    p_extract.add_argument("--immutable", action="store_true", help="cópia parada do banco (dispensa locks/WAL)")
+
+    p_prepare = sub.add_parser("prepare", help="copia o banco e cria o índice de sufixo/data na cópia")
+    p_prepare.add_argument("db")
+    p_prepare.add_argument("dest")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+
+    if args.command == "prepare":
+        prepare(args.db, args.dest)
+        print(f"✓ Cópia indexada em {args.dest} ({time.perf_counter() - started:.1f}s)")
+        return
+
+    rows, last_rowid, days = extract(
+        args.db, args.out, args.batch_size, tuple(args.suffix or JID_SUFFIXES), args.date,
+        use_watermark=not args.no_watermark, immutable=args.immutable)
+    secs = time.perf_counter() - started
+    print(f"✓ {rows:,} mensagens em {secs:.1f}s ({rows / secs if secs else 0:,.0f}/s) | "
+          f"último rowid: {last_rowid} | datas: {', '.join(days) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
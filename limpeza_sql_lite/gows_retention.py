@@ -0,0 +1,220 @@
+"""Retenção/compactação online do gows.db, com o container do WAHA no ar.
+
+As células de limpeza do teste_lite.ipynb fazem um único
+`DELETE FROM gows_messages WHERE date(timestamp) != ...`, seguido de
+wal_checkpoint(TRUNCATE), VACUUM e integrity_check, segurando o lock do
+banco da sessão por muito tempo. Aqui:
+
+- os rowids a apagar são achados fora de transação de escrita (no WAL,
+  leitores não bloqueiam o WAHA) e apagados em lotes pequenos, cada um em
+  uma transação curta (BEGIN IMMEDIATE ... COMMIT), com pausa entre lotes;
+- o espaço é devolvido com `PRAGMA incremental_vacuum(N)` em passos
+  pequenos, em vez de VACUUM completo (requer auto_vacuum=INCREMENTAL; a
+  conversão, que precisa de um VACUUM único, é feita com
+  --enable-incremental, de preferência com o WAHA parado);
+- checkpoints PASSIVE periódicos, que nunca esperam leitores/escritores;
+- ao final informa linhas apagadas, páginas liberadas e o maior tempo de
+  lock de escrita.
+
+Uso:
+    python limpeza_sql_lite/gows_retention.py D:/TESTE/gows.db --keep-days 2
+    python limpeza_sql_lite/gows_retention.py D:/TESTE/gows.db --keep-date 2026-04-28 --batch-size 500 --pause 0.05
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class LockTimer:
+    """Mede quanto tempo cada transação de escrita segura o lock"""
+
+    def __init__(self):
+        self.holds = []
+
+    def run(self, conn, func):
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.holds.append(time.perf_counter() - started)
+        return result
+
+    def run_script(self, conn, script):
+        """Como run(), para comandos que só rodam até o fim via executescript"""
+        started = time.perf_counter()
+        try:
+            # o executescript faz COMMIT de transação aberta antes de rodar,
+            # então o BEGIN/COMMIT vão dentro do próprio script
+            conn.executescript(f"BEGIN IMMEDIATE; {script}; COMMIT;")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self.holds.append(time.perf_counter() - started)
+
+    @property
+    def worst_ms(self):
+        return max(self.holds, default=0) * 1000
+
+    @property
+    def p95_ms(self):
+        if not self.holds:
+            return 0
+        ordered = sorted(self.holds)
+        return ordered[int(0.95 * (len(ordered) - 1))] * 1000
+
+
+def connect(path, busy_timeout_ms):
+    # isolation_level=None: as transações são controladas explicitamente
+    conn = sqlite3.connect(path, isolation_level=None, timeout=busy_timeout_ms / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    return conn
+
+
+def pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def retention_filter(keep_date, keep_days):
+    """(expressão WHERE, parâmetros) das linhas que saem"""
+    if keep_date:
+        return "date(timestamp) != ?", [keep_date]
+    # N dias contando hoje: --keep-days 1 mantém só hoje
+    cutoff = (date.today() - timedelta(days=max(1, keep_days) - 1)).isoformat()
+    return "date(timestamp) < ?", [cutoff]
+
+
+def delete_in_batches(conn, timer, table, where, params, batch_size, pause, checkpoint_every):
+    """Apaga em lotes por faixa de rowid; retorna o nº de linhas apagadas"""
+    deleted = 0
+    last_rowid = 0
+    batches = 0
+    while True:
+        # leitura fora da transação de escrita
+        rowids = [r[0] for r in conn.execute(
+            f"SELECT rowid FROM {table} WHERE rowid > ? AND {where} ORDER BY rowid LIMIT ?",
+            [last_rowid, *params, batch_size],
+        )]
+        if not rowids:
+            break
+        last_rowid = rowids[-1]
+
+        def delete():
+            # o filtro é reaplicado: a linha pode ter mudado entre a leitura e o lock
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN ({','.join('?' for _ in rowids)}) AND {where}",
+                [*rowids, *params],
+            )
+            return cursor.rowcount
+
+        deleted += timer.run(conn, delete)
+        batches += 1
+        if checkpoint_every and batches % checkpoint_every == 0:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        if batches % 50 == 0:
+            print(f"  {deleted:,} linhas apagadas ({batches} lotes, pior lock {timer.worst_ms:.1f} ms)")
+        time.sleep(pause)
+    return deleted
+
+
+def incremental_vacuum(conn, timer, step_pages, pause):
+    """Devolve as páginas livres ao sistema em passos pequenos; retorna páginas liberadas.
+
+    No sqlite3 do Python, execute() dá um único passo no incremental_vacuum
+    (o pragma não devolve colunas), liberando uma página por chamada; o
+    executescript roda o pragma até o fim, liberando `step_pages` páginas.
+    """
+    freed = 0
+    while True:
+        free = pragma(conn, "freelist_count")
+        if not free:
+            break
+
+        timer.run_script(conn, f"PRAGMA incremental_vacuum({min(step_pages, free)})")
+        now_free = pragma(conn, "freelist_count")
+        if now_free >= free:
+            break
+        freed += free - now_free
+        time.sleep(pause)
+    return freed
+
+
+def enable_incremental(conn):
+    """Conversão única para auto_vacuum=INCREMENTAL (exige um VACUUM completo)"""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retenção online do gows.db em lotes curtos")
+    parser.add_argument("db")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--keep-days", type=int, help="mantém só os últimos N dias, contando hoje")
+    group.add_argument("--keep-date", help="mantém só essa data (YYYY-MM-DD), como no notebook")
+    parser.add_argument("--table", default="gows_messages")
+    parser.add_argument("--batch-size", type=int, default=1000, help="linhas por transação")
+    parser.add_argument("--pause", type=float, default=0.05, help="segundos entre lotes (deixa o WAHA escrever)")
+    parser.add_argument("--vacuum-step", type=int, default=256, help="páginas por incremental_vacuum")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="lotes entre checkpoints PASSIVE")
+    parser.add_argument("--busy-timeout", type=int, default=5000, help="ms esperando o lock do WAHA")
+    parser.add_argument("--enable-incremental", action="store_true",
+                        help="converte para auto_vacuum=INCREMENTAL (VACUUM único; pare o WAHA antes)")
+    parser.add_argument("--check", action="store_true", help="PRAGMA quick_check ao final")
+    args = parser.parse_args()
+
+    conn = connect(args.db, args.busy_timeout)
+    if pragma(conn, "journal_mode") != "wal":
+        print("[WARN] Banco fora do modo WAL: leitores e escritores vão se bloquear")
+
+    if args.enable_incremental and pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+        print("Convertendo para auto_vacuum=INCREMENTAL (VACUUM único)...")
+        enable_incremental(conn)
+
+    size_before = file_size(args.db)
+    pages_before = pragma(conn, "page_count")
+    page_size = pragma(conn, "page_size")
+    timer = LockTimer()
+    started = time.perf_counter()
+
+    where, params = retention_filter(args.keep_date, args.keep_days)
+    deleted = delete_in_batches(conn, timer, args.table, where, params,
+                                args.batch_size, args.pause, args.checkpoint_every)
+    print(f"✓ {deleted:,} linhas apagadas em {len(timer.holds)} lotes")
+
+    freed = 0
+    if pragma(conn, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+        freed = incremental_vacuum(conn, timer, args.vacuum_step, args.pause)
+    else:
+        print(f"[WARN] auto_vacuum não é INCREMENTAL: {pragma(conn, 'freelist_count'):,} páginas livres "
+              "ficam no arquivo para reuso (use --enable-incremental uma vez)")
+
+    busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if args.check:
+        result = pragma(conn, "quick_check")
+        print(f"{'✓' if result == 'ok' else '✗'} quick_check: {result}")
+
+    pages_after = pragma(conn, "page_count")
+    conn.close()
+    secs = time.perf_counter() - started
+    print(f"✓ Páginas liberadas: {freed:,} ({freed * page_size / 1024 / 1024:,.1f} MB) | "
+          f"page_count {pages_before:,} -> {pages_after:,}")
+    print(f"  Arquivo (db + wal): {size_before / 1024 / 1024:,.1f} MB -> {file_size(args.db) / 1024 / 1024:,.1f} MB")
+    print(f"  Checkpoint PASSIVE: {checkpointed}/{wal_pages} páginas do WAL{' (ocupado)' if busy else ''}")
+    print(f"  Lock de escrita: pior {timer.worst_ms:.1f} ms | p95 {timer.p95_ms:.1f} ms | "
+          f"{len(timer.holds)} transações em {secs:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
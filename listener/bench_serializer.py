@@ -0,0 +1,96 @@
+"""Micro-benchmark do caminho de serialização do webhook.
+
+Compara o CPU por requisição do caminho antigo (json da stdlib + SHA-256 do
+payload inteiro) com o atual (serializer + identity_key + repasse dos bytes).
+
+Uso:
+    python bench_serializer.py [webhooks.ndjson] [--repeat 2000]
+
+O arquivo NDJSON deve ter um corpo de webhook do WAHA por linha (ex.: exportado
+do bucket raw/waha_events/). Sem arquivo, usa um payload sintético de exemplo.
+"""
+import argparse, hashlib, json, time
+
+import serializer
+from dedup import identity_key
+
+SAMPLE_WEBHOOK = {
+    "event": "message",
+    "session": "default",
+    "payload": {
+        "from": "120363424523362434@g.us",
+        "fromMe": False,
+        "participant": "5511987654321@s.whatsapp.net",
+        "timestamp": 1773411825,
+        "body": "🔥 OFERTA Air Fryer 4L por R$ 199 https://mercadolivre.com/sec/1abc2de cupom: MELI10",
+        "hasMedia": True,
+        "media": {"mimetype": "image/jpeg", "data": "A" * 60_000},
+        "_data": {
+            "Info": {
+                "Chat": "120363424523362434@g.us",
+                "Sender": "5511987654321@s.whatsapp.net",
+                "SenderAlt": "5511987654321@s.whatsapp.net",
+                "Timestamp": "2026-03-13T14:23:45-03:00",
+                "Type": "media",
+            },
+            "Message": {"imageMessage": {"caption": "Air Fryer 4L", "JPEGThumbnail": "B" * 8_000}},
+        },
+    },
+}
+
+
+def legacy_path(raw_body: bytes) -> bytes:
+    body = json.loads(raw_body) or {}
+    event = body.get("event") or "message"
+    payload = body.get("payload") or body
+    key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    msg_id = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    envelope = {"event": event, "message_id": msg_id, "payload": payload}
+    return json.dumps(envelope, ensure_ascii=False).encode("utf-8")
+
+
+def current_path(raw_body: bytes) -> bytes:
+    body = serializer.loads(raw_body) or {}
+    event = body.get("event") or "message"
+    payload = body.get("payload") or body
+    msg_id = identity_key(payload)
+    payload_bytes = serializer.raw_payload(raw_body, body)
+    if payload_bytes is not None:
+        return serializer.envelope_bytes(event, msg_id, payload_bytes)
+    return serializer.dumps({"event": event, "message_id": msg_id, "payload": payload})
+
+
+def load_bodies(path):
+    if not path:
+        return [json.dumps(SAMPLE_WEBHOOK, ensure_ascii=False).encode("utf-8")]
+    with open(path, "rb") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def measure(fn, bodies, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        for raw_body in bodies:
+            fn(raw_body)
+    return (time.process_time() - start) / (repeat * len(bodies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="NDJSON com corpos de webhook gravados")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    bodies = load_bodies(args.path)
+    avg_bytes = sum(len(b) for b in bodies) / len(bodies)
+    print(f"{len(bodies)} payload(s), média de {avg_bytes:,.0f} bytes | backend: {serializer.BACKEND}"
+          f" | msgspec: {serializer.MSGSPEC_AVAILABLE}")
+
+    legacy = measure(legacy_path, bodies, args.repeat)
+    current = measure(current_path, bodies, args.repeat)
+    print(f"  legado : {legacy * 1e6:8.1f} µs CPU/requisição")
+    print(f"  atual  : {current * 1e6:8.1f} µs CPU/requisição ({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import hashlib, json, threading, time
+from collections import OrderedDict
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == "xxhash" and XXHASH_AVAILABLE:
+        return xxhash.xxh3_128()
+    if algorithm == "sha256":
+        return hashlib.sha256()
+    return hashlib.blake2b(digest_size=16)
+
+
+def identity_key(payload: dict, algorithm: str = "blake2b", event: str = "message") -> str:
+    """Deriva um ID estável só dos campos de identidade do evento.
+
+    Usa tipo do evento, chat, remetente, timestamp e corpo, sem serializar o
+    payload inteiro (que pode trazer mídia em base64). Eventos sem corpo
+    (ex.: session.status, mídia sem legenda) são identificados pelo payload
+    completo: só chat/remetente/segundo fariam eventos diferentes colidirem.
+    """
+    data = payload.get("_data") or {}
+    info = (data.get("Info") or {}) if isinstance(data, dict) else {}
+
+    fields = (
+        info.get("Chat") or payload.get("from"),
+        info.get("Sender") or info.get("SenderAlt") or payload.get("participant"),
+        info.get("Timestamp") or payload.get("timestamp"),
+        payload.get("body"),
+    )
+
+    hasher = _new_hasher(algorithm)
+    hasher.update(str(event).encode("utf-8"))
+    hasher.update(b"\x1f")
+    if fields[-1] is None:
+        hasher.update(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"))
+        return hasher.hexdigest()
+    for value in fields:
+        hasher.update(b"" if value is None else str(value).encode("utf-8"))
+        hasher.update(b"\x1f")
+    return hasher.hexdigest()
+
+
+class DedupCache:
+    """Cache LRU com TTL de message_ids já publicados (thread-safe)"""
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def check_and_add(self, key: str) -> bool:
+        """Retorna True se a chave já foi vista dentro do TTL; senão registra e retorna False"""
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                self._entries.move_to_end(key)
+                return True
+
+            self._entries[key] = now + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return False
+
+    def discard(self, key: str):
+        """Esquece a chave (ex.: publicação falhou e o reenvio deve passar)"""
+        with self._lock:
+            self._entries.pop(key, None)
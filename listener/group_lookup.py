@@ -0,0 +1,103 @@
+import os, sqlite3, threading, time
+
+# Atributos de grupo/afiliado/device por JID do chat, lidos do registry.db
+# compilado por group_registry.py (python group_registry.py compile --out registry).
+#
+# O mapa fica em memória e é trocado por inteiro a cada recarga (atribuição de
+# referência), então o webhook só faz um dict.get, sem lock nem I/O. A thread
+# de recarga confere o mtime/tamanho do arquivo a cada `check_interval` e
+# relê também quando passa `ttl` desde a última carga (ex.: volume montado do
+# GCS, em que o mtime nem sempre muda).
+
+# coluna do registry -> campo no envelope (mesmos nomes do gold)
+FIELDS = (
+    ("aff_id", "aff_id"),
+    ("class_atual", "class"),
+    ("grupo", "group_name"),
+    ("tipo_link", "kind"),
+    ("device", "device"),
+    ("tier", "tier"),
+    ("affiliate_segment", "affiliate_segment"),
+    ("affiliate_username", "affiliate_username"),
+)
+
+
+def load_groups(path: str) -> dict:
+    """{jid: atributos} do registry.db; com link duplicado do mesmo grupo vale o monitorado"""
+    # immutable: o artefato só é trocado por inteiro (os.replace), nunca editado
+    uri = f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        columns = ", ".join(column for column, _ in FIELDS)
+        rows = conn.execute(
+            f"SELECT id_api, monitorado, {columns} FROM groups WHERE id_api IS NOT NULL "
+            "ORDER BY monitorado = 'Sim'"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    groups = {}
+    for jid, _, *values in rows:
+        # ORDER BY coloca os monitorados por último: sobrescrevem os demais
+        groups[jid] = {field: value for (_, field), value in zip(FIELDS, values)}
+    return groups
+
+
+class GroupLookup(threading.Thread):
+    """Mapa JID -> atributos do grupo, recarregado em background"""
+
+    def __init__(self, path: str, check_interval: float = 30, ttl: float = 3600, on_reload=None):
+        super().__init__(name="group-lookup", daemon=True)
+        self.path = path
+        self.check_interval = check_interval
+        self.ttl = ttl
+        self.on_reload = on_reload
+        self._groups = {}
+        self._signature = None
+        self._loaded_at = 0.0
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return len(self._groups)
+
+    def get(self, jid):
+        return self._groups.get(jid)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Relê o arquivo se mudou (ou se `force`); mantém o mapa anterior em caso de erro"""
+        signature = self._stat()
+        if signature is None:
+            if self._signature is not None:
+                print(f"[WARN] Registro de grupos sumiu, mantendo a versão carregada: {self.path}")
+            return False
+        if not force and signature == self._signature:
+            return False
+
+        try:
+            groups = load_groups(self.path)
+        except Exception as e:
+            print(f"[WARN] Falha ao carregar o registro de grupos {self.path}: {repr(e)}")
+            return False
+
+        self._groups = groups
+        self._signature = signature
+        self._loaded_at = time.monotonic()
+        print(f"[INFO] Registro de grupos carregado: {len(groups)} grupos | {self.path}")
+        if self.on_reload:
+            self.on_reload(len(groups))
+        return True
+
+    def stop(self, timeout: float = 5):
+        self._stopped.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self._stopped.wait(self.check_interval):
+            self.reload(force=time.monotonic() - self._loaded_at >= self.ttl)
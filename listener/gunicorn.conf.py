@@ -0,0 +1,48 @@
+import os, shutil
+
+# Configuração do gunicorn para o listener em produção.
+# Env vars:
+# - PORT (Cloud Run define automaticamente)
+# - GUNICORN_WORKERS (opcional; processos, default 2)
+# - GUNICORN_THREADS (opcional; threads por worker, default 8)
+# - GUNICORN_WORKER_CLASS (opcional; default "gthread". O cliente gRPC do Pub/Sub
+#   não é compatível com o monkey-patching do gevent, por isso gthread)
+# - GUNICORN_TIMEOUT (opcional; segundos, default 0 = sem timeout, recomendado no Cloud Run)
+# - PROMETHEUS_MULTIPROC_DIR (opcional; ativa a agregação de métricas entre workers)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5678')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "0"))
+graceful_timeout = 20
+accesslog = None
+# O app é carregado em cada worker depois do fork, nunca no master
+preload_app = False
+
+
+def on_starting(server):
+    """Limpa métricas de execuções anteriores antes de subir os workers"""
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Cria o PublisherClient e o exporter de métricas do worker"""
+    import teste_listener
+    teste_listener.init_worker()
+
+
+def worker_exit(server, worker):
+    """Descarrega o Pub/Sub e as métricas antes do worker sair"""
+    import teste_listener
+    teste_listener.shutdown_worker()
+
+
+def child_exit(server, worker):
+    """Marca o worker como morto para as métricas multiprocess"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,114 @@
+import base64, json, threading, time
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import generate_latest
+from prometheus_client.core import REGISTRY
+try:
+    from google.auth.transport.requests import Request
+    from google.oauth2 import id_token
+    GOOGLE_AUTH_AVAILABLE = True
+except ImportError:
+    GOOGLE_AUTH_AVAILABLE = False
+
+
+class IdTokenCache:
+    """Cache de ID token do Google, renovado pouco antes de expirar"""
+
+    def __init__(self, audience: str, refresh_margin: float = 300):
+        self.audience = audience
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _token_expiry(token: str) -> float:
+        # Lê o claim "exp" do JWT sem validar assinatura (só para saber quando renovar)
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+
+    def get(self) -> str:
+        if not GOOGLE_AUTH_AVAILABLE:
+            raise RuntimeError("google-auth não está instalado")
+
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at - self.refresh_margin:
+                token = id_token.fetch_id_token(Request(), self.audience)
+                try:
+                    expires_at = self._token_expiry(token)
+                except Exception:
+                    # token sem exp legível: ID tokens do Google valem 1h
+                    expires_at = time.time() + 3600
+                self._token, self._expires_at = token, expires_at
+            return self._token
+
+
+class MetricsExporter(threading.Thread):
+    """Envia as métricas ao Pushgateway em background.
+
+    O push acontece a cada `interval` segundos ou antes disso, quando
+    `notify()` foi chamado `change_threshold` vezes desde o último envio.
+    O caminho da requisição só chama `notify()`, que não faz I/O.
+    """
+
+    def __init__(self, pushgateway_url: str, job: str = "waha_listener", interval: float = 15,
+                 change_threshold: int = 100, use_gcp_auth: bool = False, registry=REGISTRY):
+        super().__init__(name="metrics-exporter", daemon=True)
+        self.url = f"{pushgateway_url.rstrip('/')}/metrics/job/{job}"
+        self.interval = interval
+        self.change_threshold = change_threshold
+        self.registry = registry
+        self.token_cache = IdTokenCache(pushgateway_url) if use_gcp_auth else None
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self._changes = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self, changes: int = 1):
+        """Registra alterações nas métricas; acorda o exporter ao atingir o limite"""
+        with self._lock:
+            self._changes += changes
+            if self._changes >= self.change_threshold:
+                self._wakeup.set()
+
+    def stop(self, timeout: float = 5):
+        """Faz um último push e encerra a thread"""
+        self._stopped.set()
+        self._wakeup.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.push()
+        self.push()
+
+    def push(self):
+        """Envia o estado atual do registry ao Pushgateway"""
+        with self._lock:
+            self._changes = 0
+
+        try:
+            headers = {'Content-Type': 'text/plain; charset=utf-8'}
+            if self.token_cache:
+                headers['Authorization'] = f'Bearer {self.token_cache.get()}'
+
+            response = self.session.post(
+                self.url,
+                data=generate_latest(self.registry),
+                headers=headers,
+                timeout=10
+            )
+
+            if response.status_code not in (200, 201, 202):
+                print(f"[WARN] Pushgateway retornou status {response.status_code}: {response.text}")
+
+        except Exception as e:
+            print(f"[WARN] Falha ao enviar métricas para Prometheus: {e}")
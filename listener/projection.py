@@ -0,0 +1,69 @@
+import gzip, threading
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Campos do payload lidos pelo silver em queries.sql (mais os textos usados no
+# protótipo DuckDB do pipeline.ipynb). Caminhos separados por ponto.
+DEFAULT_PROJECTION_FIELDS = (
+    "id",
+    "timestamp",
+    "from",
+    "body",
+    "_data.Info.SenderAlt",
+    "_data.Info.Chat",
+    "_data.Info.Timestamp",
+    "_data.Message.imageMessage.caption",
+    "_data.Message.extendedTextMessage.text",
+    "_data.Message.extendedTextMessage.title",
+    "_data.Message.extendedTextMessage.description",
+)
+
+# ZstdCompressor não pode ser usado por várias threads ao mesmo tempo
+_zstd_local = threading.local()
+
+
+def parse_fields(spec: str):
+    """Converte "a.b,c" em caminhos [("a", "b"), ("c",)]"""
+    fields = [f.strip() for f in spec.split(",") if f.strip()] if spec else DEFAULT_PROJECTION_FIELDS
+    return [tuple(f.split(".")) for f in fields]
+
+
+def project_payload(payload: dict, fields) -> dict:
+    """Monta um payload compacto só com os caminhos pedidos.
+
+    A estrutura aninhada é preservada, então os JSON paths do BigQuery
+    ($.payload._data.Info.Chat etc.) continuam valendo.
+    """
+    out = {}
+    for path in fields:
+        value = payload
+        for key in path:
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = value.get(key)
+        if value is None:
+            continue
+
+        node = out
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return out
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Comprime os dados publicados; o codec vai no atributo content_encoding"""
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("PUBSUB_COMPRESSION=zstd requer zstandard instalado")
+        compressor = getattr(_zstd_local, "compressor", None)
+        if compressor is None:
+            compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+        return compressor.compress(data)
+    return data
@@ -0,0 +1,72 @@
+import json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+# Camada de serialização do listener: usa orjson quando instalado e cai para a
+# stdlib quando não (ou quando o orjson recusa o dado, ex.: inteiros > 64 bits).
+
+BACKEND = "orjson" if ORJSON_AVAILABLE else "json"
+
+if MSGSPEC_AVAILABLE:
+    class _RawBody(msgspec.Struct):
+        # Só o "payload" é mantido como bytes crus, sem decodificar
+        payload: msgspec.Raw = msgspec.Raw(b"null")
+
+    _raw_body_decoder = msgspec.json.Decoder(_RawBody)
+
+
+def loads(data: bytes):
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def raw_payload(raw_body: bytes, body: dict):
+    """Retorna os bytes originais do payload do webhook, ou None se não der.
+
+    Replica `body.get("payload") or body`: sem "payload" o corpo inteiro é o
+    payload; com "payload" os bytes só são recortados se o msgspec estiver
+    instalado. `body` tem que ser o dict decodificado de `raw_body`: com corpo
+    vazio, inválido ou que não é objeto, serialize o payload em vez de usar isto.
+    """
+    if not body.get("payload"):
+        return raw_body.strip()
+    if MSGSPEC_AVAILABLE:
+        try:
+            return bytes(_raw_body_decoder.decode(raw_body).payload)
+        except msgspec.DecodeError:
+            return None
+    return None
+
+
+def envelope_bytes(event: str, msg_id: str, payload_bytes: bytes, extra: dict = None) -> bytes:
+    """Monta o envelope JSON embutindo o payload já serializado, sem re-encode.
+
+    `extra` são campos adicionais do envelope (ex.: instância e grupo),
+    gravados entre o message_id e o payload.
+    """
+    parts = [b'{"event":', dumps(event), b',"message_id":', dumps(msg_id)]
+    for key, value in (extra or {}).items():
+        parts += (b",", dumps(key), b":", dumps(value))
+    parts += (b',"payload":', payload_bytes, b"}")
+    return b"".join(parts)
@@ -0,0 +1,240 @@
+import fcntl, glob, os, shutil, struct, threading, time, zlib
+
+# Spool em disco (append-only) para eventos que não puderam ser publicados.
+#
+# Cada processo escreve em <SPOOL_DIR>/worker-<pid>/ segmentos seg-<seq>.log com
+# registros [tamanho u32][crc32 u32][dados]. Um arquivo .lock fica com flock
+# enquanto o processo vive; diretórios de workers mortos são adotados pelo
+# replay de outro processo. O progresso do replay de um segmento fica em
+# seg-<seq>.pos, então um restart não republica o que já foi drenado.
+
+HEADER = struct.Struct(">II")
+
+
+def read_records(path: str, offset: int = 0):
+    """Itera (offset_final, dados) a partir de `offset`; para em registro truncado/corrompido"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            length, crc = HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != crc:
+                return
+            yield f.tell(), data
+
+
+class Spool:
+    def __init__(self, base_dir: str, segment_bytes: int = 64 * 1024 * 1024,
+                 fsync_interval: float = 0.2, fsync_batch: int = 100):
+        self.base_dir = base_dir
+        self.dir = os.path.join(base_dir, f"worker-{os.getpid()}")
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock_file = open(os.path.join(self.dir, ".lock"), "w")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._active = None
+        self._active_size = 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self.depth = 0
+
+        # PID reaproveitado (ex.: restart do container com o mesmo volume)
+        for segment in sorted(glob.glob(os.path.join(self.dir, "seg-*.log"))):
+            self._seq = max(self._seq, int(os.path.basename(segment)[4:-4]))
+            self.depth += sum(1 for _ in read_records(segment, self._read_pos(segment)))
+
+    # --- escrita ---
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.dir, f"seg-{seq:012d}.log")
+
+    def _open_segment(self):
+        self._seq += 1
+        self._active = open(self._segment_path(self._seq), "ab")
+        self._active_size = 0
+
+    def _close_active(self):
+        if self._active:
+            self._fsync()
+            self._active.close()
+            self._active = None
+
+    def _fsync(self):
+        if self._active and self._unsynced:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def append(self, data: bytes):
+        """Grava um evento; o fsync é feito em lote (por quantidade ou intervalo)"""
+        with self._lock:
+            if self._active is None or self._active_size >= self.segment_bytes:
+                self._close_active()
+                self._open_segment()
+
+            record = HEADER.pack(len(data), zlib.crc32(data)) + data
+            self._active.write(record)
+            self._active_size += len(record)
+            self._unsynced += 1
+            self.depth += 1
+
+            if self._unsynced >= self.fsync_batch or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+
+    def flush(self):
+        """fsync dos registros pendentes (chamado periodicamente pelo replay)"""
+        with self._lock:
+            self._fsync()
+
+    def seal(self):
+        """Fecha o segmento ativo para que ele possa ser drenado"""
+        with self._lock:
+            self._close_active()
+
+    # --- leitura / replay ---
+
+    def adopt_orphans(self):
+        """Move para este processo os segmentos de workers que não existem mais"""
+        for other in glob.glob(os.path.join(self.base_dir, "worker-*")):
+            if other == self.dir:
+                continue
+            try:
+                lock_file = open(os.path.join(other, ".lock"), "a")
+            except OSError:
+                continue
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue  # worker ainda vivo
+
+            try:
+                for segment in sorted(glob.glob(os.path.join(other, "seg-*.log"))):
+                    offset = self._read_pos(segment)
+                    with self._lock:
+                        self._seq += 1
+                        target = self._segment_path(self._seq)
+                        self.depth += sum(1 for _ in read_records(segment, offset))
+                    os.rename(segment, target)
+                    if offset:
+                        self._write_pos(target, offset)
+                    if os.path.exists(segment + ".pos"):
+                        os.remove(segment + ".pos")
+                print(f"[INFO] Spool adotado de {other}")
+                shutil.rmtree(other, ignore_errors=True)
+            finally:
+                lock_file.close()
+
+    def sealed_segments(self):
+        with self._lock:
+            active = self._active.name if self._active else None
+        return [s for s in sorted(glob.glob(os.path.join(self.dir, "seg-*.log"))) if s != active]
+
+    @staticmethod
+    def _read_pos(segment: str) -> int:
+        try:
+            with open(segment + ".pos") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _write_pos(segment: str, offset: int):
+        tmp = segment + ".pos.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, segment + ".pos")
+
+    def drain_segment(self, segment: str, publish_batch, batch_size: int) -> bool:
+        """Republica um segmento em lotes; retorna False se um lote falhar"""
+        offset = self._read_pos(segment)
+        batch, batch_end = [], offset
+
+        def flush_batch():
+            if not batch:
+                return True
+            try:
+                publish_batch(batch)
+            except Exception as e:
+                print(f"[WARN] Replay do spool falhou: {repr(e)}")
+                return False
+            self._write_pos(segment, batch_end)
+            with self._lock:
+                self.depth -= len(batch)
+            batch.clear()
+            return True
+
+        for end, data in read_records(segment, offset):
+            batch.append(data)
+            batch_end = end
+            if len(batch) >= batch_size and not flush_batch():
+                return False
+        if not flush_batch():
+            return False
+
+        os.remove(segment)
+        if os.path.exists(segment + ".pos"):
+            os.remove(segment + ".pos")
+        return True
+
+
+class SpoolReplayer(threading.Thread):
+    """Drena o spool para o Pub/Sub a uma taxa controlada, com backoff em falha"""
+
+    def __init__(self, spool: Spool, publish_batch, rate: float = 200, on_depth=None):
+        super().__init__(name="spool-replayer", daemon=True)
+        self.spool = spool
+        self.publish_batch = publish_batch
+        self.rate = rate
+        self.on_depth = on_depth
+        self._stopped = threading.Event()
+
+    def stop(self, timeout: float = 5):
+        self._stopped.set()
+        self.join(timeout)
+
+    def run(self):
+        backoff = 1.0
+        # lotes de ~1s de vazão; a espera entre lotes mantém a taxa configurada
+        batch_size = max(1, int(self.rate))
+        while not self._stopped.is_set():
+            self.spool.flush()
+            self.spool.adopt_orphans()
+            if self.spool.depth > 0 and not self.spool.sealed_segments():
+                self.spool.seal()
+
+            ok = True
+            for segment in self.spool.sealed_segments():
+                ok = self.spool.drain_segment(segment, self._paced(batch_size), batch_size)
+                if not ok or self._stopped.is_set():
+                    break
+
+            if self.on_depth:
+                self.on_depth(self.spool.depth)
+
+            if ok:
+                backoff = 1.0
+                self._stopped.wait(1.0)
+            else:
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _paced(self, batch_size: int):
+        def publish(batch):
+            started = time.monotonic()
+            self.publish_batch(batch)
+            # respeita `rate` mensagens/segundo
+            remaining = len(batch) / self.rate - (time.monotonic() - started)
+            if remaining > 0:
+                self._stopped.wait(remaining)
+        return publish
@@ -1,24 +1,54 @@
-import os, json, hashlib, time
+import os, random, threading, time
 from flask import Flask, request, abort
 from google.api_core.exceptions import NotFound
 from google.cloud import pubsub_v1
-from prometheus_client import Counter, Histogram
-import requests
-try:
-    from google.auth.transport.requests import Request
-    from google.oauth2 import id_token
-    GOOGLE_AUTH_AVAILABLE = True
-except ImportError:
-    GOOGLE_AUTH_AVAILABLE = False
+from google.cloud.pubsub_v1.publisher.exceptions import FlowControlLimitError
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import REGISTRY
+import serializer
+from projection import compress, parse_fields, project_payload
+from spool import Spool, SpoolReplayer
+from dedup import DedupCache, identity_key
+from group_lookup import GroupLookup
+from metrics_exporter import GOOGLE_AUTH_AVAILABLE, MetricsExporter
 
 # Env vars esperadas:
 # - GCP_PROJECT (ex.: "meu-projeto")
 # - PUBSUB_TOPIC (ex.: "waha.events")
 # - WAHA_TOKEN (opcional; valida header X-WAHA-Token)
 # - PORT (Cloud Run define automaticamente)
+# - PROMETHEUS_MULTIPROC_DIR (opcional; diretório de métricas compartilhado entre workers do gunicorn)
 # - PROMETHEUS_ENABLED (opcional; default "false")
 # - PROMETHEUS_PUSHGATEWAY_URL (ex.: "https://pushgateway-xxxx.run.app")
 # - PROMETHEUS_USE_GCP_AUTH (opcional; default "false", para Cloud Run com IAM)
+# - PROMETHEUS_PUSH_INTERVAL (opcional; segundos entre pushes, default 15)
+# - PROMETHEUS_PUSH_CHANGES (opcional; nº de alterações que antecipa o push, default 100)
+# - DEDUP_ENABLED (opcional; default "true", descarta message_ids repetidos antes de publicar)
+# - DEDUP_CACHE_SIZE (opcional; máximo de IDs no cache, default 100000)
+# - DEDUP_TTL_SECONDS (opcional; default 3600)
+# - MESSAGE_ID_HASH (opcional; "blake2b" (default), "xxhash" ou "sha256" para IDs derivados)
+# - PAYLOAD_PROJECTION (opcional; default "false", publica só os campos usados no silver)
+# - PAYLOAD_PROJECTION_FIELDS (opcional; caminhos separados por vírgula, ex.: "body,_data.Info.Chat")
+# - PUBSUB_COMPRESSION (opcional; "none" (default), "gzip" ou "zstd". Só ative se o
+#   consumidor do tópico descomprimir conforme o atributo content_encoding)
+# - RAW_ARCHIVE_TOPIC (opcional; tópico que recebe o payload completo)
+# - RAW_ARCHIVE_SAMPLE_RATE (opcional; fração arquivada de 0 a 1, default 1.0)
+# - SPOOL_DIR (opcional; habilita o spool em disco para eventos que falharem ao publicar)
+# - SPOOL_SEGMENT_BYTES (opcional; tamanho dos segmentos, default 64 MiB)
+# - SPOOL_FSYNC_INTERVAL (opcional; segundos entre fsyncs em lote, default 0.2)
+# - SPOOL_REPLAY_RATE (opcional; mensagens/s republicadas quando o Pub/Sub volta, default 200)
+# - PUBSUB_ASYNC_PUBLISH (opcional; default "false", responde o webhook sem esperar o Pub/Sub)
+# - PUBSUB_BATCH_MAX_MESSAGES (opcional; default 100)
+# - PUBSUB_BATCH_MAX_BYTES (opcional; default 1000000)
+# - PUBSUB_BATCH_MAX_LATENCY (opcional; segundos, default 0.01)
+# - PUBSUB_FLOW_MAX_MESSAGES (opcional; máximo de mensagens em voo, default 1000)
+# - PUBSUB_FLOW_MAX_BYTES (opcional; máximo de bytes em voo, default 10000000)
+# - GROUP_REGISTRY_PATH (opcional; registry.db do group_registry.py. Habilita o campo
+#   "group" do envelope com aff_id, class, group_name etc. do chat)
+# - GROUP_REGISTRY_CHECK_SECONDS (opcional; intervalo de checagem do mtime do arquivo, default 30)
+# - GROUP_REGISTRY_TTL_SECONDS (opcional; recarga forçada mesmo sem mudança no mtime, default 3600)
+# A instância WAHA de origem vai no campo "instance" do envelope: configure o webhook de
+# cada instância com ?instance=<device> na URL ou com o header X-WAHA-Instance.
 
 PROJECT = os.getenv("GCP_PROJECT")
 TOPIC = os.getenv("PUBSUB_TOPIC")
@@ -26,6 +56,30 @@ WAHA_TOKEN = os.getenv("WAHA_TOKEN", "")
 PROMETHEUS_ENABLED = os.getenv("PROMETHEUS_ENABLED", "false").lower() == "true"
 PROMETHEUS_PUSHGATEWAY_URL = os.getenv("PROMETHEUS_PUSHGATEWAY_URL", "")
 PROMETHEUS_USE_GCP_AUTH = os.getenv("PROMETHEUS_USE_GCP_AUTH", "false").lower() == "true"
+PROMETHEUS_PUSH_INTERVAL = float(os.getenv("PROMETHEUS_PUSH_INTERVAL", "15"))
+PROMETHEUS_PUSH_CHANGES = int(os.getenv("PROMETHEUS_PUSH_CHANGES", "100"))
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", "3600"))
+MESSAGE_ID_HASH = os.getenv("MESSAGE_ID_HASH", "blake2b")
+PAYLOAD_PROJECTION = os.getenv("PAYLOAD_PROJECTION", "false").lower() == "true"
+PAYLOAD_PROJECTION_FIELDS = os.getenv("PAYLOAD_PROJECTION_FIELDS", "")
+PUBSUB_COMPRESSION = os.getenv("PUBSUB_COMPRESSION", "none").lower()
+RAW_ARCHIVE_TOPIC = os.getenv("RAW_ARCHIVE_TOPIC", "")
+RAW_ARCHIVE_SAMPLE_RATE = float(os.getenv("RAW_ARCHIVE_SAMPLE_RATE", "1.0"))
+SPOOL_DIR = os.getenv("SPOOL_DIR", "")
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+SPOOL_FSYNC_INTERVAL = float(os.getenv("SPOOL_FSYNC_INTERVAL", "0.2"))
+SPOOL_REPLAY_RATE = float(os.getenv("SPOOL_REPLAY_RATE", "200"))
+PUBSUB_ASYNC_PUBLISH = os.getenv("PUBSUB_ASYNC_PUBLISH", "false").lower() == "true"
+PUBSUB_BATCH_MAX_MESSAGES = int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", "100"))
+PUBSUB_BATCH_MAX_BYTES = int(os.getenv("PUBSUB_BATCH_MAX_BYTES", "1000000"))
+PUBSUB_BATCH_MAX_LATENCY = float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", "0.01"))
+PUBSUB_FLOW_MAX_MESSAGES = int(os.getenv("PUBSUB_FLOW_MAX_MESSAGES", "1000"))
+PUBSUB_FLOW_MAX_BYTES = int(os.getenv("PUBSUB_FLOW_MAX_BYTES", "10000000"))
+GROUP_REGISTRY_PATH = os.getenv("GROUP_REGISTRY_PATH", "")
+GROUP_REGISTRY_CHECK_SECONDS = float(os.getenv("GROUP_REGISTRY_CHECK_SECONDS", "30"))
+GROUP_REGISTRY_TTL_SECONDS = float(os.getenv("GROUP_REGISTRY_TTL_SECONDS", "3600"))
 
 if not PROJECT or not TOPIC:
     raise RuntimeError("Defina GCP_PROJECT e PUBSUB_TOPIC no ambiente.")
@@ -33,6 +87,9 @@ if not PROJECT or not TOPIC:
 if PROMETHEUS_ENABLED and not PROMETHEUS_PUSHGATEWAY_URL:
     raise RuntimeError("PROMETHEUS_ENABLED=true requer PROMETHEUS_PUSHGATEWAY_URL")
 
+if PUBSUB_COMPRESSION not in ("none", "gzip", "zstd"):
+    raise RuntimeError("PUBSUB_COMPRESSION deve ser none, gzip ou zstd")
+
 if PROMETHEUS_USE_GCP_AUTH and not GOOGLE_AUTH_AVAILABLE:
     raise RuntimeError("PROMETHEUS_USE_GCP_AUTH=true requer google-auth instalado")
 
@@ -49,74 +106,233 @@ pubsub_messages_published_total = Counter(
     ['status']
 )
 
+pubsub_messages_inflight = Gauge(
+    'waha_pubsub_inflight',
+    'Mensagens publicadas aguardando confirmação do Pub/Sub',
+    multiprocess_mode='livesum'
+)
+
+dedup_lookups_total = Counter(
+    'waha_dedup_lookups_total',
+    'Consultas ao cache de deduplicação de message_id',
+    ['result']
+)
+
+group_lookups_total = Counter(
+    'waha_group_lookups_total',
+    'Consultas ao registro de grupos para enriquecer o envelope',
+    ['result']
+)
+
+spool_depth = Gauge(
+    'waha_spool_depth',
+    'Eventos no spool local aguardando republicação',
+    multiprocess_mode='livesum'
+)
+
 webhook_duration_seconds = Histogram(
     'waha_webhook_duration_seconds',
     'Duração do processamento de webhooks',
     ['event_type']
 )
 
-def get_gcp_id_token(audience: str) -> str:
-    """Obtém token de identidade do Google para autenticação em Cloud Run"""
-    if not GOOGLE_AUTH_AVAILABLE:
-        raise RuntimeError("google-auth não está instalado")
-    
-    try:
-        auth_req = Request()
-        token = id_token.fetch_id_token(auth_req, audience)
-        return token
-    except Exception as e:
-        print(f"[ERROR] Falha ao obter token GCP: {e}")
-        raise
-
 def push_metrics_to_prometheus():
-    """Envia métricas para o Prometheus Pushgateway"""
-    if not PROMETHEUS_ENABLED:
+    """Sinaliza ao exporter em background que há métricas novas (sem I/O)"""
+    if metrics_exporter:
+        metrics_exporter.notify()
+
+# Batching e controle de fluxo do publisher: com LimitExceededBehavior.ERROR o
+# publish() falha na hora quando o buffer em voo está cheio, e o webhook
+# responde 503 para o WAHA tentar de novo mais tarde.
+batch_settings = pubsub_v1.types.BatchSettings(
+    max_messages=PUBSUB_BATCH_MAX_MESSAGES,
+    max_bytes=PUBSUB_BATCH_MAX_BYTES,
+    max_latency=PUBSUB_BATCH_MAX_LATENCY,
+)
+publisher_options = pubsub_v1.types.PublisherOptions(
+    flow_control=pubsub_v1.types.PublishFlowControl(
+        message_limit=PUBSUB_FLOW_MAX_MESSAGES,
+        byte_limit=PUBSUB_FLOW_MAX_BYTES,
+        limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior.ERROR,
+    )
+)
+
+topic_path = f"projects/{PROJECT}/topics/{TOPIC}"
+raw_archive_path = f"projects/{PROJECT}/topics/{RAW_ARCHIVE_TOPIC}" if RAW_ARCHIVE_TOPIC else None
+projection_fields = parse_fields(PAYLOAD_PROJECTION_FIELDS)
+
+# Estado por processo. Com gunicorn cada worker cria o próprio PublisherClient
+# e exporter depois do fork (canais gRPC e threads não sobrevivem ao fork).
+publisher = None
+metrics_exporter = None
+spool = None
+spool_replayer = None
+group_lookup = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+def init_worker():
+    """Cria o PublisherClient e o exporter de métricas do processo atual"""
+    global publisher, metrics_exporter, spool, spool_replayer, group_lookup, _worker_pid
+    if _worker_pid == os.getpid():
         return
-    
-    try:
-        from prometheus_client import CollectorRegistry, generate_latest
-        from prometheus_client.core import REGISTRY
-        
-        # Gera as métricas em formato Prometheus
-        metrics_data = generate_latest(REGISTRY)
-        
-        # URL do pushgateway
-        url = f"{PROMETHEUS_PUSHGATEWAY_URL.rstrip('/')}/metrics/job/waha_listener"
-        
-        headers = {'Content-Type': 'text/plain; charset=utf-8'}
-        
-        # Se usar autenticação GCP, adiciona o token
-        if PROMETHEUS_USE_GCP_AUTH:
-            try:
-                token = get_gcp_id_token(PROMETHEUS_PUSHGATEWAY_URL)
-                headers['Authorization'] = f'Bearer {token}'
-            except Exception as e:
-                print(f"[ERROR] Falha ao obter token de autenticação: {e}")
-                return
-        
-        # Envia as métricas via HTTP POST
-        response = requests.post(
-            url,
-            data=metrics_data,
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code not in (200, 201, 202):
-            print(f"[WARN] Pushgateway retornou status {response.status_code}: {response.text}")
-        
-    except Exception as e:
-        print(f"[WARN] Falha ao enviar métricas para Prometheus: {e}")
 
-publisher = pubsub_v1.PublisherClient()
-topic_path = publisher.topic_path(PROJECT, TOPIC)
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+
+        publisher = pubsub_v1.PublisherClient(batch_settings, publisher_options=publisher_options)
+        metrics_exporter = None
+        if PROMETHEUS_ENABLED:
+            metrics_exporter = MetricsExporter(
+                PROMETHEUS_PUSHGATEWAY_URL,
+                interval=PROMETHEUS_PUSH_INTERVAL,
+                change_threshold=PROMETHEUS_PUSH_CHANGES,
+                use_gcp_auth=PROMETHEUS_USE_GCP_AUTH,
+                registry=metrics_registry(),
+            )
+            metrics_exporter.start()
+        if SPOOL_DIR:
+            spool = Spool(SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_BYTES, fsync_interval=SPOOL_FSYNC_INTERVAL)
+            spool_replayer = SpoolReplayer(spool, publish_spooled, rate=SPOOL_REPLAY_RATE, on_depth=spool_depth.set)
+            spool_replayer.start()
+        if GROUP_REGISTRY_PATH:
+            # primeira carga aqui (startup do worker); as seguintes na thread
+            group_lookup = GroupLookup(GROUP_REGISTRY_PATH, check_interval=GROUP_REGISTRY_CHECK_SECONDS,
+                                       ttl=GROUP_REGISTRY_TTL_SECONDS)
+            group_lookup.reload(force=True)
+            group_lookup.start()
+        _worker_pid = os.getpid()
+
+def shutdown_worker():
+    """Descarrega os lotes pendentes do Pub/Sub e faz o último push de métricas"""
+    if _worker_pid != os.getpid():
+        return
+    if spool_replayer:
+        spool_replayer.stop()
+    if group_lookup:
+        group_lookup.stop()
+    if spool:
+        spool.seal()
+    if publisher:
+        publisher.stop()
+    if metrics_exporter:
+        metrics_exporter.stop()
+
+def metrics_registry():
+    """Registry a exportar: agregado entre workers quando em modo multiprocess"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
 
 app = Flask(__name__)
 
-def stable_message_id(payload: dict) -> str:
+@app.before_request
+def ensure_worker():
+    init_worker()
+
+dedup_cache = DedupCache(max_size=DEDUP_CACHE_SIZE, ttl=DEDUP_TTL_SECONDS) if DEDUP_ENABLED else None
+
+def stable_message_id(payload: dict, event: str) -> str:
     # ID estável se não vier no payload (evita duplicados)
-    key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
-    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return identity_key(payload, MESSAGE_ID_HASH, event)
+
+def envelope_extra(body: dict, payload: dict) -> dict:
+    """Campos do envelope além do payload: sessão/instância de origem e atributos do grupo"""
+    me = body.get("me")
+    extra = {
+        "session": body.get("session"),
+        "instance": request.args.get("instance") or request.headers.get("X-WAHA-Instance"),
+        "me": me.get("id") if isinstance(me, dict) else None,
+    }
+    if group_lookup:
+        data = payload.get("_data")
+        info = (data.get("Info") or {}) if isinstance(data, dict) else {}
+        group = group_lookup.get(info.get("Chat") or payload.get("from"))
+        extra["group"] = group
+        if PROMETHEUS_ENABLED:
+            group_lookups_total.labels(result='hit' if group else 'miss').inc()
+    return extra
+
+def forget_message(msg_id: str):
+    """Remove o ID do cache de dedup para que um reenvio do WAHA seja aceito"""
+    if dedup_cache:
+        dedup_cache.discard(msg_id)
+
+def publish(topic: str, data: bytes):
+    """Publica aplicando a compressão configurada (sinalizada em content_encoding)"""
+    if PUBSUB_COMPRESSION == "none":
+        return publisher.publish(topic, data=data)
+    return publisher.publish(topic, data=compress(data, PUBSUB_COMPRESSION), content_encoding=PUBSUB_COMPRESSION)
+
+def archive_raw(event: str, msg_id: str, payload: dict):
+    """Envia o payload completo ao tópico de arquivo, sem bloquear o webhook"""
+    data = serializer.dumps({"event": event, "message_id": msg_id, "payload": payload})
+
+    def callback(future):
+        if future.exception():
+            print(f"[WARN] Falha ao arquivar payload bruto: {repr(future.exception())} | MsgID: {msg_id}")
+
+    try:
+        publish(raw_archive_path, data).add_done_callback(callback)
+    except Exception as e:
+        print(f"[WARN] Falha ao arquivar payload bruto: {repr(e)} | MsgID: {msg_id}")
+
+def publish_spooled(batch):
+    """Republica um lote lido do spool, esperando a confirmação de todos"""
+    futures = [publish(topic_path, data) for data in batch]
+    for future in futures:
+        future.result(timeout=30)
+    if PROMETHEUS_ENABLED:
+        pubsub_messages_published_total.labels(status='replayed').inc(len(batch))
+        push_metrics_to_prometheus()
+
+def spool_event(data: bytes, msg_id: str) -> bool:
+    """Grava no spool local um evento que não pôde ser publicado"""
+    if not spool:
+        return False
+    try:
+        spool.append(data)
+    except Exception as e:
+        print(f"[ERROR] Falha ao gravar no spool: {repr(e)} | MsgID: {msg_id}")
+        return False
+    spool_depth.set(spool.depth)
+    print(f"[WARN] Evento gravado no spool para republicação | MsgID: {msg_id}")
+    return True
+
+def publish_callback(event: str, msg_id: str, start_time: float, data: bytes):
+    """Cria o callback que resolve a future do Pub/Sub no modo assíncrono"""
+    def callback(future):
+        pubsub_messages_inflight.dec()
+        try:
+            pubsub_msg_id = future.result()
+        except NotFound as e:
+            print(f"[ERROR] Pub/Sub NOT FOUND - Topic: {topic_path} | Error: {e}")
+            status = 'spooled' if spool_event(data, msg_id) else 'error_not_found'
+            if status != 'spooled':
+                forget_message(msg_id)
+            if PROMETHEUS_ENABLED:
+                pubsub_messages_published_total.labels(status=status).inc()
+                push_metrics_to_prometheus()
+            return
+        except Exception as e:
+            print(f"[ERROR] Pub/Sub falhou: {repr(e)} | MsgID: {msg_id}")
+            status = 'spooled' if spool_event(data, msg_id) else 'error'
+            if status != 'spooled':
+                forget_message(msg_id)
+            if PROMETHEUS_ENABLED:
+                pubsub_messages_published_total.labels(status=status).inc()
+                push_metrics_to_prometheus()
+            return
+
+        print(f"[SUCCESS] Publicado no Pub/Sub: {pubsub_msg_id} | Event: {event} | MsgID: {msg_id}")
+        if PROMETHEUS_ENABLED:
+            pubsub_messages_published_total.labels(status='success').inc()
+            webhook_duration_seconds.labels(event_type=event).observe(time.time() - start_time)
+            push_metrics_to_prometheus()
+    return callback
 
 @app.route("/", methods=["GET"])
 def health():
@@ -124,7 +340,17 @@ def health():
     if PROMETHEUS_ENABLED:
         webhook_requests_total.labels(event_type='health', status='success').inc()
         push_metrics_to_prometheus()
-    return {"status": "healthy", "service": "waha-webhook-listener", "prometheus_enabled": PROMETHEUS_ENABLED}, 200
+    return {
+        "status": "healthy",
+        "service": "waha-webhook-listener",
+        "prometheus_enabled": PROMETHEUS_ENABLED,
+        "groups_loaded": len(group_lookup) if group_lookup else None,
+    }, 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Endpoint local de scrape do Prometheus"""
+    return generate_latest(metrics_registry()), 200, {"Content-Type": CONTENT_TYPE_LATEST}
 
 @app.route("/webhook/webhook", methods=["POST"])
 def webhook():
@@ -139,25 +365,68 @@ def webhook():
             push_metrics_to_prometheus()
         abort(401, "invalid token")
 
-    body = request.get_json(silent=True) or {}
+    raw_body = request.get_data()
+    try:
+        body = serializer.loads(raw_body) if raw_body else None
+    except ValueError:
+        body = None
+    # os bytes crus só podem ir para o envelope se forem um objeto JSON válido
+    raw_is_object = isinstance(body, dict)
+    if not raw_is_object:
+        body = {}
     event = body.get("event") or "message"
     payload = body.get("payload") or body
 
     msg_id = (
         payload.get("id")
         or payload.get("messageId")
-        or stable_message_id(payload)
+        or stable_message_id(payload, event)
     )
 
-    envelope = {
-        "event": event,
-        "message_id": msg_id,
-        "payload": payload,
-    }
-    data = json.dumps(envelope, ensure_ascii=False).encode("utf-8")
+    if dedup_cache:
+        if dedup_cache.check_and_add(msg_id):
+            if PROMETHEUS_ENABLED:
+                dedup_lookups_total.labels(result='hit').inc()
+                webhook_requests_total.labels(event_type=event, status='duplicate').inc()
+                push_metrics_to_prometheus()
+            return {"ok": True, "duplicate": True}, 200
+        if PROMETHEUS_ENABLED:
+            dedup_lookups_total.labels(result='miss').inc()
+
+    extra = envelope_extra(body, payload)
+    if PAYLOAD_PROJECTION:
+        data = serializer.dumps({
+            "event": event,
+            "message_id": msg_id,
+            **extra,
+            "payload": project_payload(payload, projection_fields),
+        })
+    else:
+        # Sem projeção reaproveita os bytes recebidos em vez de re-serializar o payload
+        payload_bytes = serializer.raw_payload(raw_body, body) if raw_is_object else None
+        if payload_bytes is not None:
+            data = serializer.envelope_bytes(event, msg_id, payload_bytes, extra)
+        else:
+            data = serializer.dumps({"event": event, "message_id": msg_id, **extra, "payload": payload})
+
+    if RAW_ARCHIVE_TOPIC and random.random() < RAW_ARCHIVE_SAMPLE_RATE:
+        archive_raw(event, msg_id, payload)
 
     try:
-        future = publisher.publish(topic_path, data=data)
+        future = publish(topic_path, data)
+        if PUBSUB_ASYNC_PUBLISH:
+            # com o buffer cheio o publish() não levanta: devolve a future já
+            # falhada. Sem esse teste o webhook responderia 200 e o evento se perderia
+            if future.done() and isinstance(future.exception(), FlowControlLimitError):
+                raise future.exception()
+            # Responde o webhook imediatamente; o resultado é contabilizado no callback
+            pubsub_messages_inflight.inc()
+            future.add_done_callback(publish_callback(event, msg_id, start_time, data))
+            if PROMETHEUS_ENABLED:
+                webhook_requests_total.labels(event_type=event, status='accepted').inc()
+                push_metrics_to_prometheus()
+            return {"ok": True, "queued": True}, 200
+
         pubsub_msg_id = future.result(timeout=10)
         print(f"[SUCCESS] Publicado no Pub/Sub: {pubsub_msg_id} | Event: {event} | MsgID: {msg_id}")
         
@@ -167,24 +436,50 @@ def webhook():
             webhook_duration_seconds.labels(event_type=event).observe(time.time() - start_time)
             push_metrics_to_prometheus()
             
-    except NotFound as e:
+    except Exception as e:
+        # Com spool habilitado qualquer falha (buffer cheio, timeout, Pub/Sub fora)
+        # é gravada em disco e o webhook responde na hora
+        if not spool_event(data, msg_id):
+            return publish_failed(e, event, msg_id)
+        if PROMETHEUS_ENABLED:
+            webhook_requests_total.labels(event_type=event, status='spooled').inc()
+            pubsub_messages_published_total.labels(status='spooled').inc()
+            push_metrics_to_prometheus()
+        return {"ok": True, "spooled": True}, 202
+
+    return {"ok": True}, 200
+
+def publish_failed(error: Exception, event: str, msg_id: str):
+    """Resposta do webhook quando a publicação falhou e não há spool"""
+    forget_message(msg_id)
+
+    if isinstance(error, FlowControlLimitError):
+        # buffer de publicação cheio: back-pressure para o WAHA reenviar depois
+        print(f"[WARN] Buffer do Pub/Sub cheio, rejeitando webhook | MsgID: {msg_id}")
+        if PROMETHEUS_ENABLED:
+            webhook_requests_total.labels(event_type=event, status='backpressure').inc()
+            pubsub_messages_published_total.labels(status='backpressure').inc()
+            push_metrics_to_prometheus()
+        return {"ok": False, "error": "publish_buffer_full"}, 503, {"Retry-After": "5"}
+
+    if isinstance(error, NotFound):
         # aqui vai aparecer o 404 completo nos logs
-        print(f"[ERROR] Pub/Sub NOT FOUND - Topic: {topic_path} | Error: {e}")
+        print(f"[ERROR] Pub/Sub NOT FOUND - Topic: {topic_path} | Error: {error}")
         if PROMETHEUS_ENABLED:
             webhook_requests_total.labels(event_type=event, status='error_not_found').inc()
             pubsub_messages_published_total.labels(status='error_not_found').inc()
             push_metrics_to_prometheus()
         return {"ok": False, "error": "topic_not_found", "topic": topic_path}, 500
-    except Exception as e:
-        print(f"[ERROR] Pub/Sub falhou: {repr(e)}")
-        if PROMETHEUS_ENABLED:
-            webhook_requests_total.labels(event_type=event, status='error').inc()
-            pubsub_messages_published_total.labels(status='error').inc()
-            push_metrics_to_prometheus()
-        return {"ok": False, "error": str(e)}, 500
 
-    return {"ok": True}, 200
+    print(f"[ERROR] Pub/Sub falhou: {repr(error)}")
+    if PROMETHEUS_ENABLED:
+        webhook_requests_total.labels(event_type=event, status='error').inc()
+        pubsub_messages_published_total.labels(status='error').inc()
+        push_metrics_to_prometheus()
+    return {"ok": False, "error": str(error)}, 500
 
 if __name__ == "__main__":
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py teste_listener:app
+    init_worker()
     port = int(os.getenv("PORT", "5678"))
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Chave determinística de mensagem e índice local de chaves já carregadas.
+
+A chave identifica a mensagem pelo conteúdo, nos valores em que ela fica na
+silver_messages, então pode ser recalculada igual em qualquer origem
+(listener, raw_batch, raw_batch_v2, SQLite do GOWS, Parquet):
+
+    chat    = split(id, '_')[1]  (o chat/grupo, como no join da gold)
+    date    = 'YYYY-MM-DD'
+    time    = 'HH:MM:SS'
+    body    = COALESCE(body, 'N/A')
+    caption = COALESCE(caption, 'N/A')
+
+    message_key = primeiros 16 hex do SHA-256 de chat␟date␟time␟body␟caption
+
+message_key_sql gera a mesma expressão em SQL (BigQuery ou DuckDB) e
+KeyIndex guarda as chaves já carregadas num arquivo ordenado de uint64, para
+backfills locais fazerem o anti-join com busca binária vetorizada.
+
+Uso:
+    python message_keys.py chaves.idx backfill.parquet --out novos.parquet
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+SEPARATOR = "\x1f"
+KEY_HEX_CHARS = 16
+
+
+def chat_from_id(message_id):
+    parts = (message_id or "").split("_")
+    return parts[1] if len(parts) > 1 else ""
+
+
+def message_key(chat, date, time, body, caption):
+    """Chave da mensagem (16 hex) a partir dos valores no formato da silver"""
+    parts = (
+        chat or "",
+        str(date or ""),
+        str(time or "")[:8],
+        "N/A" if body is None else body,
+        "N/A" if caption is None else caption,
+    )
+    return hashlib.sha256(SEPARATOR.join(parts).encode("utf-8")).hexdigest()[:KEY_HEX_CHARS]
+
+
+def message_key_sql(chat, date, time, body, caption, dialect="bigquery"):
+    """Expressão SQL equivalente a message_key() (argumentos são expressões SQL)"""
+    if dialect == "bigquery":
+        text = "STRING"
+        sep = "CODE_POINTS_TO_STRING([31])"
+    elif dialect == "duckdb":
+        text = "VARCHAR"
+        sep = "chr(31)"
+    else:
+        raise ValueError(f"dialeto inválido: {dialect} (use bigquery ou duckdb)")
+
+    parts = [
+        f"COALESCE({chat}, '')",
+        f"COALESCE(CAST({date} AS {text}), '')",
+        f"COALESCE(SUBSTR(CAST({time} AS {text}), 1, 8), '')",
+        f"COALESCE({body}, 'N/A')",
+        f"COALESCE({caption}, 'N/A')",
+    ]
+    joined = f", {sep}, ".join(parts)
+    if dialect == "bigquery":
+        return f"SUBSTR(TO_HEX(SHA256(CONCAT({joined}))), 1, {KEY_HEX_CHARS})"
+    return f"SUBSTR(sha256(CONCAT({joined})), 1, {KEY_HEX_CHARS})"
+
+
+def keys_to_array(keys):
+    return np.fromiter((int(k, 16) for k in keys), dtype=np.uint64)
+
+
+class KeyIndex:
+    """Conjunto ordenado de chaves (uint64) persistido em arquivo.
+
+    O arquivo é o array cru em ordem crescente (8 bytes por chave), lido com
+    memmap; contains() faz busca binária vetorizada para um lote inteiro.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            self._keys = np.memmap(path, dtype=np.uint64, mode="r")
+        else:
+            self._keys = np.empty(0, dtype=np.uint64)
+        self._pending = []
+
+    def __len__(self):
+        return len(self._keys) + sum(len(p) for p in self._pending)
+
+    def contains(self, keys):
+        """Máscara booleana: quais chaves (array uint64) já estão no índice"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        mask = self._member(self._keys, keys)
+        for pending in self._pending:
+            mask |= self._member(pending, keys)
+        return mask
+
+    @staticmethod
+    def _member(sorted_keys, keys):
+        if not len(sorted_keys):
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(sorted_keys, keys)
+        pos[pos == len(sorted_keys)] = 0
+        return sorted_keys[pos] == keys
+
+    def filter_new(self, keys):
+        """Máscara das chaves novas: fora do índice e primeira ocorrência no lote"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        _, first = np.unique(keys, return_index=True)
+        unique_mask = np.zeros(len(keys), dtype=bool)
+        unique_mask[first] = True
+        return unique_mask & ~self.contains(keys)
+
+    def add(self, keys):
+        self._pending.append(np.unique(np.asarray(keys, dtype=np.uint64)))
+
+    def save(self):
+        """Junta as chaves pendentes e regrava o arquivo de forma atômica"""
+        if not self._pending:
+            return
+        merged = np.unique(np.concatenate([np.asarray(self._keys)] + self._pending))
+        tmp = f"{self.path}.tmp"
+        merged.tofile(tmp)
+        os.replace(tmp, self.path)
+        self._keys = np.memmap(self.path, dtype=np.uint64, mode="r") if len(merged) else merged
+        self._pending = []
+
+
+def main():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parser = argparse.ArgumentParser(description="Anti-join de um Parquet no formato da silver contra o índice de chaves")
+    parser.add_argument("index")
+    parser.add_argument("src")
+    parser.add_argument("--out", required=True, help="Parquet só com as mensagens novas (com a coluna message_key)")
+    parser.add_argument("--dry-run", action="store_true", help="não grava o índice")
+    args = parser.parse_args()
+
+    table = pq.read_table(args.src)
+    columns = {name: table.column(name).to_pylist() for name in ("id", "date", "time", "body", "caption")}
+    keys = [
+        message_key(chat_from_id(i), d, t, b, c)
+        for i, d, t, b, c in zip(columns["id"], columns["date"], columns["time"], columns["body"], columns["caption"])
+    ]
+
+    index = KeyIndex(args.index)
+    as_int = keys_to_array(keys)
+    new = index.filter_new(as_int)
+    selected = np.flatnonzero(new)
+    result = table.take(selected)
+    result = result.append_column("message_key", pa.array([keys[i] for i in selected]))
+    pq.write_table(result, args.out, compression="snappy")
+
+    if not args.dry_run:
+        index.add(as_int[new])
+        index.save()
+    print(f"✓ {len(selected):,} novas de {len(keys):,} | índice: {len(index):,} chaves -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
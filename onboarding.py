@@ -0,0 +1,367 @@
+"""Cadastro (onboarding) de grupos e canais nas instâncias WAHA.
+
+Substitui os laços do proc_excel.ipynb, que sorteiam uma URL, dormem 5-10s
+(ou 10-15 min antes de cada join) entre linhas, chamam group_info/canal_info
+de novo para links já resolvidos e regravam o CSV a cada 10 linhas:
+
+- join-info / channel_info, join e channels/follow rodam em todas as
+  instâncias ao mesmo tempo, cada uma com seus próprios token buckets (um
+  para consultas, outro, bem mais lento, para joins/follows); o ritmo é o
+  limite seguro por número de WhatsApp, não um sleep em série;
+- código do convite -> JID/nome fica num cache SQLite persistente (inclusive
+  convites inválidos), então um link nunca é consultado duas vezes;
+- cada resultado é acrescentado a um journal NDJSON; ao reiniciar depois de
+  uma queda, o journal é reaplicado e só o que faltou é chamado;
+- links novos vão para a instância com menos grupos monitorados;
+- o CSV de grupos é regravado uma vez no fim (group_id, group_name,
+  monitorado, device), de forma atômica, mesmo se a execução for
+  interrompida.
+
+Variáveis de ambiente: WAHA_INSTANCES (device=url,...), WAHA_API_KEY,
+WAHA_BEARER_TOKEN, WAHA_SESSION, como no harvester.py.
+
+Uso:
+    python onboarding.py --groups csv/Pasta1_ATUALIZADO.csv --lookup-only
+    python onboarding.py --groups csv/Pasta1_ATUALIZADO.csv --limit 20 --join-interval 900
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sqlite3
+import time
+from collections import Counter
+
+from harvester import WAHA_API_KEY, WAHA_BEARER_TOKEN, WAHA_SESSION, TokenBucket, parse_instances
+from waha_client import AsyncWahaClient, WahaError
+
+GROUP, CHANNEL = "Grupo", "Canal"
+DONE_STATUSES = ("Sim", "Sair")
+
+
+def invite_code(link):
+    """Código do convite a partir do link (chat.whatsapp.com/<code> ou whatsapp.com/channel/<code>)"""
+    return str(link or "").strip().split("?")[0].rstrip("/").split("/")[-1]
+
+
+def is_permanent(error):
+    """4xx (exceto 429): convite inválido/expirado, não adianta repetir"""
+    return isinstance(error, WahaError) and 400 <= error.status < 500 and error.status != 429
+
+
+class InviteCache:
+    """Código do convite -> (tipo, JID, nome, erro), persistente entre execuções"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS invites ("
+            "code TEXT PRIMARY KEY, kind TEXT NOT NULL, jid TEXT, name TEXT, error TEXT, resolved_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, code):
+        row = self.conn.execute("SELECT kind, jid, name, error FROM invites WHERE code = ?", (code,)).fetchone()
+        return dict(zip(("kind", "jid", "name", "error"), row)) if row else None
+
+    def put(self, code, kind, jid=None, name=None, error=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO invites (code, kind, jid, name, error, resolved_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (code, kind, jid, name, error, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class Journal:
+    """Progresso em NDJSON, só acréscimos; cada linha é gravada (flush) assim que o resultado chega"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """{code: último join/follow bem-sucedido} e {code: último erro permanente de join}"""
+        joined, failed = {}, {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # linha cortada por uma queda no meio da escrita
+                    if entry.get("step") != "join":
+                        continue
+                    if entry.get("ok"):
+                        joined[entry["code"]] = entry
+                        failed.pop(entry["code"], None)
+                    elif entry.get("permanent"):
+                        failed[entry["code"]] = entry
+        except FileNotFoundError:
+            pass
+        return joined, failed
+
+    def append(self, **entry):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"ts": round(time.time(), 3), **entry}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def read_groups(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def write_groups(path, fieldnames, rows):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+class Onboarding:
+    def __init__(self, client, instances, rows, cache, journal, args):
+        self.client = client
+        self.instances = instances
+        self.rows = rows
+        self.cache = cache
+        self.journal = journal
+        self.lookup_only = args.lookup_only
+        self.retry_failed = args.retry_failed
+        self.jitter = args.jitter
+        self.lookup_buckets = {d: TokenBucket(args.lookup_rate, 1) for d in instances}
+        self.join_buckets = {d: TokenBucket(1 / args.join_interval, 1) for d in instances}
+        self.load = Counter(r.get("device") for r in rows if r.get("monitorado") == "Sim" and r.get("device"))
+        self.by_code = {}
+        self.stats = Counter()
+
+    # --- aplicação dos resultados nas linhas do CSV ---
+    def _apply_resolution(self, code, info):
+        for row in self.by_code.get(code, ()):
+            if info.get("jid"):
+                row["group_id"] = info["jid"]
+            if info.get("name"):
+                row["group_name"] = info["name"]
+
+    def _apply_join(self, code, device):
+        for row in self.by_code.get(code, ()):
+            row["monitorado"] = "Sim"
+            row["device"] = device
+
+    def _assign_device(self, code):
+        rows = self.by_code[code]
+        current = next((r.get("device") for r in rows if r.get("device") in self.instances), None)
+        device = current or min(self.instances, key=lambda d: (self.load[d], d))
+        self.load[device] += 1
+        return device
+
+    def plan(self, limit=None):
+        """Linhas a processar, agrupadas por código; reaplica o journal e o cache"""
+        joined, failed = self.journal.load()
+        for row in self.rows:
+            kind = row.get("tipo_link")
+            code = invite_code(row.get("link Whatsapp"))
+            if kind in (GROUP, CHANNEL) and code and row.get("monitorado") not in DONE_STATUSES:
+                self.by_code.setdefault(code, []).append(row)
+
+        pending_lookup, pending_join = [], []
+        for code, rows in self.by_code.items():
+            kind = rows[0]["tipo_link"]
+            cached = self.cache.get(code)
+            known_jid = next((r["group_id"] for r in rows if r.get("group_id")), None)
+            if cached is None and known_jid:
+                # já resolvido numa rodada anterior do notebook
+                name = next((r["group_name"] for r in rows if r.get("group_name")), None)
+                self.cache.put(code, kind, known_jid, name)
+                cached = self.cache.get(code)
+            if cached and not cached["error"]:
+                self._apply_resolution(code, cached)
+            if code in joined:
+                self._apply_join(code, joined[code]["device"])
+                self.stats["retomados"] += 1
+                continue
+            if code in failed and not self.retry_failed:
+                self.stats["falhas anteriores"] += 1
+                continue
+            if cached is None or (cached["error"] and self.retry_failed):
+                pending_lookup.append((code, kind))
+            elif cached["error"]:
+                self.stats["inválidos (cache)"] += 1
+            elif not self.lookup_only:
+                pending_join.append(code)
+            self.stats["cache"] += cached is not None and not cached["error"]
+
+        if limit is not None:
+            pending_join = pending_join[:limit]
+            pending_lookup = pending_lookup[:max(0, limit - len(pending_join))]
+        return pending_lookup, pending_join
+
+    async def _pause(self, bucket):
+        await bucket.acquire()
+        if self.jitter:
+            await asyncio.sleep(random.uniform(0, self.jitter))
+
+    # --- etapas ---
+    async def resolve(self, device, code, kind):
+        base_url = self.instances[device]
+        await self._pause(self.lookup_buckets[device])
+        try:
+            if kind == GROUP:
+                data = await self.client.group_join_info(base_url, code)
+                info = {"jid": data.get("JID") or data.get("id"), "name": data.get("Name") or data.get("subject")}
+            else:
+                data = await self.client.channel_info(base_url, code)
+                info = {"jid": data.get("id"), "name": data.get("name")}
+        except Exception as e:
+            permanent = is_permanent(e)
+            if permanent:
+                self.cache.put(code, kind, error=str(e)[:300])
+            self.journal.append(step="resolve", code=code, device=device, ok=False, permanent=permanent,
+                                error=str(e)[:300])
+            self.stats["erros de consulta"] += 1
+            print(f"✗ [{device}] join-info {code}: {e}")
+            return None
+        self.cache.put(code, kind, info["jid"], info["name"])
+        self.journal.append(step="resolve", code=code, device=device, ok=True, **info)
+        self._apply_resolution(code, info)
+        self.stats["consultados"] += 1
+        return info
+
+    async def join(self, device, code):
+        base_url = self.instances[device]
+        rows = self.by_code[code]
+        kind = rows[0]["tipo_link"]
+        jid = rows[0].get("group_id")
+        await self._pause(self.join_buckets[device])
+        try:
+            if kind == GROUP:
+                await self.client.join_group(base_url, code)
+            else:
+                await self.client.follow_channel(base_url, jid)
+        except Exception as e:
+            permanent = is_permanent(e)
+            self.journal.append(step="join", code=code, device=device, ok=False, permanent=permanent,
+                                error=str(e)[:300])
+            self.stats["erros de cadastro"] += 1
+            self.load[device] -= 1
+            print(f"✗ [{device}] cadastro {code}: {e}")
+            return
+        self.journal.append(step="join", code=code, device=device, ok=True, jid=jid)
+        self._apply_join(code, device)
+        self.stats["cadastrados"] += 1
+        print(f"✓ [{device}] {kind} {jid or code} - {rows[0].get('group_name') or ''}")
+
+    # --- workers ---
+    async def _lookup_worker(self, device, lookups, joins):
+        while True:
+            try:
+                code, kind = lookups.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            info = await self.resolve(device, code, kind)
+            if info and info["jid"] and not self.lookup_only:
+                target = self._assign_device(code)
+                joins[target].put_nowait(code)
+
+    async def _join_worker(self, device, queue):
+        while True:
+            code = await queue.get()
+            if code is None:
+                return
+            await self.join(device, code)
+
+    async def run(self, pending_lookup, pending_join):
+        lookups = asyncio.Queue()
+        for item in pending_lookup:
+            lookups.put_nowait(item)
+        joins = {d: asyncio.Queue() for d in self.instances}
+        for code in pending_join:
+            joins[self._assign_device(code)].put_nowait(code)
+
+        join_tasks = [asyncio.ensure_future(self._join_worker(d, q)) for d, q in joins.items()]
+        try:
+            await asyncio.gather(*(self._lookup_worker(d, lookups, joins) for d in self.instances))
+            for queue in joins.values():
+                queue.put_nowait(None)
+            await asyncio.gather(*join_tasks)
+        finally:
+            for task in join_tasks:
+                task.cancel()
+
+
+async def onboard(args):
+    instances = parse_instances(os.getenv("WAHA_INSTANCES"))
+    if args.device:
+        instances = {d: u for d, u in instances.items() if d in args.device}
+    if not instances:
+        print("✗ Nenhuma instância WAHA configurada (WAHA_INSTANCES / --device)")
+        return 1
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    fieldnames, rows = read_groups(args.groups)
+    for column in ("group_id", "group_name", "monitorado", "device"):
+        if column not in fieldnames:
+            fieldnames.append(column)
+
+    cache = InviteCache(os.path.join(args.state_dir, "invite_cache.db"))
+    journal = Journal(os.path.join(args.state_dir, "journal.ndjson"))
+    # mesma autenticação do harvester: X-Api-Key e, se houver, Bearer fixo
+    client = AsyncWahaClient(list(instances.values()), api_key=WAHA_API_KEY, bearer_token=WAHA_BEARER_TOKEN,
+                             use_id_token=False, session=WAHA_SESSION, timeout=args.timeout)
+    engine = Onboarding(client, instances, rows, cache, journal, args)
+
+    pending_lookup, pending_join = engine.plan(args.limit)
+    print(f"{len(instances)} instâncias | {len(pending_lookup)} links para consultar, "
+          f"{len(pending_join)} já resolvidos para cadastrar"
+          f"{' (só consulta)' if args.lookup_only else ''}")
+
+    started = time.perf_counter()
+    try:
+        await engine.run(pending_lookup, pending_join)
+    finally:
+        await client.close()
+        journal.close()
+        cache.close()
+        write_groups(args.groups, fieldnames, rows)
+
+    secs = time.perf_counter() - started
+    summary = ", ".join(f"{k}: {v}" for k, v in sorted(engine.stats.items()) if v)
+    print(f"✓ Concluído em {secs:.1f}s | {summary or 'nada a fazer'} | CSV atualizado: {args.groups}")
+    client.stats.report()
+    return 1 if engine.stats["erros de cadastro"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta e cadastro de grupos/canais nas instâncias WAHA")
+    parser.add_argument("--groups", default=os.path.join("csv", "Pasta1_ATUALIZADO.csv"))
+    parser.add_argument("--state-dir", default="onboarding_state", help="cache de convites e journal")
+    parser.add_argument("--device", action="append", help="restringe a uma instância (pode repetir)")
+    parser.add_argument("--lookup-only", action="store_true", help="só valida os links (group_id/group_name)")
+    parser.add_argument("--limit", type=int, default=None, help="máximo de links processados nesta execução")
+    parser.add_argument("--lookup-rate", type=float, default=0.2, help="consultas por segundo por instância")
+    parser.add_argument("--join-interval", type=float, default=600, help="segundos entre joins na mesma instância")
+    parser.add_argument("--jitter", type=float, default=0, help="espera aleatória extra (s) antes de cada chamada")
+    parser.add_argument("--retry-failed", action="store_true", help="repete convites inválidos/cadastros recusados")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    try:
+        exit(asyncio.run(onboard(args)))
+    except KeyboardInterrupt:
+        print("✗ Interrompido; progresso salvo no journal e no CSV (rode de novo para continuar)")
+        exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Optional
 from openai import OpenAI, APIStatusError, AuthenticationError, RateLimitError
 from dotenv import load_dotenv
@@ -10,6 +11,12 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """Cliente único, reaproveitado entre as chamadas (pool de conexões HTTP)"""
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+
 def consultar_chatgpt(prompt: str) -> str:
     """
     Faz uma consulta na API do ChatGPT e retorna a resposta como string.
@@ -25,6 +32,9 @@ def consultar_chatgpt(prompt: str) -> str:
     
     Raises:
         Exception: Se houver erro na chamada da API
+
+    Para classificar muitas mensagens (em lote, em paralelo e com cache), use
+    category_classifier.py.
     """
 
     model = "gpt-4o-mini"
@@ -63,8 +73,7 @@ def consultar_chatgpt(prompt: str) -> str:
     """
 
     try:
-        # Configura a chave da API
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_client()
         
         # Faz a chamada para a API
         response = client.chat.completions.create(
@@ -0,0 +1,135 @@
+"""Classificação de origem (loja/agregador/encurtador) das mensagens.
+
+Reproduz o CASE de `origin` do gold em queries.sql a partir da tabela de regras
+em csv/origin_rules.csv (pattern, origin), onde a ordem das linhas é a
+prioridade do CASE e `pattern` usa a sintaxe do LIKE sem os `%` das pontas
+(`'%meli.la%'` vira `meli.la`; `%`/`_` internos continuam curinga).
+
+Cada coluna é convertida para minúsculas uma única vez. Os padrões literais
+vão para um autômato Aho-Corasick (pyahocorasick, se instalado) que acha todos
+numa passada; as poucas regras com curinga viram regex. Sem pyahocorasick, as
+regras são testadas em ordem de prioridade com busca de substring em C e
+param no primeiro acerto.
+
+Uso:
+    from origin_classifier import OriginClassifier
+    clf = OriginClassifier()
+    clf.classify(body, caption)  # -> 'MERCADO LIVRE', ..., 'OUTROS'
+"""
+import csv
+import os
+import re
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv", "origin_rules.csv")
+DEFAULT_ORIGIN = "OUTROS"
+COUPON_PATTERN = "cupom"
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Lê a tabela de regras como lista [(pattern, origin)] na ordem de prioridade"""
+    with open(path, encoding="utf-8", newline="") as f:
+        return [(row["pattern"], row["origin"]) for row in csv.DictReader(f)]
+
+
+def like_to_regex(pattern):
+    """Converte um padrão LIKE (sem os `%` das pontas) em regex de busca"""
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*?")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return "".join(parts)
+
+
+def is_literal(pattern):
+    return "%" not in pattern and "_" not in pattern
+
+
+class OriginClassifier:
+    def __init__(self, rules=None, default=DEFAULT_ORIGIN, use_automaton=None):
+        self.rules = load_rules() if rules is None else list(rules)
+        self.default = default
+        self.origins = [origin for _, origin in self.rules]
+        if use_automaton is None:
+            use_automaton = AHOCORASICK_AVAILABLE
+        self.use_automaton = use_automaton
+
+        # (prioridade, matcher) em ordem; literal -> str, curinga -> regex compilada
+        self._ordered = []
+        self._wildcards = []
+        literals = {}
+        for priority, (pattern, _) in enumerate(self.rules):
+            if is_literal(pattern):
+                literals.setdefault(pattern, priority)
+                self._ordered.append((priority, pattern))
+            else:
+                regex = re.compile(like_to_regex(pattern), re.DOTALL)
+                self._wildcards.append((priority, regex))
+                self._ordered.append((priority, regex))
+
+        self._automaton = None
+        if self.use_automaton:
+            if not AHOCORASICK_AVAILABLE:
+                raise RuntimeError("use_automaton=True requer pyahocorasick instalado")
+            self._automaton = ahocorasick.Automaton()
+            for pattern, priority in literals.items():
+                self._automaton.add_word(pattern, priority)
+            self._automaton.make_automaton()
+
+    def _best_priority(self, texts):
+        """Menor prioridade de regra que casa com algum dos textos (já em minúsculas)"""
+        if self._automaton is not None:
+            best = len(self.rules)
+            for text in texts:
+                for _, priority in self._automaton.iter(text):
+                    if priority < best:
+                        best = priority
+            for priority, regex in self._wildcards:
+                if priority >= best:
+                    break
+                if any(regex.search(text) for text in texts):
+                    return priority
+            return best if best < len(self.rules) else None
+
+        for priority, matcher in self._ordered:
+            if matcher.__class__ is str:
+                for text in texts:
+                    if matcher in text:
+                        return priority
+            elif any(matcher.search(text) for text in texts):
+                return priority
+        return None
+
+    def classify(self, body, caption=None):
+        """Origem da mensagem; textos None são ignorados (como NULL no LIKE)"""
+        texts = [t.lower() for t in (body, caption) if t is not None]
+        priority = self._best_priority(texts)
+        return self.default if priority is None else self.origins[priority]
+
+    def classify_many(self, rows):
+        """Classifica um iterável de pares (body, caption)"""
+        return [self.classify(body, caption) for body, caption in rows]
+
+
+def has_coupon(body, caption=None):
+    """Coluna `coupon` do gold: 'cupom' no corpo ou na legenda"""
+    return any(COUPON_PATTERN in t.lower() for t in (body, caption) if t is not None)
+
+
+def classify_reference(rules, body, caption=None, default=DEFAULT_ORIGIN):
+    """Tradução direta do CASE do SQL (uma regex por regra e coluna), para conferência"""
+    for pattern, origin in rules:
+        regex = re.compile(like_to_regex(pattern), re.DOTALL)
+        for text in (body, caption):
+            if text is not None and regex.search(text.lower()):
+                return origin
+    return default
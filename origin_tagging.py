@@ -0,0 +1,188 @@
+"""Marcação vetorizada de `origin` e `coupon` em lotes Arrow/Parquet.
+
+Mesmas regras do origin_classifier (csv/origin_rules.csv), aplicadas com
+pyarrow.compute: cada coluna de texto é convertida para minúsculas uma vez por
+lote. As regras são agrupadas (em ordem de prioridade) em alternações RE2
+compiladas; cada grupo é testado de forma vetorizada só nas linhas ainda sem
+origem, e apenas as linhas que casaram com o grupo passam pelas regras
+individuais dele para achar a de maior prioridade.
+
+Lotes são independentes, então tag_parquet processa vários em paralelo
+(pyarrow.compute libera o GIL) e escala com o número de núcleos.
+
+Uso:
+    python origin_tagging.py silver.parquet gold.parquet --threads 8
+ou, no DuckDB:
+    register_duckdb(con)
+    con.sql("select *, tag_origin(body, text, title, description, caption) as origin from ...")
+"""
+import argparse
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from origin_classifier import COUPON_PATTERN, DEFAULT_ORIGIN, is_literal, like_to_regex, load_rules
+
+# Colunas de texto do protótipo DuckDB do pipeline.ipynb
+TEXT_COLUMNS = ("body", "text", "title", "description", "caption")
+
+# regras por alternação RE2 testada de uma vez
+GROUP_SIZE = 16
+
+
+class OriginTagger:
+    def __init__(self, rules=None, default=DEFAULT_ORIGIN, group_size=GROUP_SIZE):
+        self.rules = load_rules() if rules is None else list(rules)
+        self.default = default
+        self._labels = np.array([origin for _, origin in self.rules] + [default], dtype=object)
+
+        matchers = []
+        for pattern, _ in self.rules:
+            if is_literal(pattern):
+                matchers.append((pc.match_substring, pattern))
+            else:
+                # (?s) = DOTALL, como o % do LIKE
+                matchers.append((pc.match_substring_regex, "(?s)" + like_to_regex(pattern)))
+
+        # [(prioridade inicial, regex do grupo, [matchers do grupo])]
+        self._groups = []
+        for start in range(0, len(self.rules), group_size):
+            chunk = self.rules[start:start + group_size]
+            alternation = "|".join(like_to_regex(pattern) for pattern, _ in chunk)
+            self._groups.append((start, f"(?s)(?:{alternation})", matchers[start:start + group_size]))
+
+    @staticmethod
+    def _lower(arrays):
+        return [pc.utf8_lower(a) for a in arrays]
+
+    @staticmethod
+    def _any_match(func, pattern, lowered):
+        mask = None
+        for array in lowered:
+            hit = pc.fill_null(func(array, pattern), False)
+            mask = hit if mask is None else pc.or_(mask, hit)
+        return mask.to_numpy(zero_copy_only=False)
+
+    def origin_array(self, arrays, lowered=None):
+        """Origem por linha para as colunas de texto dadas (pyarrow arrays)"""
+        lowered = self._lower(arrays) if lowered is None else lowered
+        n = len(lowered[0]) if lowered else 0
+        priority = np.full(n, len(self.rules), dtype=np.int32)
+        pending = np.arange(n)
+
+        for start, group_regex, matchers in self._groups:
+            if not len(pending):
+                break
+            # compacta para as linhas ainda sem origem antes de testar o grupo
+            subset = [pc.take(a, pending) for a in lowered]
+            group_hits = self._any_match(pc.match_substring_regex, group_regex, subset)
+            if not group_hits.any():
+                continue
+
+            rows = pending[group_hits]
+            candidates = [pc.take(a, pa.array(np.flatnonzero(group_hits))) for a in subset]
+            unresolved = np.ones(len(rows), dtype=bool)
+            for offset, (func, pattern) in enumerate(matchers):
+                hits = self._any_match(func, pattern, candidates) & unresolved
+                priority[rows[hits]] = start + offset
+                unresolved &= ~hits
+                if not unresolved.any():
+                    break
+            pending = pending[~group_hits]
+
+        return pa.array(self._labels[priority], type=pa.string())
+
+    def coupon_array(self, arrays, lowered=None):
+        lowered = self._lower(arrays) if lowered is None else lowered
+        return pa.array(self._any_match(pc.match_substring, COUPON_PATTERN, lowered))
+
+    def tag_batch(self, batch, columns=TEXT_COLUMNS):
+        """Retorna o lote com as colunas `origin` e `coupon` adicionadas"""
+        present = [c for c in columns if c in batch.schema.names]
+        lowered = self._lower([batch.column(c) for c in present])
+        origin = self.origin_array(None, lowered=lowered) if present else pa.array(
+            [self.default] * batch.num_rows, type=pa.string())
+        coupon = self.coupon_array(None, lowered=lowered) if present else pa.array(
+            [False] * batch.num_rows)
+        return pa.RecordBatch.from_arrays(
+            list(batch.columns) + [origin, coupon],
+            names=list(batch.schema.names) + ["origin", "coupon"],
+        )
+
+
+def tag_table(table, tagger=None, columns=TEXT_COLUMNS):
+    tagger = tagger or OriginTagger()
+    batches = [tagger.tag_batch(b, columns) for b in table.to_batches()]
+    return pa.Table.from_batches(batches) if batches else table
+
+
+def tag_parquet(src, dst, threads=None, batch_size=65536, columns=TEXT_COLUMNS, tagger=None):
+    """Lê um Parquet em lotes, marca em paralelo e grava na mesma ordem. Retorna o nº de linhas"""
+    tagger = tagger or OriginTagger()
+    threads = threads or os.cpu_count() or 1
+    source = pq.ParquetFile(src)
+    writer = None
+    rows = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = []
+        for batch in source.iter_batches(batch_size=batch_size):
+            pending.append(pool.submit(tagger.tag_batch, batch, columns))
+            # janela limitada de lotes em voo para não carregar o arquivo todo
+            if len(pending) >= threads * 2:
+                writer, rows = _write(pending.pop(0).result(), dst, writer, rows)
+        for future in pending:
+            writer, rows = _write(future.result(), dst, writer, rows)
+    if writer:
+        writer.close()
+    return rows
+
+
+def _write(batch, dst, writer, rows):
+    if writer is None:
+        writer = pq.ParquetWriter(dst, batch.schema, compression="snappy")
+    writer.write_batch(batch)
+    return writer, rows + batch.num_rows
+
+
+def register_duckdb(con, tagger=None, name="tag_origin", columns=len(TEXT_COLUMNS)):
+    """Registra uma UDF vetorizada (Arrow) no DuckDB: tag_origin(col1, ..., colN) -> VARCHAR"""
+    tagger = tagger or OriginTagger()
+
+    def udf(*arrays):
+        return tagger.origin_array(list(arrays))
+
+    # o DuckDB conta os parâmetros pela assinatura, então ela precisa ser explícita
+    udf.__signature__ = inspect.Signature(
+        [inspect.Parameter(f"col{i}", inspect.Parameter.POSITIONAL_ONLY) for i in range(columns)]
+    )
+    # null_handling="special": sem isso o DuckDB devolve NULL sem chamar a UDF
+    # quando qualquer coluna é NULL (ex.: mensagem sem caption)
+    con.create_function(name, udf, ["VARCHAR"] * columns, "VARCHAR", type="arrow",
+                        null_handling="special")
+    return con
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Marca origin/coupon em um arquivo Parquet")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    parser.add_argument("--columns", default=",".join(TEXT_COLUMNS))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = tag_parquet(args.src, args.dst, threads=args.threads, batch_size=args.batch_size,
+                       columns=tuple(c.strip() for c in args.columns.split(",")))
+    secs = time.perf_counter() - started
+    print(f"✓ {rows:,} linhas marcadas em {secs:.1f}s ({rows / secs:,.0f} linhas/s) -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 import os
-import requests
-from google.auth.transport.requests import Request
-from google.oauth2 import id_token
+from urllib.parse import urlsplit
 from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+from waha_client import WahaClient, WahaError
 
 # Lê as URLs da variável de ambiente (separadas por vírgula)
 urls_str = os.getenv("TEST_URLS")
@@ -29,46 +28,36 @@ else:
     registry = None
     endpoint_status = None
 
+# ID token do Cloud Run (audience = URL base, em cache) + X-Api-Key, com pool por instância
+client = WahaClient(api_key=api_key, use_id_token=True, timeout=10, max_attempts=1)
 failed_urls = []
 
 for i, url in enumerate(urls, 1):
     print(f"[{i}/{len(urls)}] Testando: {url}")
+    parts = urlsplit(url)
+    base_url, path = f"{parts.scheme}://{parts.netloc}", parts.path or "/"
     
     try:
-        # Obter ID token específico para Cloud Run (usa audience)
-        auth_req = Request()
-        id_token_credential = id_token.fetch_id_token(auth_req, url)
-        
-        # Adicionar token no header Authorization e API Key
-        headers = {
-            "Authorization": f"Bearer {id_token_credential}"
-        }
-        
-        if api_key:
-            headers["X-Api-Key"] = api_key
-        
-        print(f"  ✓ ID Token obtido")
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        print(f"  Status Code: {response.status_code}")
-        print(f"  Response: {response.text[:100]}...")
-        
-        if response.status_code != 200:
-            print(f"  ✗ FALHOU: Status code inválido: {response.status_code}\n")
-            failed_urls.append(url)
-            if endpoint_status:
-                endpoint_status.labels(url=url).set(0)
-        else:
-            print(f"  ✓ Requisição bem-sucedida!\n")
-            if endpoint_status:
-                endpoint_status.labels(url=url).set(1)
+        response = client.get(base_url, path)
+        print(f"  ✓ Requisição bem-sucedida!")
+        print(f"  Response: {str(response)[:100]}...\n")
+        if endpoint_status:
+            endpoint_status.labels(url=url).set(1)
         
+    except WahaError as e:
+        print(f"  ✗ FALHOU: Status code inválido: {e.status}\n")
+        failed_urls.append(url)
+        if endpoint_status:
+            endpoint_status.labels(url=url).set(0)
     except Exception as e:
         print(f"  ✗ ERRO: {e}\n")
         failed_urls.append(url)
         if endpoint_status:
             endpoint_status.labels(url=url).set(0)
 
+client.stats.report()
+client.close()
+
 # Enviar métricas para Pushgateway (se configurado)
 if pushgateway_url and registry:
     try:
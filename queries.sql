@@ -10,6 +10,9 @@
 -- FROM `gauge-prod.projeto_meli.waha_events_raw_str`;
 
 -- RAW --
+-- Rebuild completo (re-parseia todo o histórico). O build incremental, que só
+-- ingere arquivos novos e faz MERGE nas partições afetadas, está em
+-- bq_pipeline/incremental_build.py
 CREATE OR REPLACE TABLE `gauge-prod.projeto_meli.waha_events_raw`
 AS
 SELECT
@@ -17,6 +20,8 @@ SELECT
 FROM `gauge-prod.projeto_meli.waha_events_raw_str`;
 
 -- SILVER -- 
+-- Sem janela de partição vazia: bq_pipeline/partition_overwrite.py sobrescreve
+-- silver/gold do dia com WRITE_TRUNCATE em tabela$YYYYMMDD (um job por tabela)
 -- CREATE OR REPLACE TABLE `gauge-prod.projeto_meli.silver_messages` PARTITION BY date AS
 DELETE FROM `gauge-prod.projeto_meli.silver_messages` where date = current_date()-1;
  
@@ -239,6 +244,8 @@ grupos.class_atual as class,
 grupos.grupo as group_name,
 base.category
 from base as base
+-- base_grupos pode ser recarregada a partir dos CSVs com group_registry.py compile --bq-table projeto_meli.base_grupos
+-- eventos do listener com GROUP_REGISTRY_PATH já trazem aff_id/class/group_name em $.group (o join fica para o histórico)
 left join `gauge-prod.projeto_meli.base_grupos` as grupos
 ON split(base.id, '_')[1] = grupos.id_api
 -- where origin = 'OUTROS'
@@ -246,6 +253,7 @@ where origin <> 'OUTROS'
 AND date = current_date()-1;
 
 -- INSERT DO BATCH
+-- Versão idempotente (chave determinística + índice de chaves): bq_pipeline/batch_backfill.py
 insert into `projeto_meli.silver_messages`
 with batch_fill as (
 	with p1 as (SELECT DISTINCT
@@ -284,6 +292,7 @@ where (body != 'N/A' or caption != 'N/A')
 AND date = current_date()-1
 
 -- INSERT DO BATCH
+-- Versão idempotente (chave determinística + índice de chaves): bq_pipeline/batch_backfill.py
 insert into `projeto_meli.silver_messages`
 with batch_fill as (
 	with p1 as (SELECT DISTINCT
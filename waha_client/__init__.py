@@ -0,0 +1,46 @@
+"""Cliente compartilhado da API do WAHA (síncrono e asyncio).
+
+Substitui os helpers copiados nos notebooks e scripts (status, start, stop,
+group_info, listar_chats, listar_grupos, cadastrar_canal, ...):
+
+- um pool keep-alive por URL base (requests.Session / aiohttp.ClientSession);
+- ID tokens do Cloud Run em cache até expirarem;
+- timeout em toda chamada e retentativa com backoff exponencial com jitter
+  (429/5xx; POST/DELETE só em 429/503 ou falha de conexão);
+- fan_out: o mesmo endpoint em todas as instâncias ao mesmo tempo;
+- TokenBucket para limitar a taxa por instância (harvester, onboarding);
+- latência de cada chamada em LatencyStats (client.stats.report()).
+
+Uso:
+    from waha_client import WahaClient
+    with WahaClient.from_env() as client:
+        print(client.fan_out("status"))
+
+    from waha_client import AsyncWahaClient
+    async with AsyncWahaClient(urls, api_key=KEY) as client:
+        counts = await client.fan_out("groups_count")
+"""
+from .auth import Auth, IdTokenCache
+from .endpoints import DEFAULT_INSTANCES, WahaError, parse_instances, parse_urls
+from .instrumentation import CallRecord, LatencyStats
+from .ratelimit import TokenBucket
+from .sync import WahaClient
+
+try:
+    from .aio import AsyncWahaClient
+except ImportError:  # aiohttp não instalado: só o cliente síncrono
+    AsyncWahaClient = None
+
+__all__ = [
+    "AsyncWahaClient",
+    "Auth",
+    "CallRecord",
+    "DEFAULT_INSTANCES",
+    "IdTokenCache",
+    "LatencyStats",
+    "TokenBucket",
+    "WahaClient",
+    "WahaError",
+    "parse_instances",
+    "parse_urls",
+]
@@ -0,0 +1,116 @@
+"""Cliente assíncrono (aiohttp) das instâncias WAHA."""
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from .auth import Auth
+from .endpoints import (
+    CONNECT_TIMEOUT, DEFAULT_MAX_ATTEMPTS, DEFAULT_POOL_SIZE, DEFAULT_SESSION, DEFAULT_TIMEOUT,
+    Endpoints, WahaError, backoff, env_config, should_retry,
+)
+from .instrumentation import CallRecord, LatencyStats
+
+
+def decode(text):
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class AsyncWahaClient(Endpoints):
+    """Uma aiohttp.ClientSession (pool keep-alive) por URL base.
+
+    As sessões são criadas no primeiro uso, dentro do event loop. Os ID
+    tokens vêm do mesmo cache do cliente síncrono; a busca (bloqueante)
+    roda numa thread.
+
+    Uso:
+        async with AsyncWahaClient.from_env() as client:
+            await client.status(url)
+            await client.fan_out("groups_count")
+    """
+
+    def __init__(self, base_urls=(), api_key=None, bearer_token=None, use_id_token=None,
+                 session=DEFAULT_SESSION, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 pool_size=DEFAULT_POOL_SIZE, auth=None, stats=None):
+        self.base_urls = [url.rstrip("/") for url in base_urls]
+        self.auth = auth or Auth(api_key, bearer_token, use_id_token)
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(CONNECT_TIMEOUT, timeout))
+        self.max_attempts = max(1, max_attempts)
+        self.pool_size = pool_size
+        self.stats = stats or LatencyStats()
+        self._sessions = {}
+
+    @classmethod
+    def from_env(cls, **overrides):
+        return cls(**{**env_config(), **overrides})
+
+    def _http(self, base_url):
+        http = self._sessions.get(base_url)
+        if http is None or http.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            http = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
+            self._sessions[base_url] = http
+        return http
+
+    async def _headers(self, base_url):
+        if self.auth.use_id_token and not self.auth.bearer_token:
+            return await asyncio.to_thread(self.auth.headers, base_url)
+        return self.auth.headers(base_url)
+
+    async def _call(self, base_url, endpoint, method, path, params=None, json=None):
+        base_url = base_url.rstrip("/")
+        http = self._http(base_url)
+        started = time.perf_counter()
+        status, error = None, None
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                retry_after = None
+                try:
+                    async with http.request(method, base_url + path, params=params, json=json,
+                                            headers=await self._headers(base_url)) as response:
+                        status = response.status
+                        text = await response.text()
+                        if response.ok:
+                            return decode(text)
+                        if not should_retry(method, status) or attempt >= self.max_attempts:
+                            raise WahaError(base_url, endpoint, status, text)
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # sem resposta: POST/DELETE só repetem se a conexão nem abriu
+                    retryable = method == "GET" or isinstance(e, aiohttp.ClientConnectorError)
+                    if not retryable or attempt >= self.max_attempts:
+                        raise
+                await asyncio.sleep(backoff(attempt, retry_after))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.stats.record(CallRecord(base_url, endpoint, status, time.perf_counter() - started,
+                                         attempt, error))
+
+    async def fan_out(self, endpoint, *args, base_urls=None, **kwargs):
+        """Chama `endpoint` em todas as instâncias ao mesmo tempo; {url: resultado ou exceção}"""
+        urls = list(base_urls or self.base_urls)
+        method = getattr(self, endpoint)
+        results = await asyncio.gather(*(method(url, *args, **kwargs) for url in urls), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    async def close(self):
+        for http in self._sessions.values():
+            await http.close()
+        self._sessions.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
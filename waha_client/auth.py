@@ -0,0 +1,97 @@
+"""Autenticação nas instâncias WAHA: X-Api-Key, Bearer fixo ou ID token do Cloud Run.
+
+Os ID tokens são guardados por audience e reaproveitados até perto do `exp`
+do próprio JWT (e não por um TTL fixo), com lock para as threads não
+buscarem o mesmo token em paralelo.
+"""
+import base64
+import json
+import threading
+import time
+
+# renova o token este tanto antes de expirar
+ID_TOKEN_MARGIN = 5 * 60
+# usado quando o token não traz `exp` legível (tokens do Google valem 1h)
+ID_TOKEN_FALLBACK_TTL = 50 * 60
+
+
+def token_expiry(token):
+    """`exp` (epoch) do JWT, sem validar a assinatura; None se não der para ler"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class IdTokenCache:
+    """ID tokens do Cloud Run por audience, válidos até o `exp` menos a margem"""
+
+    def __init__(self, fetch=None, margin=ID_TOKEN_MARGIN):
+        self._fetch = fetch or _fetch_google_id_token
+        self.margin = margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._audience_locks = {}
+        self.fetches = 0
+
+    def _cached(self, audience):
+        cached = self._tokens.get(audience)
+        if cached and cached[1] - self.margin > time.time():
+            return cached[0]
+        return None
+
+    def get(self, audience):
+        token = self._cached(audience)
+        if token:
+            return token
+        with self._lock:
+            audience_lock = self._audience_locks.setdefault(audience, threading.Lock())
+        with audience_lock:
+            # outra thread pode ter renovado enquanto esperávamos
+            token = self._cached(audience)
+            if token:
+                return token
+            token = self._fetch(audience)
+            self.fetches += 1
+            expiry = token_expiry(token) or time.time() + ID_TOKEN_FALLBACK_TTL
+            self._tokens[audience] = (token, expiry)
+            return token
+
+
+def _fetch_google_id_token(audience):
+    # google-auth só é necessário quando os ID tokens estão em uso
+    from google.auth.transport.requests import Request
+    from google.oauth2 import id_token
+
+    return id_token.fetch_id_token(Request(), audience)
+
+
+class Auth:
+    """Monta os headers de cada instância.
+
+    - api_key: enviado em X-Api-Key;
+    - bearer_token: Authorization fixo (ex.: token obtido fora do processo);
+    - use_id_token: Authorization com ID token do Cloud Run (audience = URL
+      base); None usa o ID token só quando não há api_key nem bearer_token,
+      como o check_status fazia.
+    """
+
+    def __init__(self, api_key=None, bearer_token=None, use_id_token=None, token_cache=None):
+        self.api_key = api_key or None
+        self.bearer_token = bearer_token or None
+        if use_id_token is None:
+            use_id_token = not (self.api_key or self.bearer_token)
+        self.use_id_token = use_id_token
+        self.token_cache = token_cache or IdTokenCache()
+
+    def headers(self, base_url):
+        headers = {"Accept": "application/json"}
+        if self.api_key:
+            headers["X-Api-Key"] = self.api_key
+        if self.bearer_token:
+            headers["Authorization"] = f"Bearer {self.bearer_token}"
+        elif self.use_id_token:
+            headers["Authorization"] = f"Bearer {self.token_cache.get(base_url)}"
+        return headers
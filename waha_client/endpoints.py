@@ -0,0 +1,184 @@
+"""Endpoints da API do WAHA, comuns às variantes síncrona e assíncrona.
+
+Cada método só descreve a chamada (verbo, caminho, parâmetros) e delega para
+`_call`, que cada cliente implementa: no WahaClient devolve o resultado, no
+AsyncWahaClient devolve a coroutine. O primeiro argumento é sempre a URL base
+da instância, como nos helpers dos notebooks.
+"""
+import os
+import random
+from urllib.parse import quote
+
+# Variáveis de ambiente (padrões de WahaClient.from_env / AsyncWahaClient.from_env)
+# - WAHA_URLS: URLs base separadas por vírgula
+# - WAHA_INSTANCES (harvester/onboarding): device=url separados por vírgula (ver parse_instances)
+# - WAHA_API_KEY: enviado em X-Api-Key
+# - WAHA_BEARER_TOKEN (opcional): Authorization fixo
+# - WAHA_USE_ID_TOKEN (opcional): 1/0 força ligar/desligar o ID token do Cloud Run
+# - WAHA_SESSION (opcional; padrão "default")
+# - WAHA_TIMEOUT (opcional; segundos por requisição, padrão 30)
+# - WAHA_MAX_ATTEMPTS (opcional; padrão 4)
+DEFAULT_SESSION = "default"
+DEFAULT_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_POOL_SIZE = 10
+# instâncias do get_data.ipynb, usadas quando WAHA_INSTANCES não está definida
+DEFAULT_INSTANCES = {
+    "waha-meli-teste": "https://waha-meli-1-180862637961.us-central1.run.app",
+    "waha-meli-2": "https://waha-meli-2-180862637961.us-central1.run.app",
+    "waha-meli-3": "https://waha-meli-3-180862637961.us-central1.run.app",
+    "waha-meli-4": "https://waha-meli-4-180862637961.us-central1.run.app",
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# POST/DELETE só são repetidos quando o servidor garantidamente não processou
+NON_IDEMPOTENT_RETRY_STATUSES = {429, 503}
+MAX_BACKOFF = 30.0
+
+
+class WahaError(Exception):
+    """Resposta fora de 2xx de uma instância WAHA"""
+
+    def __init__(self, base_url, endpoint, status, body):
+        super().__init__(f"{endpoint} em {base_url}: HTTP {status}: {body[:200]}")
+        self.base_url = base_url
+        self.endpoint = endpoint
+        self.status = status
+        self.body = body
+
+
+def parse_urls(value):
+    return [url.strip().rstrip("/") for url in (value or "").split(",") if url.strip()]
+
+
+def parse_instances(value):
+    """{device: url} de "device=url,device=url"; sem valor, as DEFAULT_INSTANCES"""
+    if not value:
+        return dict(DEFAULT_INSTANCES)
+    instances = {}
+    for item in value.split(","):
+        device, _, url = item.partition("=")
+        if device.strip() and url.strip():
+            instances[device.strip()] = url.strip().rstrip("/")
+    return instances
+
+
+def env_config():
+    """Argumentos de construção dos clientes a partir das variáveis de ambiente"""
+    use_id_token = os.getenv("WAHA_USE_ID_TOKEN", "")
+    return {
+        "base_urls": parse_urls(os.getenv("WAHA_URLS", "")),
+        "api_key": os.getenv("WAHA_API_KEY", ""),
+        "bearer_token": os.getenv("WAHA_BEARER_TOKEN", ""),
+        "use_id_token": None if use_id_token == "" else use_id_token.lower() in ("1", "true", "sim"),
+        "session": os.getenv("WAHA_SESSION", DEFAULT_SESSION),
+        "timeout": float(os.getenv("WAHA_TIMEOUT", DEFAULT_TIMEOUT)),
+        "max_attempts": int(os.getenv("WAHA_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+    }
+
+
+def should_retry(method, status):
+    if method in ("GET", "HEAD"):
+        return status in RETRY_STATUSES
+    return status in NON_IDEMPOTENT_RETRY_STATUSES
+
+
+def backoff(attempt, retry_after=None):
+    """Espera antes da tentativa `attempt + 1`: Retry-After se houver, senão exponencial com jitter"""
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_BACKOFF, 0.5 * 2 ** attempt))
+
+
+def _id(value):
+    return quote(value, safe="@.")
+
+
+class Endpoints:
+    session = DEFAULT_SESSION
+
+    def _call(self, base_url, endpoint, method, path, params=None, json=None):
+        raise NotImplementedError
+
+    def get(self, base_url, path, params=None):
+        """GET genérico em um caminho da instância (ex.: ping de /api/sessions)"""
+        return self._call(base_url, "get", "GET", path, params=params)
+
+    # --- sessões ---
+    def list_sessions(self, base_url):
+        return self._call(base_url, "list_sessions", "GET", "/api/sessions")
+
+    def status(self, base_url):
+        return self._call(base_url, "status", "GET", f"/api/sessions/{self.session}")
+
+    def start(self, base_url):
+        return self._call(base_url, "start", "POST", f"/api/sessions/{self.session}/start")
+
+    def stop(self, base_url):
+        return self._call(base_url, "stop", "POST", f"/api/sessions/{self.session}/stop")
+
+    # --- chats ---
+    def list_chats(self, base_url, limit=None, offset=None):
+        params = {k: v for k, v in (("limit", limit), ("offset", offset)) if v is not None}
+        return self._call(base_url, "list_chats", "GET", f"/api/{self.session}/chats", params=params or None)
+
+    def get_messages(self, base_url, chat_id, limit=100, offset=0, since=None, sort_order="asc"):
+        params = {
+            "limit": limit,
+            "offset": offset,
+            "downloadMedia": "false",
+            "sortBy": "messageTimestamp",
+            "sortOrder": sort_order,
+        }
+        if since is not None:
+            params["filter.timestamp.gte"] = since
+        return self._call(base_url, "get_messages", "GET",
+                          f"/api/{self.session}/chats/{_id(chat_id)}/messages", params=params)
+
+    def delete_chat_messages(self, base_url, chat_id):
+        return self._call(base_url, "delete_chat_messages", "DELETE",
+                          f"/api/{self.session}/chats/{_id(chat_id)}/messages")
+
+    # --- grupos ---
+    def list_groups(self, base_url, exclude_participants=True):
+        params = {"exclude": "participants"} if exclude_participants else None
+        return self._call(base_url, "list_groups", "GET", f"/api/{self.session}/groups", params=params)
+
+    def groups_count(self, base_url):
+        return self._call(base_url, "groups_count", "GET", f"/api/{self.session}/groups/count")
+
+    def group_join_info(self, base_url, code):
+        return self._call(base_url, "group_join_info", "GET", f"/api/{self.session}/groups/join-info",
+                          params={"code": code})
+
+    def join_group(self, base_url, code):
+        return self._call(base_url, "join_group", "POST", f"/api/{self.session}/groups/join", json={"code": code})
+
+    def leave_group(self, base_url, group_id):
+        return self._call(base_url, "leave_group", "POST", f"/api/{self.session}/groups/{_id(group_id)}/leave")
+
+    def delete_group(self, base_url, group_id):
+        return self._call(base_url, "delete_group", "DELETE", f"/api/{self.session}/groups/{_id(group_id)}")
+
+    # --- canais ---
+    def list_channels(self, base_url):
+        return self._call(base_url, "list_channels", "GET", f"/api/{self.session}/channels")
+
+    def channel_info(self, base_url, channel_id):
+        return self._call(base_url, "channel_info", "GET", f"/api/{self.session}/channels/{_id(channel_id)}")
+
+    def follow_channel(self, base_url, channel_id):
+        return self._call(base_url, "follow_channel", "POST",
+                          f"/api/{self.session}/channels/{_id(channel_id)}/follow")
+
+    def unfollow_channel(self, base_url, channel_id):
+        return self._call(base_url, "unfollow_channel", "POST",
+                          f"/api/{self.session}/channels/{_id(channel_id)}/unfollow")
+
+    def delete_channel(self, base_url, channel_id):
+        return self._call(base_url, "delete_channel", "DELETE",
+                          f"/api/{self.session}/channels/{_id(channel_id)}")
@@ -0,0 +1,54 @@
+"""Latência por chamada: cada requisição (com suas tentativas) vira um registro."""
+import threading
+from collections import defaultdict, namedtuple
+
+CallRecord = namedtuple("CallRecord", "base_url endpoint status seconds attempts error")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class LatencyStats:
+    """Acumula os registros por (instância, endpoint); `on_call` recebe cada um (ex.: Prometheus)"""
+
+    def __init__(self, on_call=None, keep=10000):
+        self.on_call = on_call
+        self.keep = keep
+        self._records = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        with self._lock:
+            records = self._records[(record.base_url, record.endpoint)]
+            records.append(record)
+            if len(records) > self.keep:
+                del records[: len(records) - self.keep]
+        if self.on_call:
+            self.on_call(record)
+
+    def summary(self):
+        """{(base_url, endpoint): {calls, errors, retries, p50, p95, max}} em segundos"""
+        with self._lock:
+            items = {key: list(records) for key, records in self._records.items()}
+        result = {}
+        for key, records in items.items():
+            seconds = [r.seconds for r in records]
+            result[key] = {
+                "calls": len(records),
+                "errors": sum(1 for r in records if r.error),
+                "retries": sum(r.attempts - 1 for r in records),
+                "p50": percentile(seconds, 0.5),
+                "p95": percentile(seconds, 0.95),
+                "max": max(seconds),
+            }
+        return result
+
+    def report(self):
+        for (base_url, endpoint), s in sorted(self.summary().items()):
+            print(f"  {base_url} {endpoint}: {s['calls']} chamadas, {s['errors']} erros, "
+                  f"{s['retries']} retentativas | p50 {s['p50'] * 1000:.0f} ms | "
+                  f"p95 {s['p95'] * 1000:.0f} ms | máx {s['max'] * 1000:.0f} ms")
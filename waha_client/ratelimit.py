@@ -0,0 +1,25 @@
+"""Token bucket (asyncio) para limitar a taxa de requisições por instância WAHA."""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Limita a taxa de requisições: `rate` por segundo, rajadas de até `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
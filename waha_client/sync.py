@@ -0,0 +1,122 @@
+"""Cliente síncrono (requests) das instâncias WAHA."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .auth import Auth
+from .endpoints import (
+    CONNECT_TIMEOUT, DEFAULT_MAX_ATTEMPTS, DEFAULT_POOL_SIZE, DEFAULT_SESSION, DEFAULT_TIMEOUT,
+    Endpoints, WahaError, backoff, env_config, should_retry,
+)
+from .instrumentation import CallRecord, LatencyStats
+
+
+def decode(response):
+    if not response.content:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class WahaClient(Endpoints):
+    """Uma requests.Session (pool keep-alive) por URL base, compartilhada entre threads.
+
+    Uso:
+        client = WahaClient.from_env()
+        client.status("https://waha-meli-2-....run.app")
+        client.fan_out("status")  # {url: resultado ou exceção} de todas as instâncias
+    """
+
+    def __init__(self, base_urls=(), api_key=None, bearer_token=None, use_id_token=None,
+                 session=DEFAULT_SESSION, timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 pool_size=DEFAULT_POOL_SIZE, auth=None, stats=None):
+        self.base_urls = [url.rstrip("/") for url in base_urls]
+        self.auth = auth or Auth(api_key, bearer_token, use_id_token)
+        self.session = session
+        self.timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.pool_size = pool_size
+        self.stats = stats or LatencyStats()
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **overrides):
+        return cls(**{**env_config(), **overrides})
+
+    def _http(self, base_url):
+        with self._lock:
+            http = self._sessions.get(base_url)
+            if http is None:
+                http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                http.mount("https://", adapter)
+                http.mount("http://", adapter)
+                self._sessions[base_url] = http
+            return http
+
+    def _call(self, base_url, endpoint, method, path, params=None, json=None):
+        base_url = base_url.rstrip("/")
+        http = self._http(base_url)
+        started = time.perf_counter()
+        status, error = None, None
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                retry_after = None
+                try:
+                    response = http.request(method, base_url + path, params=params, json=json,
+                                            headers=self.auth.headers(base_url), timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    # sem resposta: POST/DELETE só repetem se a conexão nem abriu
+                    retryable = method == "GET" or isinstance(e, requests.ConnectTimeout)
+                    if not retryable or attempt >= self.max_attempts:
+                        raise
+                else:
+                    status = response.status_code
+                    if response.ok:
+                        return decode(response)
+                    if not should_retry(method, status) or attempt >= self.max_attempts:
+                        raise WahaError(base_url, endpoint, status, response.text)
+                    retry_after = response.headers.get("Retry-After")
+                time.sleep(backoff(attempt, retry_after))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.stats.record(CallRecord(base_url, endpoint, status, time.perf_counter() - started,
+                                         attempt, error))
+
+    def fan_out(self, endpoint, *args, base_urls=None, max_workers=None, **kwargs):
+        """Chama `endpoint` em todas as instâncias ao mesmo tempo; {url: resultado ou exceção}"""
+        urls = list(base_urls or self.base_urls)
+        method = getattr(self, endpoint)
+
+        def call(url):
+            try:
+                return method(url, *args, **kwargs)
+            except Exception as e:
+                return e
+
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(urls)) as pool:
+            return dict(zip(urls, pool.map(call, urls)))
+
+    def close(self):
+        with self._lock:
+            for http in self._sessions.values():
+                http.close()
+            self._sessions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()